@@ -1,6 +1,5 @@
 import os
 import json
-import glob
 import time
 from datetime import datetime
 import requests
@@ -12,6 +11,8 @@ from dotenv import load_dotenv
 import re
 # EMBEDDER will be loaded in main
 from chroma_kap_memory import load_embedder, KapMemory, handle_new_kap, store_kap, get_ticker_frequency
+from kap_archive import read_json_path
+from kap_queue import TOPIC_GEMINI, RetryableError, WorkQueue
 
 
 # Load environment variables from .env file
@@ -26,6 +27,9 @@ DATA_DIR = "./daily_data_kap/gemini"  # Directory containing the JSON files
 OUTPUT_FILE = "kap_alarms.json"
 PROCESSED_TRACKER_FILE = "processed_files.json"
 FIN_DIR = "./daily_data_kap/financials"  # burada SYMBOL_financials.json duruyor
+QUEUE_GROUP = "alarms"      # kap_queue tüketici grubu
+QUEUE_BATCH = 10
+QUEUE_LEASE_SECONDS = 1800
 
 # Memory/Embedding settings
 # Set to False to disable ChromaDB/embedding (prevents SEGV crashes on some servers)
@@ -378,8 +382,10 @@ def load_financials_for_symbol(symbol: str) -> dict | None:
 
 def process_file(client, file_path, embedder, memory):  
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        # Gün kapanıp arşive taşındıysa paketlenmiş kayıttan okunur
+        data = read_json_path(file_path)
+        if data is None:
+            raise FileNotFoundError(file_path)
 
         symbol = extract_symbol_from_gemini_json(data)
         fin = load_financials_for_symbol(symbol) if symbol else None
@@ -471,18 +477,22 @@ def process_file(client, file_path, embedder, memory):
         if not full_content:
             return None
 
-        response = client.models.generate_content(
-            model='gemini-3-flash-preview', 
-            contents=full_content,
-            config=types.GenerateContentConfig(
-                system_instruction=SYSTEM_PROMPT,
-                temperature=0.0,
-                top_p=0.95,
-                top_k=40,
-                max_output_tokens=8192,
-                response_mime_type="application/json",
+        try:
+            response = client.models.generate_content(
+                model='gemini-3-flash-preview', 
+                contents=full_content,
+                config=types.GenerateContentConfig(
+                    system_instruction=SYSTEM_PROMPT,
+                    temperature=0.0,
+                    top_p=0.95,
+                    top_k=40,
+                    max_output_tokens=8192,
+                    response_mime_type="application/json",
+                )
             )
-        )
+        except Exception as e:
+            # API hatası geçici: kuyruk gecikmeyle tekrar dener
+            raise RetryableError(str(e))
 
         # ✅ parse
         if response.text and response.text.strip():
@@ -509,6 +519,8 @@ def process_file(client, file_path, embedder, memory):
 
         return None
 
+    except RetryableError:
+        raise
     except Exception as e:
         print(f"Error processing {file_path}: {e}")
         return None
@@ -567,23 +579,32 @@ def main():
         if "_source_file" in alarm:
             processed_files.add(alarm["_source_file"])
     
+    # New work comes from the pipeline's queue (kap_queue) instead of globbing DATA_DIR
+    queue = WorkQueue()
     
     while True:
         try:
-            # Find files
-            # Walking through the gemini directory structure: gemini/*_gemini.json
-            search_pattern = os.path.join(DATA_DIR, "*_gemini.json")
-            files = glob.glob(search_pattern)
+            messages = queue.claim(QUEUE_GROUP, TOPIC_GEMINI, limit=QUEUE_BATCH, lease_seconds=QUEUE_LEASE_SECONDS)
             
-            new_files = [f for f in files if f not in processed_files]
-            
-            if new_files:
-                print(f"\n[{datetime.now().strftime('%H:%M:%S')}] {len(new_files)} analiz edilmemiş dosya bulundu.")
+            if messages:
+                print(f"\n[{datetime.now().strftime('%H:%M:%S')}] {len(messages)} analiz edilmemiş dosya alındı.")
                 
-                for i, file_path in enumerate(new_files):
-                    print(f"Processing [{i+1}/{len(new_files)}]: {os.path.basename(file_path)}")
+                for i, msg in enumerate(messages):
+                    # Tracker keeps the old glob-style path (DATA_DIR/<file>), use the same key
+                    file_path = os.path.join(DATA_DIR, os.path.basename(msg["payload"]["path"]))
+                    if file_path in processed_files:
+                        queue.ack(QUEUE_GROUP, msg["id"])
+                        continue
+
+                    print(f"Processing [{i+1}/{len(messages)}]: {os.path.basename(file_path)}")
                     
-                    result_json_str = process_file(client, file_path, EMBEDDER, MEMORY)
+                    try:
+                        result_json_str = process_file(client, file_path, EMBEDDER, MEMORY)
+                    except RetryableError as e:
+                        dead = queue.nack(QUEUE_GROUP, msg["id"], str(e))
+                        print(f"[WARN] Gemini API error, will retry {os.path.basename(file_path)}" + (" (dead-letter)" if dead else ""))
+                        time.sleep(4)
+                        continue
                     
                     # Mark as processed immediately (even if failed/empty response) to avoid death loops
                     processed_files.add(file_path)
@@ -594,6 +615,7 @@ def main():
                             json.dump(list(processed_files), f)
                     except:
                         pass
+                    queue.ack(QUEUE_GROUP, msg["id"])
                     
                     if result_json_str:
                         try:
@@ -639,9 +661,9 @@ def main():
                     time.sleep(4) 
             
             else:
-                # No new files
+                # No new messages
                 # print(".", end="", flush=True) 
-                time.sleep(10) # Wait 10 seconds before next scan
+                time.sleep(10) # Wait 10 seconds before next claim
 
         except Exception as e:
             print(f"\n[ERROR] Watch loop error: {e}")
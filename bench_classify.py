@@ -0,0 +1,210 @@
+"""
+KAP Sınıflandırma Benchmark
+===========================
+Saklanan korpustaki bildirim satırlarında (detail JSON'ları: düz dosyalar ve
+günlük arşiv) eski satır satır yolu (pandas'lı safe_lower), classify_disclosure
+ve toplu classify_batch'i karşılaştırır; sınıfların birebir aynı olduğunu
+doğrular ve hızları yazar.
+
+Korpus küçükse --synthetic ile ipucu kelimeleri, Türkçe harf varyantları ve
+None/NaN alanlar içeren rastgele satırlar eklenebilir.
+
+Kullanım:
+    python bench_classify.py [--data-dir daily_data_kap] [--limit 50000] [--synthetic 20000] [--repeat 3]
+"""
+
+import argparse
+import json
+import random
+import time
+from pathlib import Path
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+import kap_archive
+import kap_classify
+
+PROJECT_ROOT = Path(__file__).parent
+DAILY_DATA_DIR = PROJECT_ROOT / "daily_data_kap"
+
+ROW_FIELDS = ("disclosureIndex", "disclosureClass", "ruleType", "subject", "summary", "top_level_class")
+
+# ==========================
+# ESKİ YÖNTEM (karşılaştırma için)
+# ==========================
+
+def legacy_safe_lower(val: object) -> str:
+    if pd.isna(val):
+        return ""
+    return str(val).lower()
+
+def legacy_is_fr(row: dict) -> bool:
+    disc_class = str(row.get("disclosureClass", "")).upper()
+    rule_type = str(row.get("ruleType", "")).upper()
+    combined_codes = f"{disc_class} {rule_type}"
+    for hint in kap_classify.FR_CODE_HINTS:
+        if hint in combined_codes:
+            return True
+    subject = legacy_safe_lower(row.get("subject", ""))
+    summary = legacy_safe_lower(row.get("summary", ""))
+    text = subject + " " + summary
+    for hint in kap_classify.FR_TEXT_HINTS:
+        if hint in text:
+            return True
+    return False
+
+def legacy_is_dkb(row: dict) -> bool:
+    disc_class = str(row.get("disclosureClass", "")).upper()
+    rule_type = str(row.get("ruleType", "")).upper()
+    combined_codes = f"{disc_class} {rule_type}"
+    dkb_code_hints = ["VBTS", "DEVRE KESICI", "DEVRE KESİCİ", "VOLATILITE", "VOLATİLİTE"]
+    for hint in dkb_code_hints:
+        if hint in combined_codes:
+            return True
+    subject = legacy_safe_lower(row.get("subject", ""))
+    summary = legacy_safe_lower(row.get("summary", ""))
+    text = subject + " " + summary
+    if kap_classify.PATTERN_DKB.search(text):
+        return True
+    return False
+
+def legacy_classify(row: dict) -> str:
+    """daily_kap_pipeline'daki eski classify_disclosure (satır başına, pandas'lı)"""
+    if legacy_is_fr(row):
+        return "FR"
+    if legacy_is_dkb(row):
+        return "DKB"
+    return "ODA"
+
+# ==========================
+# KORPUS
+# ==========================
+
+def load_corpus(data_dir: Path, limit: int) -> list[dict]:
+    rows = []
+
+    def add(raw: bytes | str):
+        try:
+            obj = json.loads(raw)
+        except ValueError:
+            return
+        if isinstance(obj, dict) and "disclosureIndex" in obj:
+            rows.append({k: obj[k] for k in ROW_FIELDS if k in obj})
+
+    for path in data_dir.glob("*/*/*_detail.json"):
+        add(path.read_bytes())
+        if limit and len(rows) >= limit:
+            return rows
+
+    archive_dir = data_dir / "archive"
+    if (archive_dir / "index.sqlite").exists():
+        archive = kap_archive.DailyArchive(archive_dir)
+        try:
+            for _, raw in archive.iter_kind("detail"):
+                add(raw)
+                if limit and len(rows) >= limit:
+                    break
+        finally:
+            archive.close()
+    return rows
+
+# Gerçeğe yakın dağılım: çoğu ODA; ipuçları, Türkçe harf varyantları ve
+# None/NaN alanlar daha seyrek
+SYNTHETIC_SUBJECTS = [
+    ("Özel Durum Açıklaması (Genel)", 30), ("Pay Alım Satım Bildirimi", 20),
+    ("Borçlanma Aracı İhracına İlişkin Bildirim", 10), ("Genel Kurul İşlemlerine İlişkin Bildirim", 8),
+    ("Kar Payı Dağıtım İşlemlerine İlişkin Bildirim", 5), ("Sermaye Artırımı - Azaltımı İşlemlerine İlişkin Bildirim", 5),
+    ("Fon Toplam Değer Raporu", 5), ("Finansal Rapor", 8), ("Faaliyet Raporu", 4), ("MALİ TABLO", 1),
+    ("Devre Kesici Uygulanması", 1), ("Volatilite Bazlı Tedbir Sistemi", 1), ("VBTS kapsamında tedbir", 1),
+    ("İşlem sırası geçici olarak durduruldu", 1), ("işlem sırası durdurulmuştur", 1), ("Devre  KESİCİ", 1),
+]
+SYNTHETIC_NOISE = ["devre", "volat", "kesıcı", "durdurul", "rapor", "tablo", "ſ", "\n", "ΟΔΟΣ", "ß"]
+SYNTHETIC_CODES = [
+    ("ODA", 60), ("FR", 15), ("DG", 10), ("FON", 8), ("DKB", 2), ("", 2), (None, 1),
+    ("MALI_TABLO", 1), ("NAKİT_AKIŞ", 1), ("VBTS", 1), ("DEVRE", 1), ("KESICI", 1),
+]
+
+def synthetic_rows(count: int, seed: int = 7) -> list[dict]:
+    rng = random.Random(seed)
+    subjects, subject_weights = zip(*SYNTHETIC_SUBJECTS)
+    codes, code_weights = zip(*SYNTHETIC_CODES)
+
+    def text():
+        choice = rng.random()
+        if choice < 0.05:
+            return None
+        if choice < 0.07:
+            return float("nan")
+        value = rng.choices(subjects, subject_weights)[0]
+        if rng.random() < 0.1:
+            value += " " + rng.choice(SYNTHETIC_NOISE)
+        return value
+
+    rows = []
+    for i in range(count):
+        row = {"disclosureIndex": i, "subject": text(), "summary": text() if rng.random() < 0.5 else ""}
+        if rng.random() < 0.95:
+            row["disclosureClass"] = rng.choices(codes, code_weights)[0]
+        if rng.random() < 0.7:
+            row["ruleType"] = rng.choice(["", "3 Aylık", "Yıllık", None])
+        rows.append(row)
+    return rows
+
+# ==========================
+# BENCHMARK
+# ==========================
+
+def time_best(func, repeat: int) -> tuple[float, list]:
+    best, result = None, None
+    for _ in range(max(1, repeat)):
+        started = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description="KAP sınıflandırma benchmark")
+    parser.add_argument("--data-dir", default=str(DAILY_DATA_DIR))
+    parser.add_argument("--limit", type=int, default=0, help="Korpustan en fazla kaç satır (0=hepsi)")
+    parser.add_argument("--synthetic", type=int, default=0, help="Eklenecek rastgele satır sayısı")
+    parser.add_argument("--repeat", type=int, default=3, help="En iyi süre için tekrar")
+    args = parser.parse_args()
+
+    corpus = load_corpus(Path(args.data_dir), args.limit)
+    rows = corpus + synthetic_rows(args.synthetic)
+    if not rows:
+        print(f"[BENCH] {args.data_dir} altında satır bulunamadı (--synthetic ile deneyin).")
+        return
+
+    engine = "pyahocorasick" if kap_classify.ahocorasick is not None else "regex"
+    print(f"[BENCH] {len(corpus)} korpus + {len(rows) - len(corpus)} sentetik satır, otomat: {engine}")
+
+    timings = []
+    if pd is not None:
+        legacy_time, legacy_classes = time_best(lambda: [legacy_classify(r) for r in rows], args.repeat)
+        timings.append(("eski", legacy_time))
+    row_time, row_classes = time_best(lambda: [kap_classify.classify_disclosure(r) for r in rows], args.repeat)
+    batch_time, batch_classes = time_best(lambda: kap_classify.classify_batch(rows), args.repeat)
+    timings += [("satır", row_time), ("toplu", batch_time)]
+
+    mismatches = [i for i, (a, b) in enumerate(zip(row_classes, batch_classes)) if a != b]
+    if pd is not None:
+        mismatches += [i for i, (a, b) in enumerate(zip(legacy_classes, batch_classes)) if a != b and i not in mismatches]
+    for i in mismatches[:5]:
+        print(f"[DIFF] {rows[i].get('disclosureIndex')}: satır={row_classes[i]} toplu={batch_classes[i]}")
+    stored = [(r["top_level_class"], c) for r, c in zip(corpus, batch_classes) if "top_level_class" in r]
+    changed = sum(1 for old, new in stored if old != new)
+
+    for label, elapsed in timings:
+        print(f"[BENCH] {label:<6} {elapsed:7.3f}s | {elapsed / len(rows) * 1e6:6.2f} µs/satır | {len(rows) / elapsed:10.0f} satır/s")
+    print("[BENCH] Hızlanma: " + ", ".join(f"{label} -> toplu {elapsed / batch_time:.1f}x" for label, elapsed in timings[:-1]))
+    counts = {c: batch_classes.count(c) for c in ("FR", "DKB", "ODA")}
+    print(f"[BENCH] Sınıflar: {counts} | satır/toplu farkı: {len(mismatches)} | saklanan sınıftan farklı: {changed}/{len(stored)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+KAP HTML Ayrıştırma Benchmark
+=============================
+daily_data_kap altındaki bildirim HTML'lerinde eski çok geçişli yöntemi
+(3 ayrı okuma + 2 BeautifulSoup parse + regex) kap_html'in tek geçişli
+ayrıştırıcısıyla karşılaştırır ve çıktıların aynı olup olmadığını kontrol eder.
+
+Kullanım:
+    python bench_html_parse.py [--data-dir daily_data_kap] [--limit 500]
+"""
+
+import argparse
+import re
+import time
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+
+import kap_html
+
+PROJECT_ROOT = Path(__file__).parent
+DAILY_DATA_DIR = PROJECT_ROOT / "daily_data_kap"
+
+# ==========================
+# ESKİ YÖNTEM (karşılaştırma için)
+# ==========================
+
+LEGACY_ATTACHMENT_RE = re.compile(
+    r'<a[^>]+href="(?P<href>/tr/api/file/download/[^"]+)"[^>]*>(?P<label>[^<]+)</a>',
+    re.IGNORECASE | re.UNICODE,
+)
+
+def legacy_attachments(html_path: Path) -> list[dict]:
+    html_text = html_path.read_text(encoding="utf-8", errors="ignore")
+    return [
+        {"url": kap_html.KAP_BASE_URL + m.group("href"), "label": (m.group("label") or "").strip()}
+        for m in LEGACY_ATTACHMENT_RE.finditer(html_text)
+    ]
+
+def legacy_text(html_path: Path) -> str:
+    soup = BeautifulSoup(html_path.read_text(encoding="utf-8", errors="ignore"), "html.parser")
+    for script in soup(["script", "style"]):
+        script.decompose()
+    return kap_html.clean_text(soup.get_text())
+
+def legacy_symbol(html_path: Path) -> str | None:
+    soup = BeautifulSoup(html_path.read_text(encoding="utf-8", errors="ignore"), "html.parser")
+    for meta in soup.find_all("meta"):
+        if meta.get("name") == "stockCode" or meta.get("property") == "stockCode":
+            symbol = meta.get("content", "").strip()
+            if symbol:
+                return symbol
+    title = soup.find("title")
+    if title:
+        symbol = kap_html.symbol_from_title(title.get_text().strip())
+        if symbol:
+            return symbol
+    for label in soup.find_all(["span", "div", "td", "th"]):
+        text = label.get_text().strip().lower()
+        if any(lbl in text for lbl in kap_html.SYMBOL_LABELS):
+            next_elem = label.find_next(["span", "div", "td"])
+            if next_elem:
+                symbol = next_elem.get_text().strip()
+                if kap_html.looks_like_symbol(symbol):
+                    return symbol
+    return None
+
+def legacy_parse(html_path: Path) -> dict:
+    return {
+        "symbol": legacy_symbol(html_path),
+        "attachments": legacy_attachments(html_path),
+        "text": legacy_text(html_path),
+    }
+
+# ==========================
+# BENCHMARK
+# ==========================
+
+def find_html_files(data_dir: Path, limit: int) -> list[Path]:
+    files = []
+    for path in data_dir.glob("*/*/*.html"):
+        if path.parts[-3] in ("gemini", "blobs"):
+            continue
+        files.append(path)
+        if limit and len(files) >= limit:
+            break
+    return files
+
+def time_it(func, files: list[Path]) -> tuple[float, list]:
+    started = time.perf_counter()
+    results = [func(p) for p in files]
+    return time.perf_counter() - started, results
+
+def main():
+    parser = argparse.ArgumentParser(description="KAP HTML ayrıştırma benchmark")
+    parser.add_argument("--data-dir", default=str(DAILY_DATA_DIR))
+    parser.add_argument("--limit", type=int, default=0, help="En fazla kaç HTML (0=hepsi)")
+    args = parser.parse_args()
+
+    files = find_html_files(Path(args.data_dir), args.limit)
+    if not files:
+        print(f"[BENCH] {args.data_dir} altında HTML bulunamadı.")
+        return
+
+    total_kb = sum(p.stat().st_size for p in files) / 1024
+    print(f"[BENCH] {len(files)} HTML ({total_kb:.0f} KB), parser: {'lxml' if kap_html.HAS_LXML else 'bs4'}")
+
+    legacy_time, legacy_results = time_it(legacy_parse, files)
+    single_time, single_results = time_it(kap_html.parse_disclosure_file, files)
+
+    mismatches = {"symbol": 0, "attachments": 0, "text": 0}
+    for path, old, new in zip(files, legacy_results, single_results):
+        for key in mismatches:
+            if old[key] != new[key]:
+                mismatches[key] += 1
+                if mismatches[key] <= 3:
+                    print(f"[DIFF] {key}: {path}")
+
+    for label, elapsed in (("eski", legacy_time), ("tek geçiş", single_time)):
+        per_doc = elapsed / len(files) * 1000
+        print(f"[BENCH] {label:<10} {elapsed:7.2f}s | {per_doc:6.2f} ms/bildirim | {len(files) / elapsed:8.1f} bildirim/s")
+    print(f"[BENCH] Hızlanma: {legacy_time / single_time:.1f}x")
+    print(f"[BENCH] Farklı çıktı: {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
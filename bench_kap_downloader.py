@@ -0,0 +1,154 @@
+"""
+KAP İndirici Benchmark
+======================
+Yerel bir sahte KAP sunucusu (http.server) ayağa kaldırır ve
+daily_kap_pipeline.download_disclosures'ı seri (1 worker) ve paralel
+modda çalıştırıp throughput'u karşılaştırır.
+
+Kullanım:
+    python bench_kap_downloader.py --disclosures 200 --attachments 2 --latency 0.15
+"""
+
+import argparse
+import asyncio
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import daily_kap_pipeline as pipeline
+
+
+def make_handler(latency: float, pdf_size: int, attachments: int, throttle_every: int, shared: int = 0):
+    pdf_body = b"%PDF-1.4\n" + b"0" * pdf_size
+    counter = {"n": 0}
+    lock = threading.Lock()
+
+    class FakeKapHandler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_HEAD(self):
+            self.do_GET(send_body=False)
+
+        def do_GET(self, send_body: bool = True):
+            time.sleep(latency)
+
+            # İsteğe bağlı: her N istekte bir 429 döndür (cooldown davranışı için)
+            if throttle_every:
+                with lock:
+                    counter["n"] += 1
+                    throttled = counter["n"] % throttle_every == 0
+                if throttled:
+                    self.send_response(429)
+                    self.end_headers()
+                    return
+
+            if self.path.startswith("/tr/Bildirim/"):
+                idx = self.path.rsplit("/", 1)[-1]
+                links = "".join(
+                    f'<a href="/tr/api/file/download/{idx}-{i}">Ek {i}</a>'
+                    for i in range(1, attachments + 1)
+                )
+                # Birden fazla bildirimde geçen ortak ekler (ör. aracı kurum günlük bülteni)
+                links += "".join(
+                    f'<a href="/tr/api/file/download/shared-{i}">Bülten {i}</a>'
+                    for i in range(1, shared + 1)
+                )
+                body = f"<html><head><title>BENCH - Bildirim</title></head><body><p>{idx}</p>{links}</body></html>".encode("utf-8")
+                ctype = "text/html; charset=utf-8"
+            elif self.path.startswith("/tr/api/BildirimPdf/") or self.path.startswith("/tr/api/file/download/"):
+                body = pdf_body
+                ctype = "application/pdf"
+            else:
+                self.send_response(404)
+                self.end_headers()
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if send_body:
+                self.wfile.write(body)
+
+    return FakeKapHandler
+
+
+def fake_disclosures(n: int, start_index: int = 9_000_000) -> list[dict]:
+    return [
+        {
+            "symbol": "BENCH",
+            "disclosureIndex": start_index + i,
+            "top_level_class": "ODA",
+            "subject": "Benchmark",
+            "summary": "",
+        }
+        for i in range(n)
+    ]
+
+
+def run_once(label: str, disclosures: list[dict], workers: int, concurrency: int, rate: float, burst: int) -> float:
+    with tempfile.TemporaryDirectory() as tmp:
+        pipeline.DAILY_DATA_DIR = Path(tmp)
+        pipeline.MANIFEST_FILE = Path(tmp) / "manifest.sqlite"
+        pipeline.BLOB_DIR = Path(tmp) / "blobs"
+        pipeline.QUEUE_FILE = Path(tmp) / "queue.sqlite"
+        pipeline.PDFTEXT_CACHE_FILE = Path(tmp) / "pdftext_cache.sqlite"
+        pipeline.SETTINGS_FILE = Path(tmp) / "settings.toml"  # varsayılan politika (full)
+        pipeline.DOWNLOAD_CONCURRENCY = concurrency
+        pipeline.RATE_PER_HOST = rate
+        pipeline.RATE_BURST = burst
+
+        started = time.monotonic()
+        stats, _ = asyncio.run(pipeline.download_disclosures(disclosures, workers=workers))
+        elapsed = time.monotonic() - started
+        blob_report = pipeline.get_blob_store().daily_report()
+
+    rate_docs = len(disclosures) / elapsed if elapsed else 0.0
+    print(
+        f"\n[BENCH] {label:<10} workers={workers:<3} concurrency={concurrency:<3} "
+        f"-> {elapsed:7.2f}s | {rate_docs:7.2f} bildirim/s | "
+        f"{stats['requests']} istek, {stats['failed']} başarısız, {stats['cooldowns']} cooldown"
+    )
+    print(
+        f"[BENCH] {'':<10} blob: {blob_report['url_hits']} URL tekrarı, "
+        f"{blob_report['bandwidth_saved'] // 1024} KB bant genişliği / {blob_report['disk_saved'] // 1024} KB disk tasarrufu"
+    )
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="KAP indirici throughput benchmark")
+    parser.add_argument("--disclosures", type=int, default=100)
+    parser.add_argument("--attachments", type=int, default=2, help="Bildirim başına ek PDF sayısı")
+    parser.add_argument("--latency", type=float, default=0.1, help="Sahte sunucu yanıt gecikmesi (s)")
+    parser.add_argument("--pdf-kb", type=int, default=256)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--rate", type=float, default=1000.0, help="Host başına saniyede istek bütçesi")
+    parser.add_argument("--burst", type=int, default=50)
+    parser.add_argument("--throttle-every", type=int, default=0, help="Her N istekte 429 döndür (0=kapalı)")
+    parser.add_argument("--shared-attachments", type=int, default=0, help="Her bildirimde geçen ortak ek sayısı")
+    args = parser.parse_args()
+
+    handler = make_handler(args.latency, args.pdf_kb * 1024, args.attachments, args.throttle_every, args.shared_attachments)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    pipeline.KAP_BASE_URL = f"http://127.0.0.1:{server.server_address[1]}"
+    print(f"[BENCH] Sahte KAP sunucusu: {pipeline.KAP_BASE_URL}")
+
+    disclosures = fake_disclosures(args.disclosures)
+    try:
+        serial = run_once("seri", [dict(d) for d in disclosures], 1, 1, args.rate, args.burst)
+        parallel = run_once("paralel", [dict(d) for d in disclosures], args.workers, args.concurrency, args.rate, args.burst)
+    finally:
+        server.shutdown()
+
+    print(f"\n[BENCH] Hızlanma: {serial / parallel:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,10 +3,12 @@ import os, json, glob
 from datetime import datetime
 
 from chroma_kap_memory import load_embedder, KapMemory, handle_new_kap, store_kap
+from kap_archive import ARCHIVE_DIR, get_archive, make_uri
 
 DEC_DIR = "./embedding/gemini"  # <- Root embeddings folder
 PERSIST_DIR = "./chroma_kap_memory"
 COLLECTION = "kap_memory"
+INCLUDE_ARCHIVE = True  # daily_data_kap/archive içindeki paketlenmiş gemini kayıtları da eklensin
 
 def safe_load_json(path):
     try:
@@ -53,6 +55,25 @@ def get_symbols_from_json(obj):
     parts = [s.strip().upper() for s in raw_symbol.split(',') if s.strip()]
     return list(set(parts)) # unique
 
+def iter_documents(files, processed_set):
+    """(checkpoint anahtarı, json, yedek tarih): önce DEC_DIR dosyaları, sonra arşivdeki gemini kayıtları."""
+    for fp in files:
+        if fp in processed_set:
+            continue
+        yield fp, safe_load_json(fp), datetime.fromtimestamp(os.path.getmtime(fp))
+
+    if INCLUDE_ARCHIVE and (ARCHIVE_DIR / "index.sqlite").exists():
+        # Paketi açmadan, gün/offset sırasıyla okunur; anahtar archive://{index}/gemini/0
+        for idx, data in get_archive().iter_kind("gemini"):
+            key = make_uri(idx, "gemini")
+            if key in processed_set:
+                continue
+            try:
+                obj = json.loads(data)
+            except ValueError:
+                obj = None
+            yield key, obj, datetime.now()
+
 def main():
     embedder = load_embedder("sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
     memory = KapMemory(persist_dir=PERSIST_DIR, collection_name=COLLECTION)
@@ -89,18 +110,12 @@ def main():
 
     from chroma_kap_memory import stable_id # ID hesabı için import
 
-    for fp in files:
-        # 1. Text dosya kontrolü (Hızlı)
-        if fp in processed_set:
-            continue
-        
+    # 1. Text dosya kontrolü (Hızlı) iter_documents içinde
+    for fp, obj, fallback_dt in iter_documents(files, processed_set):
         total_files += 1
-        obj = safe_load_json(fp)
         if not obj:
             continue
 
-        fallback_dt = datetime.fromtimestamp(os.path.getmtime(fp))
-        
         # JSON içinden sembolleri çek
         tickers = get_symbols_from_json(obj)
         
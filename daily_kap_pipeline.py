@@ -6,20 +6,36 @@ Bu script belirli bir tarih için tüm KAP bildirimlerini çeker ve organize ede
 2. Bildirimleri sınıflandır (FR/ODA/DKB)
 3. HTML, PDF ve ek dosyaları indir
 4. daily_data_kap/{symbol}/{disclosureIndex}/ yapısında kaydet
+
+Geçmiş tarih aralığı için: python daily_kap_pipeline.py backfill --from 2024-01-01 --to 2024-12-31
+Kesinti sonrası boşlukları kapatmak için: python daily_kap_pipeline.py catchup
+Seans saatlerinde düşük gecikmeli izleme için: python daily_kap_pipeline.py live
+Kapanmış günleri pakete taşımak için: python daily_kap_pipeline.py compact
+Çıkarıcı değişince gemini JSON'larını HTML'den yenilemek için: python daily_kap_pipeline.py reextract
+Aynı makinede birden fazla süreçle (ortak kuyruk + bütçe) işlemek için: python daily_kap_pipeline.py worker
 """
 
+import argparse
+import asyncio
 import json
 import random
-import re
-import shutil
 import time
+from collections.abc import Callable
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timedelta
 import toml
 
-import pandas as pd
 import requests
-from bs4 import BeautifulSoup
+
+from kap_downloader import AsyncKapDownloader, SharedBudget, run_worker_pool
+from kap_manifest import DisclosureManifest, file_record, sha256_file, STATUS_DONE, STATUS_PARTIAL
+from kap_blobstore import BlobStore, print_report as print_blob_report
+from kap_classify import classify_batch
+from kap_html import extraction_stamp, parse_disclosure_file
+from kap_symbols import SymbolResolver
+from kap_policy import ACTION_FULL, ACTION_HTML, ACTION_METADATA, DownloadPolicy, load_policy, print_report as print_policy_report
+from kap_queue import TOPIC_ENRICHED, TOPIC_GEMINI, LeaseLost, WorkQueue
+from kap_pdftext import PdfTextExtractor, print_report as print_pdftext_report
 
 # ==========================
 # AYARLAR
@@ -28,89 +44,28 @@ PROJECT_ROOT = Path(__file__).parent
 DAILY_DATA_DIR = PROJECT_ROOT / "daily_data_kap"
 MAPPING_FILE = PROJECT_ROOT / "kap_symbols_oids_mapping.json"
 SETTINGS_FILE = PROJECT_ROOT / "settings.toml"
+MANIFEST_FILE = DAILY_DATA_DIR / "manifest.sqlite"
+BLOB_DIR = DAILY_DATA_DIR / "blobs"
+QUEUE_FILE = DAILY_DATA_DIR / "queue.sqlite"
+PDFTEXT_CACHE_FILE = DAILY_DATA_DIR / "pdftext_cache.sqlite"
+BUDGET_FILE = DAILY_DATA_DIR / "budget.sqlite"   # Worker'lar arası ortak host bütçesi
+KAP_BASE_URL = "https://www.kap.org.tr"
+
+# Eşzamanlı indirme ayarları (kap_downloader)
+DOWNLOAD_WORKERS = 8          # Aynı anda işlenen bildirim sayısı
+DOWNLOAD_CONCURRENCY = 8      # Aynı anda uçuşta olan HTTP isteği
+RATE_PER_HOST = 1.0           # Host başına saniyede istek
+RATE_BURST = 3
+
+# Gemini JSON aşamaları ("stage" alanı)
+STAGE_ANALYZABLE = "analyzable"   # Metadata + HTML metni hazır, PDF'ler arkadan gelecek
+STAGE_ENRICHED = "enriched"       # Form PDF ve ekler indi (TOPIC_ENRICHED yayınlandı)
+STAGE_COMPLETE = "complete"       # Politika gereği PDF indirilmeyecek; analyzable kayıt nihai
 
 # Hangi tarihteki bildirimleri işleyeceğiz?
 # TARGET_DATE will be set dynamically in the loop
 
 
-# HTML'den ek PDF linklerini bulmak için regex
-ATTACHMENT_RE = re.compile(
-    r'<a[^>]+href="(?P<href>/tr/api/file/download/[^"]+)"[^>]*>(?P<label>[^<]+)</a>',
-    re.IGNORECASE | re.UNICODE,
-)
-
-# ==========================
-# SINIFLANDIRMA KURALLARI
-# ==========================
-
-# FR için metadata kod ipuçları
-FR_CODE_HINTS = ["FR", "MALI_TABLO", "MALİ_TABLO", "OZKAYNAK_DEGISIM", "ÖZKAYNAK_DEĞİŞİM", "NAKIT_AKIS", "NAKİT_AKIŞ"]
-FR_TEXT_HINTS = ["finansal rapor", "mali tablo", "mali rapor", "faaliyet raporu", "finansal tablo"]
-
-# DKB için regex
-PATTERN_DKB = re.compile(
-    r"(?i)(devre\s*kesici|volatilite\s*bazl[ıi]|işlem\s*sırası.*durdurul|VBTS)",
-    re.UNICODE,
-)
-
-def safe_lower(val: object) -> str:
-    """None/NaN güvenli lower."""
-    if pd.isna(val):
-        return ""
-    return str(val).lower()
-
-def is_fr(row: dict) -> bool:
-    """FR tespiti"""
-    disc_class = str(row.get("disclosureClass", "")).upper()
-    rule_type = str(row.get("ruleType", "")).upper()
-    combined_codes = f"{disc_class} {rule_type}"
-
-    # 1) Kod ipuçları
-    for hint in FR_CODE_HINTS:
-        if hint in combined_codes:
-            return True
-
-    # 2) subject / summary üzerinden text ipuçları
-    subject = safe_lower(row.get("subject", ""))
-    summary = safe_lower(row.get("summary", ""))
-    text = subject + " " + summary
-
-    for hint in FR_TEXT_HINTS:
-        if hint in text:
-            return True
-
-    return False
-
-def is_dkb(row: dict) -> bool:
-    """DKB tespiti"""
-    disc_class = str(row.get("disclosureClass", "")).upper()
-    rule_type = str(row.get("ruleType", "")).upper()
-    combined_codes = f"{disc_class} {rule_type}"
-
-    # Kod ipuçları
-    dkb_code_hints = ["VBTS", "DEVRE KESICI", "DEVRE KESİCİ", "VOLATILITE", "VOLATİLİTE"]
-    for hint in dkb_code_hints:
-        if hint in combined_codes:
-            return True
-
-    # subject / summary regex
-    subject = safe_lower(row.get("subject", ""))
-    summary = safe_lower(row.get("summary", ""))
-    text = subject + " " + summary
-
-    if PATTERN_DKB.search(text):
-        return True
-
-    return False
-
-def classify_disclosure(row: dict) -> str:
-    """Üst seviye sınıf: FR, DKB, veya ODA"""
-    if is_fr(row):
-        return "FR"
-    if is_dkb(row):
-        return "DKB"
-    return "ODA"
-
 # ==========================
 # HTTP SESSION
 # ==========================
@@ -133,35 +88,6 @@ def create_browser_session() -> requests.Session:
 
 session = create_browser_session()
 
-def robust_get(url: str, expect_binary: bool = False, max_retries: int = 3):
-    """429/403 durumlarında bekleyip tekrar deneyecek GET wrapper."""
-    global session
-
-    for attempt in range(1, max_retries + 1):
-        try:
-            time.sleep(random.uniform(1.0, 3.0))
-            resp = session.get(url, timeout=60)
-            status = resp.status_code
-
-            if status == 200:
-                return resp.content if expect_binary else resp.text
-
-            if status in (403, 429):
-                print(f"[WARN] {status} geldi ({url}), cooldown 60s + session yenile (attempt {attempt})")
-                time.sleep(60)
-                session = create_browser_session()
-                continue
-
-            print(f"[WARN] {url} -> status {status} (attempt {attempt})")
-            time.sleep(5)
-
-        except Exception as e:
-            print(f"[ERROR] GET hata: {url} -> {e} (attempt {attempt})")
-            time.sleep(5)
-
-    print(f"[FAIL] {url} -> max retry aşıldı.")
-    return None
-
 # ==========================
 # KAP API - BİLDİRİM ÇEKME
 # ==========================
@@ -188,21 +114,19 @@ def load_symbol_oid_mapping():
     
     return symbol_oid_map
 
-def fetch_disclosures_for_symbol(symbol: str, oid: str, target_date: str) -> list[dict]:
-    """Bir sembol için belirli tarihteki bildirimleri çeker."""
-    global session
-    
-    url = "https://www.kap.org.tr/tr/api/disclosure/members/byCriteria"
-    
-    payload = {
-        "fromDate": target_date,
-        "toDate": target_date,
+BY_CRITERIA_URL = f"{KAP_BASE_URL}/tr/api/disclosure/members/byCriteria"
+
+def build_criteria_payload(from_date: str, to_date: str, disclosure_indices=None) -> dict:
+    """byCriteria sorgu gövdesi (tüm sınıflar, tüm üyeler; istenirse belirli index'ler)."""
+    return {
+        "fromDate": from_date,
+        "toDate": to_date,
         "memberType": "IGS",
         "disclosureClass": "",  # Tüm sınıflar
         "mkkMemberOidList": [],
         "bdkMemberOidList": [],
         "inactiveMkkMemberOidList": [],
-        "disclosureIndexList": [],
+        "disclosureIndexList": [int(i) for i in disclosure_indices or []],
         "subjectList": [],
         "ruleType": "",
         "period": "",
@@ -218,12 +142,62 @@ def fetch_disclosures_for_symbol(symbol: str, oid: str, target_date: str) -> lis
         "srcCategory": "",
         "bdkReview": ""
     }
+
+def parse_disclosure_items(data) -> list[dict]:
+    """byCriteria yanıtını pipeline'ın bildirim sözlüklerine çevirir ve sınıflandırır."""
+    if not isinstance(data, list):
+        return []
+    
+    results = []
+    for item in data:
+        if not isinstance(item, dict):
+            continue
+        
+        disclosure_index = item.get("disclosureIndex")
+        
+        # Sembol indirmeden önce çözülür (kodlar -> mkkMemberOid -> unvan); klasör taşıma gerekmez
+        item_symbol = get_symbol_resolver().resolve(item) or "UNKNOWN"
+        
+        if item_symbol == "UNKNOWN":
+            print(f"[DEBUG] Symbol bulunamadı - disclosureIndex: {disclosure_index}")
+            print(f"[DEBUG] Mevcut alanlar: {list(item.keys())}")
+        
+        result = {
+            "symbol": item_symbol,
+            "disclosureIndex": disclosure_index,
+            "publishDate": item.get("publishDate"),
+            "disclosureClass": item.get("disclosureClass"),
+            "ruleType": item.get("ruleType"),
+            "subject": item.get("subject"),
+            "summary": item.get("summary"),
+            "isLate": item.get("isLate"),
+            "period": item.get("period"),
+            "year": item.get("year"),
+            "term": item.get("term"),
+            "index": item.get("index"),
+            "srcCategory": item.get("srcCategory"),
+            "url": f"{KAP_BASE_URL}/tr/Bildirim/{disclosure_index}",
+            "raw_json": json.dumps(item, ensure_ascii=False),
+        }
+        results.append(result)
+    
+    # Sınıflandır (kap_classify: tüm liste tek taramada)
+    for result, top_level_class in zip(results, classify_batch(results)):
+        result["top_level_class"] = top_level_class
+    
+    return results
+
+def fetch_disclosures_for_symbol(symbol: str, oid: str, target_date: str) -> list[dict]:
+    """Bir sembol için belirli tarihteki bildirimleri çeker."""
+    global session
+    
+    payload = build_criteria_payload(target_date, target_date)
     
     max_retries = 3
     for attempt in range(max_retries):
         try:
             time.sleep(random.uniform(2.0, 4.0))
-            r = session.post(url, data=json.dumps(payload), timeout=30)
+            r = session.post(BY_CRITERIA_URL, data=json.dumps(payload), timeout=30)
             
             if r.status_code == 429:
                 print(f"[WARN] {symbol}: Hız sınırı (429), 60s bekleniyor...")
@@ -235,78 +209,7 @@ def fetch_disclosures_for_symbol(symbol: str, oid: str, target_date: str) -> lis
                 print(f"[WARN] {symbol}: API hatası {r.status_code}")
                 continue
             
-            data = r.json()
-            
-            if not isinstance(data, list):
-                return []
-            
-            results = []
-            for item in data:
-                if not isinstance(item, dict):
-                    continue
-                
-                disclosure_index = item.get("disclosureIndex")
-                
-                # Symbol'ü API'den al - birden fazla kaynağı dene
-                item_symbol = "UNKNOWN"
-                
-                # 1. stockCodes kontrol et (liste veya string olabilir)
-                stock_codes = item.get("stockCodes", [])
-                if isinstance(stock_codes, list) and stock_codes:
-                    item_symbol = stock_codes[0]
-                elif isinstance(stock_codes, str) and stock_codes.strip():
-                    # stockCodes bazen string olarak geliyor
-                    item_symbol = stock_codes.strip()
-                
-                # 2. relatedStocks alanını kontrol et (liste veya string olabilir)
-                elif "relatedStocks" in item:
-                    related = item.get("relatedStocks", [])
-                    if isinstance(related, list) and related:
-                        item_symbol = related[0]
-                    elif isinstance(related, str) and related.strip():
-                        item_symbol = related.strip()
-                
-                # 3. basicInfo içindeki stockCode'u kontrol et
-                elif "basicInfo" in item:
-                    basic = item.get("basicInfo", {})
-                    if isinstance(basic, dict) and "stockCode" in basic:
-                        item_symbol = basic.get("stockCode")
-                
-                # 4. memberCode'u kontrol et
-                elif "memberCode" in item:
-                    member_code = item.get("memberCode", "")
-                    if member_code and member_code != "":
-                        item_symbol = member_code
-                
-                # 5. Hala UNKNOWN ise, raw JSON'u debug için kaydet
-                if item_symbol == "UNKNOWN":
-                    print(f"[DEBUG] Symbol bulunamadı - disclosureIndex: {disclosure_index}")
-                    print(f"[DEBUG] Mevcut alanlar: {list(item.keys())}")
-                
-                result = {
-                    "symbol": item_symbol,
-                    "disclosureIndex": disclosure_index,
-                    "publishDate": item.get("publishDate"),
-                    "disclosureClass": item.get("disclosureClass"),
-                    "ruleType": item.get("ruleType"),
-                    "subject": item.get("subject"),
-                    "summary": item.get("summary"),
-                    "isLate": item.get("isLate"),
-                    "period": item.get("period"),
-                    "year": item.get("year"),
-                    "term": item.get("term"),
-                    "index": item.get("index"),
-                    "srcCategory": item.get("srcCategory"),
-                    "url": f"https://www.kap.org.tr/tr/Bildirim/{disclosure_index}",
-                    "raw_json": json.dumps(item, ensure_ascii=False),
-                }
-                
-                # Sınıflandır
-                result["top_level_class"] = classify_disclosure(result)
-                
-                results.append(result)
-            
-            return results
+            return parse_disclosure_items(r.json())
             
         except Exception as e:
             print(f"[ERROR] {symbol}: {e}")
@@ -325,143 +228,118 @@ def ensure_disclosure_dir(symbol: str, disclosure_index: int) -> Path:
     disclosure_dir.mkdir(parents=True, exist_ok=True)
     return disclosure_dir
 
-def download_html(symbol: str, disclosure_index: int) -> Path | None:
+async def download_html(downloader: AsyncKapDownloader, symbol: str, disclosure_index: int) -> Path | None:
     disclosure_dir = ensure_disclosure_dir(symbol, disclosure_index)
     html_path = disclosure_dir / f"{disclosure_index}.html"
 
     if html_path.exists():
         return html_path
 
-    url = f"https://www.kap.org.tr/tr/Bildirim/{disclosure_index}"
-    html = robust_get(url, expect_binary=False)
-    if html is None:
+    url = f"{KAP_BASE_URL}/tr/Bildirim/{disclosure_index}"
+    store = get_blob_store()
+    sha = await store.fetch(downloader, url, expect_binary=False)
+    if sha is None:
         return None
 
-    html_path.write_text(html, encoding="utf-8")
-    return html_path
+    return store.link(sha, html_path)
 
-def download_form_pdf(symbol: str, disclosure_index: int) -> Path | None:
+async def download_form_pdf(downloader: AsyncKapDownloader, symbol: str, disclosure_index: int) -> Path | None:
     disclosure_dir = ensure_disclosure_dir(symbol, disclosure_index)
     pdf_path = disclosure_dir / f"{disclosure_index}_form.pdf"
 
     if pdf_path.exists():
         return pdf_path
 
-    pdf_url = f"https://www.kap.org.tr/tr/api/BildirimPdf/{disclosure_index}"
-    content = robust_get(pdf_url, expect_binary=True)
-    if content is None:
+    pdf_url = f"{KAP_BASE_URL}/tr/api/BildirimPdf/{disclosure_index}"
+    store = get_blob_store()
+    sha = await store.fetch(downloader, pdf_url, expect_binary=True)
+    if sha is None:
         return None
 
-    pdf_path.write_bytes(content)
-    return pdf_path
-
-def parse_attachments_from_html(html_text: str):
-    """HTML içinden /tr/api/file/download/.. linkleri ve label'larını listeler."""
-    attachments = []
-    for m in ATTACHMENT_RE.finditer(html_text):
-        href = m.group("href")
-        label = (m.group("label") or "").strip()
-        full_url = "https://www.kap.org.tr" + href
-        attachments.append({"url": full_url, "label": label})
-    return attachments
-
-def download_attachments(symbol: str, disclosure_index: int, attachments_meta: list[dict]) -> list[dict]:
-    """Ek PDF'leri indir"""
+    return store.link(sha, pdf_path)
+
+async def download_attachments(downloader: AsyncKapDownloader, symbol: str, disclosure_index: int, attachments_meta: list[dict]) -> list[dict]:
+    """Ek PDF'leri paralel indir (sıra korunur). Aynı URL/içerik blob deposunda tek kez durur."""
     disclosure_dir = ensure_disclosure_dir(symbol, disclosure_index)
-    downloaded = []
+    store = get_blob_store()
 
-    for i, att in enumerate(attachments_meta, start=1):
+    async def fetch_one(i: int, att: dict) -> dict | None:
         url = att["url"]
         label = att.get("label", "")
         local_path = disclosure_dir / f"{disclosure_index}_ek{i}.pdf"
 
+        sha = None
         if not local_path.exists():
-            content = robust_get(url, expect_binary=True)
-            if content is None:
+            sha = await store.fetch(downloader, url, expect_binary=True)
+            if sha is None:
                 print(f"[WARN] Ek PDF indirilemedi: {symbol} {disclosure_index} -> {url}")
-                continue
-            local_path.write_bytes(content)
+                return None
+            store.link(sha, local_path)
 
-        downloaded.append({
+        return {
             "url": url,
             "label": label,
             "local_path": str(local_path),
-        })
-
-    return downloaded
-
-def extract_text_from_html(html_path: Path) -> str:
-    """HTML'den temiz metin çıkarır"""
-    try:
-        html_content = html_path.read_text(encoding="utf-8", errors="ignore")
-        soup = BeautifulSoup(html_content, 'html.parser')
-        
-        # Script ve style taglerini kaldır
-        for script in soup(["script", "style"]):
-            script.decompose()
-        
-        # Metni al ve temizle
-        text = soup.get_text()
-        
-        # Fazla boşlukları temizle
-        lines = (line.strip() for line in text.splitlines())
-        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-        text = ' '.join(chunk for chunk in chunks if chunk)
-        
-        return text
-    except Exception as e:
-        print(f"[WARN] HTML metin çıkarma hatası: {e}")
-        return ""
-
-def extract_symbol_from_html(html_path: Path) -> str | None:
-    """HTML sayfasından sembol bilgisini çıkarır"""
-    try:
-        html_content = html_path.read_text(encoding="utf-8", errors="ignore")
-        soup = BeautifulSoup(html_content, 'html.parser')
-        
-        # 1. Meta tag'lerden sembol ara
-        meta_tags = soup.find_all('meta')
-        for meta in meta_tags:
-            if meta.get('name') == 'stockCode' or meta.get('property') == 'stockCode':
-                symbol = meta.get('content', '').strip()
-                if symbol:
-                    return symbol
-        
-        # 2. Başlıktan sembol ara (örn: "AEFES - Bildirim")
-        title = soup.find('title')
-        if title:
-            title_text = title.get_text().strip()
-            # Başlıkta genellikle "SYMBOL - ..." formatı var
-            if ' - ' in title_text:
-                potential_symbol = title_text.split(' - ')[0].strip()
-                # Sembol genellikle 4-6 karakter, büyük harf
-                if 3 <= len(potential_symbol) <= 6 and potential_symbol.isupper():
-                    return potential_symbol
-        
-        # 3. Sayfadaki "Şirket Kodu" veya benzeri etiketleri ara
-        for label in soup.find_all(['span', 'div', 'td', 'th']):
-            text = label.get_text().strip().lower()
-            if 'şirket kodu' in text or 'hisse kodu' in text or 'stock code' in text:
-                # Bir sonraki element'i kontrol et
-                next_elem = label.find_next(['span', 'div', 'td'])
-                if next_elem:
-                    symbol = next_elem.get_text().strip()
-                    if 3 <= len(symbol) <= 6 and symbol.isupper():
-                        return symbol
-        
-        return None
-    except Exception as e:
-        print(f"[WARN] HTML'den sembol çıkarma hatası: {e}")
-        return None
-
-
-def create_gemini_format(disclosure: dict, html_path: Path = None) -> dict:
-    """Gemini API için uygun formatta JSON oluşturur"""
+            "sha256": sha,
+        }
+
+    results = await asyncio.gather(*(
+        fetch_one(i, att) for i, att in enumerate(attachments_meta, start=1)
+    ))
+    return [r for r in results if r is not None]
+
+async def filter_attachments_by_size(downloader: AsyncKapDownloader, policy: DownloadPolicy, attachments_meta: list[dict]) -> tuple[list[dict], list[dict]]:
+    """
+    Politikanın ek boyut sınırını HEAD ile uygular. Blob deposunda zaten olan
+    URL'ler için HEAD atılmaz. (indirilecekler, atlananlar) döndürür.
+    """
+    if not attachments_meta or policy.max_attachment_bytes <= 0:
+        return attachments_meta, []
+    store = get_blob_store()
+
+    async def size_of(att: dict) -> int | None:
+        if store.lookup_url(att["url"]) is not None:
+            return None
+        return await downloader.head_size(att["url"])
+
+    sizes = await asyncio.gather(*(size_of(att) for att in attachments_meta))
+    allowed, skipped = [], []
+    for att, size in zip(attachments_meta, sizes):
+        if policy.attachment_allowed(size):
+            allowed.append(att)
+        else:
+            print(f"[POLICY] Ek atlandı ({size / (1024 * 1024):.1f} MB > sınır): {att['url']}")
+            skipped.append({**att, "size": size})
+    return allowed, skipped
+
+async def extract_pdf_texts(form_pdf_path: Path | None, attachments: list[dict]) -> list[dict]:
+    """Form PDF ve eklerin metnini süreç havuzunda çıkarır; sidecar kayıtlarını döndürür."""
+    extractor = get_pdf_extractor()
+    if not extractor.available:
+        return []
+
+    sources = [("form", form_pdf_path, None)] if form_pdf_path is not None else []
+    sources += [
+        (att.get("label") or Path(att["local_path"]).stem, Path(att["local_path"]), att.get("sha256"))
+        for att in attachments
+    ]
+    results = await asyncio.gather(*(extractor.extract(path, sha) for _, path, sha in sources))
+    return [{"source": label, **result} for (label, _, _), result in zip(sources, results) if result]
+
+def create_gemini_format(
+    disclosure: dict,
+    html_path: Path = None,
+    full_text: str | None = None,
+    stage: str = STAGE_COMPLETE,
+    enrichment: dict | None = None,
+) -> dict:
+    """Gemini API için uygun formatta JSON oluşturur (full_text verilirse HTML tekrar parse edilmez)"""
     
     # HTML'den metin çıkar
-    full_text = ""
-    if html_path and html_path.exists():
-        full_text = extract_text_from_html(html_path)
+    if full_text is None:
+        full_text = ""
+        if html_path and html_path.exists():
+            full_text = parse_disclosure_file(html_path)["text"]
     
     # Gemini formatı
     gemini_data = {
@@ -474,12 +352,27 @@ def create_gemini_format(disclosure: dict, html_path: Path = None) -> dict:
         "summary": disclosure.get("summary"),
         "fullText": full_text,
         "url": disclosure.get("url"),
+        "stage": stage,
     }
+    # kap_reextract bu damgaya bakarak yalnızca eskiyen kayıtları yeniden üretir
+    if html_path and html_path.exists():
+        gemini_data["extraction"] = extraction_stamp(sha256_file(html_path))
+    if enrichment:
+        gemini_data.update(enrichment)
     
     return gemini_data
 
-def save_gemini_format(disclosure: dict, html_path: Path = None):
-    """Gemini formatında JSON'u daily_data_kap/gemini/ altına kaydeder"""
+def save_gemini_format(
+    disclosure: dict,
+    html_path: Path = None,
+    full_text: str | None = None,
+    stage: str = STAGE_COMPLETE,
+    enrichment: dict | None = None,
+):
+    """
+    Gemini formatında JSON'u daily_data_kap/gemini/ altına kaydeder ve kuyruğa yayınlar.
+    stage=analyzable: ekler arkadan gelecek; stage=enriched: ekler geldi (TOPIC_ENRICHED).
+    """
     disclosure_index = disclosure.get("disclosureIndex")
     symbol = disclosure.get("symbol", "UNKNOWN")
     
@@ -488,131 +381,522 @@ def save_gemini_format(disclosure: dict, html_path: Path = None):
     gemini_dir.mkdir(parents=True, exist_ok=True)
     
     # Gemini formatında JSON oluştur
-    gemini_data = create_gemini_format(disclosure, html_path)
+    gemini_data = create_gemini_format(disclosure, html_path, full_text, stage, enrichment)
     
     # Kaydet - dosya adı: {symbol}_{disclosureIndex}_gemini.json
+    # Zenginleştirmede dosya analizör okurken yeniden yazılabilir: tmp + replace
     gemini_path = gemini_dir / f"{symbol}_{disclosure_index}_gemini.json"
-    gemini_path.write_text(json.dumps(gemini_data, ensure_ascii=False, indent=2), encoding="utf-8")
+    tmp_path = gemini_path.with_suffix(".json.tmp")
+    tmp_path.write_text(json.dumps(gemini_data, ensure_ascii=False, indent=2), encoding="utf-8")
+    tmp_path.replace(gemini_path)
+
+    # Analizörler klasörü taramak yerine kuyruktan çeker (kap_queue)
+    payload = {
+        "path": str(gemini_path),
+        "disclosureIndex": disclosure_index,
+        "symbol": symbol,
+        "stage": stage,
+    }
+    if stage == STAGE_ENRICHED:
+        get_queue().enqueue(TOPIC_ENRICHED, str(disclosure_index), {**payload, **(enrichment or {})})
+    else:
+        get_queue().enqueue(TOPIC_GEMINI, str(disclosure_index), payload)
     
     return gemini_path
 
-def process_single_disclosure(disclosure: dict):
-    """Bir bildirim için tüm dosyaları indir ve JSON kaydet"""
+# ==========================
+# AŞAMALAR (ANALYZABLE -> ENRICHED)
+# ==========================
+# 1) analyzable: metadata + HTML metni hazır olur olmaz gemini JSON yayınlanır
+#    (TOPIC_GEMINI); analizörler PDF'leri beklemez.
+# 2) enriched:   form PDF ve ekler arkadan iner; detail JSON ve manifest
+#    tamamlanır, isteyen tüketiciler için TOPIC_ENRICHED olayı yayınlanır.
+# Arada manifest'te bildirim "partial" durur; süreç bu noktada ölürse bildirim
+# tekrar işlenir (HTML blob deposundan gelir, kuyruk mesajı tekrar eklenmez).
+#
+# guard (kap_workers): gemini JSON / manifest / kuyruk yazılmadan hemen önce
+# çağrılır; False dönerse (lease başka worker'a geçti) LeaseLost ile bırakılır.
+
+def check_guard(guard: Callable[[], bool] | None, disclosure_index: int):
+    if guard is not None and not guard():
+        raise LeaseLost(f"{disclosure_index} lease'i kaybedildi, sonuç yazılmadı")
+
+async def publish_analyzable(
+    downloader: AsyncKapDownloader,
+    disclosure: dict,
+    guard: Callable[[], bool] | None = None,
+) -> dict | None:
+    """
+    Aşama 1. Bildirim zaten tamamsa None; değilse zenginleştirme aşamasının
+    ihtiyaç duyduğu durumu döndürür.
+    """
     symbol = disclosure["symbol"]
     disclosure_index = int(disclosure["disclosureIndex"])
+    manifest = get_manifest()
     
-    # İlk klasör oluşturma (geçici, sembol değişebilir)
-    disclosure_dir = ensure_disclosure_dir(symbol, disclosure_index)
-    json_path = disclosure_dir / f"{disclosure_index}_detail.json"
-    
-    if json_path.exists():
+    if manifest.has(disclosure_index):
         print(f"[SKIP] {symbol} {disclosure_index} -> zaten var")
-        return
-
-    print(f"[INFO] İşleniyor: {symbol} {disclosure_index} ({disclosure.get('top_level_class')})")
-
-    # 1) HTML
-    html_path = download_html(symbol, disclosure_index)
-    html_text = None
-    attachments_meta = []
-    
-    # Eğer sembol UNKNOWN ise, HTML'den çıkarmayı dene
-    if symbol == "UNKNOWN" and html_path is not None:
-        extracted_symbol = extract_symbol_from_html(html_path)
-        if extracted_symbol:
-            print(f"[INFO] HTML'den sembol bulundu: {extracted_symbol}")
-            old_symbol = symbol
-            symbol = extracted_symbol
-            disclosure["symbol"] = symbol
-            
-            # Klasör yapısını güncelle
-            old_dir = DAILY_DATA_DIR / old_symbol / str(disclosure_index)
-            new_dir = DAILY_DATA_DIR / symbol / str(disclosure_index)
-            
-            # Yeni klasörü oluştur
-            new_dir.mkdir(parents=True, exist_ok=True)
-            
-            # Eski klasördeki dosyaları taşı
-            if old_dir.exists() and old_dir != new_dir:
-                for item in old_dir.iterdir():
-                    shutil.move(str(item), str(new_dir / item.name))
-                # Eski klasörü sil
-                old_dir.rmdir()
-                # Eğer UNKNOWN klasörü boşsa onu da sil
-                unknown_parent = DAILY_DATA_DIR / old_symbol
-                if unknown_parent.exists() and not any(unknown_parent.iterdir()):
-                    unknown_parent.rmdir()
-            
-            # Güncellenmiş yolları kullan
-            disclosure_dir = new_dir
-            json_path = disclosure_dir / f"{disclosure_index}_detail.json"
-            html_path = disclosure_dir / f"{disclosure_index}.html"
+        return None
     
-    if html_path is not None:
-        try:
-            html_text = html_path.read_text(encoding="utf-8", errors="ignore")
-            attachments_meta = parse_attachments_from_html(html_text)
-        except Exception as e:
-            print(f"[WARN] HTML parse hata: {symbol} {disclosure_index} -> {e}")
+    # Bildirim klasörü (sembol indirmeden önce çözüldü, taşıma yok)
+    ensure_disclosure_dir(symbol, disclosure_index)
+
+    # İndirme politikası (kap_policy): metadata / html / full
+    policy = get_policy()
+    action, reason = policy.decide(disclosure)
+    print(f"[INFO] İşleniyor: {symbol} {disclosure_index} ({disclosure.get('top_level_class')}, {action})")
+
+    html_path, parsed, attachments_meta = None, None, []
+
+    # HTML
+    if action == ACTION_METADATA:
+        # Ek sayısı HTML olmadan bilinmez; kaçınılan istek en az HTML + form PDF
+        policy.record_avoided(2, manifest_average_size("html") + manifest_average_size("form_pdf"))
+    else:
+        html_path = await download_html(downloader, symbol, disclosure_index)
+
+        # HTML tek sefer parse edilir: sembol, ekler, metin ve tablolar aynı ağaçtan
+        parsed = parse_disclosure_file(html_path, KAP_BASE_URL) if html_path is not None else None
+        attachments_meta = parsed["attachments"] if parsed else []
+    
+    # Çözücü bulamadıysa HTML'den gelen sembolü yalnızca kayıtlara yaz (dosyalar yerinde kalır)
+    if symbol == "UNKNOWN" and parsed is not None and parsed["symbol"]:
+        print(f"[INFO] HTML'den sembol bulundu: {parsed['symbol']}")
+        disclosure["symbol"] = parsed["symbol"]
+
+    # Analizörler için gereken her şey (metadata + HTML metni) hazır: hemen yayınla
+    stage = STAGE_ANALYZABLE if action == ACTION_FULL else STAGE_COMPLETE
+    full_text = parsed["text"] if parsed else ""
+    check_guard(guard, disclosure_index)
+    gemini_path = save_gemini_format(disclosure, html_path, full_text, stage=stage)
+
+    state = {
+        "disclosure": disclosure,
+        "symbol": symbol,
+        "disclosure_index": disclosure_index,
+        "action": action,
+        "reason": reason,
+        "html_path": html_path,
+        "parsed": parsed,
+        "full_text": full_text,
+        "attachments_meta": attachments_meta,
+        "gemini_path": gemini_path,
+        "guard": guard,
+    }
 
-    # 2) Form PDF
-    form_pdf_path = download_form_pdf(symbol, disclosure_index)
+    if stage == STAGE_ANALYZABLE:
+        manifest.record_disclosure(
+            disclosure,
+            [file_record("html", html_path, url=disclosure.get("url")), file_record("gemini", gemini_path)],
+            {
+                "html": ("done" if html_path is not None else "failed", None),
+                "gemini": ("done", STAGE_ANALYZABLE),
+                "form_pdf": ("pending", None),
+                "attachments": ("pending", None),
+            },
+            status=STATUS_PARTIAL,
+            gemini_path=gemini_path,
+        )
+    return state
+
+async def enrich_disclosure(downloader: AsyncKapDownloader, state: dict) -> bool:
+    """Aşama 2. Form PDF + ekler, detail JSON, manifest (done) ve enriched olayı."""
+    disclosure = state["disclosure"]
+    symbol, disclosure_index = state["symbol"], state["disclosure_index"]
+    action, reason = state["action"], state["reason"]
+    html_path, parsed = state["html_path"], state["parsed"]
+    attachments_meta = state["attachments_meta"]
+    gemini_path = state["gemini_path"]
+    policy = get_policy()
 
-    # 3) Ek PDF'ler
-    attachments_downloaded = []
-    if attachments_meta:
-        attachments_downloaded = download_attachments(symbol, disclosure_index, attachments_meta)
+    disclosure_dir = ensure_disclosure_dir(symbol, disclosure_index)
+    json_path = disclosure_dir / f"{disclosure_index}_detail.json"
 
-    # 4) JSON gövde
+    form_pdf_path, attachments_downloaded, attachments_skipped, pdf_texts = None, [], [], []
+    skipped = ("skipped", reason)
+
+    # Form PDF + Ek PDF'ler (aynı anda)
+    if action == ACTION_HTML:
+        policy.record_avoided(
+            1 + len(attachments_meta),
+            manifest_average_size("form_pdf") + manifest_average_size("attachment") * len(attachments_meta),
+        )
+    elif action == ACTION_FULL:
+        allowed, attachments_skipped = await filter_attachments_by_size(downloader, policy, attachments_meta)
+        form_pdf_path, attachments_downloaded = await asyncio.gather(
+            download_form_pdf(downloader, symbol, disclosure_index),
+            download_attachments(downloader, symbol, disclosure_index, allowed),
+        )
+        pdf_texts = await extract_pdf_texts(form_pdf_path, attachments_downloaded)
+
+        # Zenginleştirilmiş gemini JSON + TOPIC_ENRICHED olayı
+        check_guard(state.get("guard"), disclosure_index)
+        gemini_path = save_gemini_format(
+            disclosure, html_path, state["full_text"],
+            stage=STAGE_ENRICHED,
+            enrichment={
+                "form_pdf_path": str(form_pdf_path) if form_pdf_path is not None else None,
+                "attachments": [{"label": a["label"], "local_path": a["local_path"]} for a in attachments_downloaded],
+                "pdf_texts": pdf_texts,
+            },
+        )
+
+    # JSON gövde
     detail_obj = {
         **disclosure,
         "html_path": str(html_path) if html_path is not None else None,
         "form_pdf_path": str(form_pdf_path) if form_pdf_path is not None else None,
         "attachments": attachments_downloaded,
+        "attachments_skipped": attachments_skipped,
+        "pdf_texts": pdf_texts,
+        "download_policy": {"action": action, "reason": reason},
+        "tables": parsed["tables"] if parsed else [],
     }
 
+    check_guard(state.get("guard"), disclosure_index)
     json_path.write_text(json.dumps(detail_obj, ensure_ascii=False, indent=2), encoding="utf-8")
-    
-    # 5) Gemini formatında da kaydet
-    gemini_path = save_gemini_format(disclosure, html_path)
+
+    # Manifest (tek transaction)
+    files = [
+        file_record("detail", json_path),
+        file_record("html", html_path, url=disclosure.get("url")),
+        file_record("form_pdf", form_pdf_path),
+        file_record("gemini", gemini_path),
+    ]
+    for seq, att in enumerate(attachments_downloaded, start=1):
+        files.append(file_record("attachment", att["local_path"], url=att["url"], seq=seq))
+    for seq, text in enumerate(pdf_texts):
+        files.append(file_record("pdf_text", text["path"], seq=seq))
+    if action != ACTION_FULL:
+        pdf_text_stage = skipped
+    elif not get_pdf_extractor().available:
+        pdf_text_stage = ("skipped", "pypdf yok")
+    else:
+        pdf_count = (form_pdf_path is not None) + len(attachments_downloaded)
+        truncated = sum(1 for t in pdf_texts if t["truncated"])
+        pdf_text_stage = (
+            "done" if len(pdf_texts) == pdf_count else "partial",
+            f"{len(pdf_texts)}/{pdf_count}" + (f" ({truncated} bütçe/hata ile kesildi)" if truncated else ""),
+        )
+    expected_attachments = len(attachments_meta) - len(attachments_skipped)
+    stages = {
+        "html": skipped if action == ACTION_METADATA else ("done" if html_path is not None else "failed", None),
+        "form_pdf": skipped if action != ACTION_FULL else ("done" if form_pdf_path is not None else "failed", None),
+        "attachments": skipped if action != ACTION_FULL else (
+            "done" if len(attachments_downloaded) == expected_attachments else "partial",
+            f"{len(attachments_downloaded)}/{expected_attachments}"
+            + (f" ({len(attachments_skipped)} boyut sınırı)" if attachments_skipped else ""),
+        ),
+        "pdf_text": pdf_text_stage,
+        "gemini": ("done", STAGE_ENRICHED if action == ACTION_FULL else None),
+    }
+    get_manifest().record_disclosure(
+        disclosure, files, stages,
+        status=STATUS_DONE,
+        detail_path=json_path,
+        gemini_path=gemini_path,
+    )
     
     print(f"[OK] Kaydedildi: {json_path}")
     print(f"[OK] Gemini format: {gemini_path}")
+    return True
+
+async def process_single_disclosure(
+    downloader: AsyncKapDownloader,
+    disclosure: dict,
+    guard: Callable[[], bool] | None = None,
+):
+    """Bir bildirim için iki aşamayı sırayla çalıştırır (gemini JSON PDF'lerden önce yayınlanır)."""
+    state = await publish_analyzable(downloader, disclosure, guard=guard)
+    if state is None:
+        return True
+    return await enrich_disclosure(downloader, state)
+
+def make_downloader(
+    rate_per_host: float | None = None,
+    burst: int | None = None,
+    budget: SharedBudget | None = None,
+) -> AsyncKapDownloader:
+    """
+    Pipeline ayarlarıyla indirici; tek örnek paylaşılırsa host bütçesi de ortak olur.
+    budget verilirse bütçe aynı dosyayı kullanan tüm süreçlerle paylaşılır (kap_workers).
+    """
+    return AsyncKapDownloader(
+        create_browser_session,
+        concurrency=DOWNLOAD_CONCURRENCY,
+        rate_per_host=RATE_PER_HOST if rate_per_host is None else rate_per_host,
+        burst=RATE_BURST if burst is None else burst,
+        budget=budget,
+    )
+
+async def download_disclosures(
+    disclosures: list[dict],
+    workers: int = DOWNLOAD_WORKERS,
+    downloader: AsyncKapDownloader | None = None,
+) -> tuple[dict, set[int]]:
+    """
+    Bildirimleri worker havuzunda paralel işler. Worker'lar yalnızca analyzable
+    aşamasını (HTML + gemini) yürütür; PDF'ler ayrı bir havuzda arkadan iner,
+    böylece büyük bir ek sonraki bildirimin yayınını geciktirmez.
+    İndirici istatistiklerini ve başarıyla işlenen disclosureIndex'leri döndürür.
+    downloader verilirse onu kullanır (ve kapatmaz).
+    """
+    owns_downloader = downloader is None
+    if owns_downloader:
+        downloader = make_downloader()
+    total = len(disclosures)
+    succeeded: set[int] = set()
+    enrich_sem = asyncio.Semaphore(max(1, workers))
+    enrich_tasks: list[asyncio.Task] = []
+
+    def log_error(disclosure: dict, e: Exception):
+        symbol = disclosure.get("symbol", "?")
+        disc_idx = disclosure.get("disclosureIndex", "?")
+        print(f"[ERROR] {symbol} {disc_idx} işlenirken hata: {e}")
+
+    async def enrich(disclosure: dict, state: dict):
+        async with enrich_sem:
+            try:
+                if await enrich_disclosure(downloader, state):
+                    succeeded.add(int(disclosure["disclosureIndex"]))
+            except Exception as e:
+                log_error(disclosure, e)
+
+    async def handle(i: int, disclosure: dict):
+        print(f"\n[{i}/{total}]", end=" ")
+        try:
+            state = await publish_analyzable(downloader, disclosure)
+        except Exception as e:
+            log_error(disclosure, e)
+            return
+        if state is None:
+            succeeded.add(int(disclosure["disclosureIndex"]))
+            return
+        enrich_tasks.append(asyncio.create_task(enrich(disclosure, state)))
 
-    time.sleep(random.uniform(0.5, 1.5))
+    try:
+        await run_worker_pool(disclosures, handle, workers=workers)
+        await asyncio.gather(*enrich_tasks)
+    finally:
+        if owns_downloader:
+            downloader.close()
+    return downloader.stats, succeeded
 
 # ==========================
-# DEDUPLICATION
+# MANIFEST
 # ==========================
+# Dedup kontrolü klasör taraması yerine manifest'te indeksli sorgu ile yapılır.
+# Mevcut ağacı içe aktarmak için: python kap_manifest.py rebuild
+
+_manifest: DisclosureManifest | None = None
+
+def get_manifest() -> DisclosureManifest:
+    global _manifest
+    if _manifest is None or _manifest.path != MANIFEST_FILE:
+        _manifest = DisclosureManifest(MANIFEST_FILE)
+    return _manifest
+
+# Sembol çözücü (kap_symbols): mapping dosyası + Mongo tickers, periyodik yenilenir.
+_symbol_resolver: SymbolResolver | None = None
+
+def get_symbol_resolver() -> SymbolResolver:
+    global _symbol_resolver
+    if _symbol_resolver is None:
+        _symbol_resolver = SymbolResolver(MAPPING_FILE)
+    return _symbol_resolver
+
+# İndirme politikası (kap_policy): settings.toml değişince yeniden yüklenir.
+_policy: DownloadPolicy | None = None
+_policy_mtime: float | None = None
+
+def get_policy() -> DownloadPolicy:
+    global _policy, _policy_mtime
+    mtime = SETTINGS_FILE.stat().st_mtime if SETTINGS_FILE.exists() else None
+    if _policy is None or mtime != _policy_mtime:
+        previous = _policy
+        _policy = load_policy(SETTINGS_FILE)
+        if previous is not None:
+            _policy.stats = previous.stats  # sayaçlar yeniden yüklemede sıfırlanmasın
+        _policy_mtime = mtime
+    return _policy
+
+_average_sizes: dict[str, int] = {}
+
+def manifest_average_size(kind: str) -> int:
+    """Politika tasarruf tahmini için dosya türü ortalaması (süreç başına bir kez sorgulanır)."""
+    if kind not in _average_sizes:
+        _average_sizes[kind] = get_manifest().average_size(kind)
+    return _average_sizes[kind]
+
+# İçerik adresli depo (kap_blobstore): bildirim klasörleri blob'lara referans tutar.
+_blob_store: BlobStore | None = None
+
+def get_blob_store() -> BlobStore:
+    global _blob_store
+    if _blob_store is None or _blob_store.root != BLOB_DIR:
+        _blob_store = BlobStore(BLOB_DIR)
+    return _blob_store
+
+# İş kuyruğu (kap_queue): yeni gemini JSON'ları analizörlere buradan dağıtılır.
+_queue: WorkQueue | None = None
+
+def get_queue() -> WorkQueue:
+    global _queue
+    if _queue is None or _queue.path != QUEUE_FILE:
+        _queue = WorkQueue(QUEUE_FILE)
+    return _queue
+
+# PDF metin çıkarma (kap_pdftext): CPU sayısı kadar süreç, sayfa bazlı önbellek.
+_pdf_extractor: PdfTextExtractor | None = None
+
+def get_pdf_extractor() -> PdfTextExtractor:
+    global _pdf_extractor
+    if _pdf_extractor is None or _pdf_extractor.cache.path != PDFTEXT_CACHE_FILE:
+        _pdf_extractor = PdfTextExtractor(PDFTEXT_CACHE_FILE)
+        if not _pdf_extractor.available:
+            print("[WARN] pypdf kurulu değil, PDF metin çıkarma atlanacak (pip install pypdf)")
+    return _pdf_extractor
 
-def get_existing_disclosure_indices() -> set[int]:
-    """Yerel olarak zaten indirilmiş bildirimlerin disclosureIndex'lerini döndürür"""
-    existing_indices = set()
-    
-    if not DAILY_DATA_DIR.exists():
-        return existing_indices
-    
-    # Tüm sembol klasörlerini tara
-    for symbol_dir in DAILY_DATA_DIR.iterdir():
-        if not symbol_dir.is_dir() or symbol_dir.name == "gemini":
-            continue
-        
-        # Her sembol altındaki disclosure klasörlerini tara
-        for disclosure_dir in symbol_dir.iterdir():
-            if not disclosure_dir.is_dir():
-                continue
-            
-            try:
-                disclosure_index = int(disclosure_dir.name)
-                # JSON dosyası varsa bu bildirim zaten indirilmiş demektir
-                json_path = disclosure_dir / f"{disclosure_index}_detail.json"
-                if json_path.exists():
-                    existing_indices.add(disclosure_index)
-            except ValueError:
-                # Klasör adı sayı değilse atla
-                continue
-    
-    return existing_indices
+# ==========================
+# WATERMARK (HIGH-WATER MARK)
+# ==========================
+# Son görülen disclosureIndex ve yayın zamanı diske yazılır; her döngü
+# sadece bu işaretin üstündeki bildirimleri işler. Restart ve gün
+# dönümünde işaret korunur.
+
+WATERMARK_FILE = DAILY_DATA_DIR / "pipeline_watermark.json"
+MAX_DISCLOSURE_ATTEMPTS = 5  # Bu kadar başarısız denemeden sonra bildirim atlanır
+
+def parse_publish_date(value) -> datetime | None:
+    """KAP publishDate ("30.12.2025 19:10:53") -> datetime"""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(str(value).strip(), "%d.%m.%Y %H:%M:%S")
+    except ValueError:
+        return None
+
+def load_watermark() -> dict:
+    """Kayıtlı watermark'ı okur; yoksa boş dict döner."""
+    if not WATERMARK_FILE.exists():
+        return {}
+    try:
+        return json.loads(WATERMARK_FILE.read_text(encoding="utf-8"))
+    except Exception as e:
+        print(f"[WARN] Watermark okunamadı, sıfırdan başlanacak: {e}")
+        return {}
+
+def save_watermark(mark: dict):
+    """Atomic yazma: önce tmp sonra replace."""
+    WATERMARK_FILE.parent.mkdir(parents=True, exist_ok=True)
+    mark["updated_at"] = datetime.now().isoformat(timespec="seconds")
+    tmp = WATERMARK_FILE.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(mark, ensure_ascii=False, indent=2), encoding="utf-8")
+    tmp.replace(WATERMARK_FILE)
+
+def target_dates_for_cycle(mark: dict, now: datetime | None = None) -> list[str]:
+    """
+    Kayan pencere: her zaman bugün; watermark'ın yayın tarihi bugünden
+    eskiyse (gece yarısı dönümü / restart) dünü de ekle.
+    """
+    now = now or datetime.now()
+    today = now.strftime("%Y-%m-%d")
+    last_publish = parse_publish_date(mark.get("last_publish_date"))
+
+    if last_publish is None or last_publish.date() >= now.date():
+        return [today]
+    yesterday = (now - timedelta(days=1)).strftime("%Y-%m-%d")
+    return [yesterday, today]
+
+def advance_watermark(mark: dict, new_disclosures: list[dict], succeeded: set[int]) -> dict:
+    """
+    Watermark'ı, sıralı listede ilk başarısız bildirime kadar ilerletir;
+    böylece başarısız bir bildirim sonraki döngüde tekrar denenir.
+    MAX_DISCLOSURE_ATTEMPTS kez başarısız olan bildirim atlanır.
+    """
+    failures = mark.setdefault("failures", {})
+
+    for disc in sorted(new_disclosures, key=lambda d: int(d["disclosureIndex"])):
+        idx = int(disc["disclosureIndex"])
+        if idx not in succeeded:
+            attempts = failures.get(str(idx), 0) + 1
+            failures[str(idx)] = attempts
+            if attempts < MAX_DISCLOSURE_ATTEMPTS:
+                break
+            print(f"[WARN] {idx} {attempts} denemede işlenemedi, watermark üzerinden atlanıyor")
+
+        failures.pop(str(idx), None)
+        mark["last_index"] = max(idx, int(mark.get("last_index", 0)))
+        published = parse_publish_date(disc.get("publishDate"))
+        current = parse_publish_date(mark.get("last_publish_date"))
+        if published and (current is None or published > current):
+            mark["last_publish_date"] = disc.get("publishDate")
+
+    return mark
+
+# ==========================
+# GAP TESPİTİ (CATCH-UP)
+# ==========================
+# Süreç kapalıyken yayınlanan bildirimler, hedef tarih penceresine düşmüyorsa
+# kaybolur. Manifest'teki disclosureIndex dizisindeki boşluklar bulunur ve
+# byCriteria'nın disclosureIndexList alanıyla toplu sorgulanır (en yeni önce).
+# Sorgulanıp dönmeyen index'ler (başka üye tipleri) bir daha sorulmaz.
+
+GAP_LOOKBACK = 3000              # En büyük index'ten geriye bakılacak aralık
+GAP_BATCH_SIZE = 100             # Tek istekte sorgulanan index sayısı
+GAP_MAX_BATCHES_PER_CYCLE = 5    # Döngü başına en fazla istek (canlı akışı aç bırakmamak için)
+GAP_LOOKBACK_DAYS = 30           # Sorgunun tarih penceresi
+
+async def catch_up_gaps(
+    max_batches: int = GAP_MAX_BATCHES_PER_CYCLE,
+    lookback: int = GAP_LOOKBACK,
+    downloader: AsyncKapDownloader | None = None,
+) -> dict:
+    """
+    Boşlukları en yeniden eskiye doğru toplu sorgulayıp indirir; özet döndürür.
+    downloader verilirse onu kullanır (ve kapatmaz).
+    """
+    manifest = get_manifest()
+    gaps = manifest.missing_indices(lookback)
+    summary = {"gaps": len(gaps), "queried": 0, "found": 0, "recovered": 0}
+    if not gaps:
+        return summary
+
+    print(f"\n[GAP] {len(gaps)} boşluk bulundu (en yeni: {gaps[0]}, en eski: {gaps[-1]})")
+    now = datetime.now()
+    from_date = (now - timedelta(days=GAP_LOOKBACK_DAYS)).strftime("%Y-%m-%d")
+    to_date = now.strftime("%Y-%m-%d")
+
+    owns_downloader = downloader is None
+    if owns_downloader:
+        downloader = make_downloader()
+    try:
+        for start in range(0, min(len(gaps), max_batches * GAP_BATCH_SIZE), GAP_BATCH_SIZE):
+            batch = set(gaps[start:start + GAP_BATCH_SIZE])
+            data = await downloader.post_json(BY_CRITERIA_URL, build_criteria_payload(from_date, to_date, batch))
+            if data is None:
+                print("[GAP] Sorgu başarısız, bir sonraki döngüde devam edilecek")
+                break
+
+            # API listeyi yok sayarsa diye yalnızca istediğimiz index'leri al
+            found = [d for d in parse_disclosure_items(data) if int(d.get("disclosureIndex") or 0) in batch]
+            found_indices = {int(d["disclosureIndex"]) for d in found}
+            summary["queried"] += len(batch)
+            summary["found"] += len(found)
+
+            if found:
+                print(f"[GAP] {len(found)} kayıp bildirim bulundu ({max(found_indices)} ... {min(found_indices)}), indiriliyor")
+                _, succeeded = await download_disclosures(found, downloader=downloader)
+                summary["recovered"] += len(succeeded)
+
+            # Bulunamayanlar bizim üye tipimize ait değil; bulunup işlenemeyenler boşluk olarak kalır
+            manifest.mark_gaps_checked(batch - found_indices)
+    finally:
+        if owns_downloader:
+            downloader.close()
+
+    print(f"[GAP] {summary['queried']} index sorgulandı, {summary['found']} bulundu, {summary['recovered']} kurtarıldı")
+    return summary
 
 # ==========================
 # MAIN
@@ -627,11 +911,13 @@ def main():
 
     while True:
         try:
-            target_date = datetime(2026,1,3).strftime("%Y-%m-%d")
-            print(f"\n[{datetime.now().strftime('%H:%M:%S')}] Döngü başlıyor. Hedef tarih: {target_date}")
-            
-            # Run the daily fetch logic
-            run_daily_cycle(target_date)
+            mark = load_watermark()
+            for target_date in target_dates_for_cycle(mark):
+                print(f"\n[{datetime.now().strftime('%H:%M:%S')}] Döngü başlıyor. Hedef tarih: {target_date} (watermark: {mark.get('last_index', '-')})")
+                mark = run_daily_cycle(target_date, mark)
+
+            # Kesinti sonrası kalan boşlukları (en yeni önce) kapat
+            asyncio.run(catch_up_gaps())
             
             print(f"\n[{datetime.now().strftime('%H:%M:%S')}] Döngü tamamlandı. 5 dakika bekleniyor...")
         except Exception as e:
@@ -640,12 +926,11 @@ def main():
             
         time.sleep(300)  # 5 dakika bekle
 
-def run_daily_cycle(target_date):
-    # Önce yerel olarak zaten indirilmiş bildirimleri tespit et
-    print("\n[INFO] Yerel olarak mevcut bildirimler kontrol ediliyor...")
-    existing_indices = get_existing_disclosure_indices()
-    print(f"[INFO] {len(existing_indices)} bildirim zaten mevcut")
-    
+def run_daily_cycle(target_date, mark: dict | None = None) -> dict:
+    """Bir tarih için watermark'ın üstündeki bildirimleri işler, güncel watermark'ı döndürür."""
+    mark = dict(mark if mark is not None else load_watermark())
+    last_index = mark.get("last_index")
+
     # Bildirimleri bir kez çek (tüm semboller için)
     print(f"\n[INFO] {target_date} tarihindeki TÜM bildirimler çekiliyor...")
     
@@ -653,15 +938,29 @@ def run_daily_cycle(target_date):
     
     if not all_disclosures:
         print(f"\n[WARN] {target_date} tarihinde hiç bildirim bulunamadı!")
-        return
+        return mark
     
     print(f"\n[INFO] API'den toplam {len(all_disclosures)} bildirim bulundu")
     
-    # Zaten indirilmiş olanları filtrele
-    new_disclosures = [
-        disc for disc in all_disclosures 
-        if int(disc.get("disclosureIndex", 0)) not in existing_indices
-    ]
+    if last_index is None:
+        # İlk çalıştırma: watermark yok, manifest'ten dedup yap
+        print("\n[INFO] Watermark yok, manifest'te mevcut bildirimler kontrol ediliyor...")
+        existing_indices = get_manifest().existing_indices(
+            int(d.get("disclosureIndex", 0)) for d in all_disclosures
+        )
+        print(f"[INFO] {len(existing_indices)} bildirim zaten mevcut")
+        new_disclosures = [
+            disc for disc in all_disclosures 
+            if int(disc.get("disclosureIndex", 0)) not in existing_indices
+        ]
+    else:
+        # Sadece watermark'ın üstündeki delta (+ tekrar denenecek başarısızlar)
+        retry = {int(k) for k in mark.get("failures", {})}
+        new_disclosures = [
+            disc for disc in all_disclosures
+            if int(disc.get("disclosureIndex", 0)) > int(last_index)
+            or int(disc.get("disclosureIndex", 0)) in retry
+        ]
     
     skipped_count = len(all_disclosures) - len(new_disclosures)
     print(f"[INFO] {skipped_count} bildirim zaten mevcut (atlandı)")
@@ -669,7 +968,11 @@ def run_daily_cycle(target_date):
     
     if not new_disclosures:
         print("\n[INFO] İşlenecek yeni bildirim yok!")
-        return
+        if last_index is None:
+            # Her şey zaten yerelde: watermark'ı listenin sonuna oturt
+            mark = advance_watermark(mark, all_disclosures, {int(d["disclosureIndex"]) for d in all_disclosures})
+            save_watermark(mark)
+        return mark
     
     # Sınıf bazında özet (sadece yeni bildirimler için)
     class_counts = {}
@@ -686,21 +989,77 @@ def run_daily_cycle(target_date):
     print("YENİ BİLDİRİMLER İNDİRİLİYOR")
     print("=" * 80)
     
-    for i, disclosure in enumerate(new_disclosures, 1):
-        print(f"\n[{i}/{len(new_disclosures)}]", end=" ")
-        try:
-            process_single_disclosure(disclosure)
-        except Exception as e:
-            symbol = disclosure.get("symbol", "?")
-            disc_idx = disclosure.get("disclosureIndex", "?")
-            print(f"[ERROR] {symbol} {disc_idx} işlenirken hata: {e}")
+    started = time.monotonic()
+    stats, succeeded = asyncio.run(download_disclosures(new_disclosures))
+    elapsed = time.monotonic() - started
+
+    mark = advance_watermark(mark, new_disclosures, succeeded)
+    save_watermark(mark)
     
     print("\n" + "=" * 80)
     print("TAMAMLANDI!")
     print("=" * 80)
-    print(f"Toplam {len(new_disclosures)} yeni bildirim işlendi")
+    print(f"Toplam {len(succeeded)}/{len(new_disclosures)} yeni bildirim işlendi ({elapsed:.1f}s)")
+    print(f"HTTP: {stats['requests']} istek, {stats['failed']} başarısız, {stats['cooldowns']} cooldown")
+    print(f"Watermark: {mark.get('last_index')} ({mark.get('last_publish_date')})")
+    print(f"Sembol çözücü: {get_symbol_resolver().stats}")
+    print_policy_report(get_policy().stats)
+    print_pdftext_report(get_pdf_extractor().stats)
+    print_blob_report(get_blob_store().daily_report())
     print(f"Klasör: {DAILY_DATA_DIR}")
     print("=" * 80)
+    return mark
+
+def cli():
+    """
+    Argümansız: sürekli döngü. `backfill --from --to`: geçmiş tarih aralığı, `live`: canlı mod,
+    `compact`: kapanmış günleri günlük pakete taşı, `reextract`: gemini JSON'larını HTML'den yenile,
+    `worker`: ortak kuyruktan lease ile iş alan worker (aynı makinede birden fazla süreç).
+    """
+    parser = argparse.ArgumentParser(description="KAP veri toplama pipeline")
+    sub = parser.add_subparsers(dest="command")
+    p_backfill = sub.add_parser("backfill", help="Tarih aralığını parçalara bölüp geçmiş bildirimleri indir")
+    p_catchup = sub.add_parser("catchup", help="disclosureIndex boşluklarını bulup kapat")
+    p_catchup.add_argument("--lookback", type=int, default=GAP_LOOKBACK)
+    p_catchup.add_argument("--batches", type=int, default=GAP_MAX_BATCHES_PER_CYCLE)
+    p_live = sub.add_parser("live", help="Seans saatlerine göre sık yoklayan canlı mod")
+    p_compact = sub.add_parser("compact", help="Kapanmış günleri daily_data_kap/archive paketlerine taşı")
+    p_compact.add_argument("--keep-days", type=int, default=None, help="Açık bırakılan son gün sayısı")
+    p_compact.add_argument("--dry-run", action="store_true")
+    p_reextract = sub.add_parser("reextract", help="Eskiyen gemini JSON'larını saklanan HTML'den yeniden üret")
+    p_worker = sub.add_parser(
+        "worker", help="Ortak kuyruktan lease ile bildirim işleyen worker (tek makine, yerel disk)"
+    )
+
+    from kap_backfill import add_backfill_arguments, run_backfill
+    from kap_live import add_live_arguments, run_live
+    from kap_reextract import add_reextract_arguments, run_reextract
+    from kap_workers import add_worker_arguments, run_worker
+    add_backfill_arguments(p_backfill)
+    add_live_arguments(p_live)
+    add_reextract_arguments(p_reextract)
+    add_worker_arguments(p_worker)
+
+    args = parser.parse_args()
+    if args.command == "backfill":
+        run_backfill(args)
+    elif args.command == "catchup":
+        asyncio.run(catch_up_gaps(max_batches=args.batches, lookback=args.lookback))
+    elif args.command == "live":
+        run_live(args)
+    elif args.command == "reextract":
+        run_reextract(args)
+    elif args.command == "worker":
+        run_worker(args)
+    elif args.command == "compact":
+        from kap_archive import KEEP_DAYS, DailyArchive, compact
+        archive = DailyArchive()
+        try:
+            compact(get_manifest(), archive, keep_days=args.keep_days or KEEP_DAYS, dry_run=args.dry_run)
+        finally:
+            archive.close()
+    else:
+        main()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    cli()
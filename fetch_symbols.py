@@ -85,6 +85,17 @@ def fetch_symbols():
     pattern = r'\\"kapMemberTitle\\":\\"(.*?)\\",.*?\\"stockCode\\":\\"(.*?)\\"'
     matches = re.finditer(pattern, content)
     
+    # mkkMemberOid aynı obje içinde ({...}) duruyor; pipeline'daki sembol çözücü
+    # (kap_symbols.py) byCriteria kayıtlarını bu OID ile eşleştiriyor.
+    oid_by_symbol = {}
+    for obj in re.finditer(r'\{[^{}]*?\\"stockCode\\":\\"[^\\"]*\\"[^{}]*\}', content):
+        block = obj.group(0)
+        oid_match = re.search(r'\\"mkkMemberOid\\":\\"(.*?)\\"', block)
+        code_match = re.search(r'\\"stockCode\\":\\"(.*?)\\"', block)
+        if oid_match and code_match:
+            oid_by_symbol[code_match.group(1)] = oid_match.group(1)
+    print(f"🔍 {len(oid_by_symbol)} symbols with mkkMemberOid.")
+    
     print("🔍 Searching with regex pattern...")
     
     for match in matches:
@@ -110,6 +121,7 @@ def fetch_symbols():
                 {"$set": {
                     "symbol": symbol,
                     "company_name": title,
+                    "mkk_member_oid": oid_by_symbol.get(symbol),
                     "source": "kap_website_live",
                     "updated_at": os.popen('date -u +"%Y-%m-%dT%H:%M:%SZ"').read().strip()
                 }},
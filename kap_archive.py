@@ -0,0 +1,441 @@
+"""
+KAP Günlük Arşiv
+================
+daily_data_kap/{symbol}/{disclosureIndex}/ düzeni bildirim başına bir klasör ve
+3-6 küçük dosya (+ gemini/ altında bir JSON) üretir. Kapanmış günler bu
+sıkıştırma işiyle gün başına tek bir paket dosyasına taşınır:
+
+    daily_data_kap/archive/2025/2025-01-15.pack   # kayıtların art arda sıkıştırılmış hali
+    daily_data_kap/archive/index.sqlite          # (disclosureIndex, tür, sıra) -> gün, offset, uzunluk
+
+- Her kayıt ayrı sıkıştırılır (zstd, yoksa zlib); rastgele erişimde paket açılmaz,
+  sadece ilgili aralık okunur (os.pread)
+- Blob deposunda duran dosyalar (HTML, form PDF, ekler) kopyalanmaz, sha256
+  referansı olarak indekslenir
+- Paketler yalnızca sona eklenir: yarıda kalan sıkıştırma tekrar çalıştırılabilir
+- Manifest'teki yollar archive://{disclosureIndex}/{tür}/{sıra} olur; read_path()
+  hem düz yolu hem arşiv URI'sini okur (analizörler, create_chroma_db, manifest)
+
+Kullanım:
+    python kap_archive.py compact [--keep-days 2] [--day 2025-01-15] [--dry-run]
+    python kap_archive.py stats
+    python kap_archive.py cat 1234567 gemini
+"""
+
+import argparse
+import json
+import os
+import re
+import sqlite3
+import zlib
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from kap_blobstore import BLOB_DIR, BlobStore
+from kap_manifest import MANIFEST_FILE, STATUS_DONE, DisclosureManifest
+
+# ==========================
+# AYARLAR
+# ==========================
+PROJECT_ROOT = Path(__file__).parent
+DAILY_DATA_DIR = PROJECT_ROOT / "daily_data_kap"
+ARCHIVE_DIR = DAILY_DATA_DIR / "archive"
+
+KEEP_DAYS = 2          # Bugün ve dün açık kalır (geç gelen zenginleştirme / analiz için)
+ZSTD_LEVEL = 10
+ZLIB_LEVEL = 6
+URI_PREFIX = "archive://"
+
+CODEC_ZSTD = "zstd"
+CODEC_ZLIB = "zlib"
+CODEC_BLOB = "blob"    # Bayt pakette değil, blob deposunda (sha256)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    disclosure_index INTEGER NOT NULL,
+    kind             TEXT NOT NULL,
+    seq              INTEGER NOT NULL DEFAULT 0,
+    day              TEXT NOT NULL,
+    name             TEXT NOT NULL,
+    codec            TEXT NOT NULL,
+    offset           INTEGER,
+    length           INTEGER,
+    raw_size         INTEGER NOT NULL,
+    sha256           TEXT,
+    PRIMARY KEY (disclosure_index, kind, seq)
+);
+CREATE INDEX IF NOT EXISTS idx_entries_day ON entries(day, kind);
+
+CREATE TABLE IF NOT EXISTS days (
+    day          TEXT PRIMARY KEY,
+    records      INTEGER NOT NULL,
+    raw_bytes    INTEGER NOT NULL,
+    packed_bytes INTEGER NOT NULL,
+    updated_at   TEXT NOT NULL
+);
+"""
+
+# ==========================
+# YARDIMCILAR
+# ==========================
+
+def make_uri(disclosure_index: int, kind: str, seq: int = 0) -> str:
+    return f"{URI_PREFIX}{int(disclosure_index)}/{kind}/{int(seq)}"
+
+def parse_uri(uri: str) -> tuple[int, str, int] | None:
+    if not str(uri).startswith(URI_PREFIX):
+        return None
+    idx, kind, seq = str(uri)[len(URI_PREFIX):].split("/")
+    return int(idx), kind, int(seq)
+
+def compress(data: bytes) -> tuple[str, bytes]:
+    if zstandard is not None:
+        return CODEC_ZSTD, zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return CODEC_ZLIB, zlib.compress(data, ZLIB_LEVEL)
+
+def decompress(codec: str, data: bytes) -> bytes:
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("Bu kayıt zstd ile sıkıştırılmış: pip install zstandard")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(data)
+    raise ValueError(f"Bilinmeyen codec: {codec}")
+
+def publish_day(publish_date: str | None) -> str | None:
+    """KAP publishDate ("30.12.2025 19:10:53") -> "2025-12-30" """
+    try:
+        return datetime.strptime(str(publish_date).strip()[:10], "%d.%m.%Y").date().isoformat()
+    except (TypeError, ValueError):
+        return None
+
+# ==========================
+# ARŞİV
+# ==========================
+
+class DailyArchive:
+    """Paket dosyaları + offset indeksi. Okuma için de yazma için de tek giriş noktası."""
+
+    def __init__(self, root: Path = ARCHIVE_DIR, blob_dir: Path | None = None):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        # Varsayılan: arşivin yanındaki blob deposu (daily_data_kap/blobs)
+        self.blob_dir = Path(blob_dir) if blob_dir is not None else self.root.parent / BLOB_DIR.name
+        self.conn = sqlite3.connect(str(self.root / "index.sqlite"), timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._fds: dict[str, int] = {}
+        self._blob_store: BlobStore | None = None
+
+    def close(self):
+        for fd in self._fds.values():
+            os.close(fd)
+        self._fds.clear()
+        if self._blob_store is not None:
+            self._blob_store.close()
+        self.conn.close()
+
+    def pack_path(self, day: str) -> Path:
+        return self.root / day[:4] / f"{day}.pack"
+
+    @property
+    def blob_store(self) -> BlobStore:
+        if self._blob_store is None:
+            self._blob_store = BlobStore(self.blob_dir)
+        return self._blob_store
+
+    # ---------- okuma ----------
+
+    def has(self, disclosure_index: int) -> bool:
+        row = self.conn.execute(
+            "SELECT 1 FROM entries WHERE disclosure_index = ? LIMIT 1", (int(disclosure_index),)
+        ).fetchone()
+        return row is not None
+
+    def entries_for(self, disclosure_index: int) -> list[dict]:
+        rows = self.conn.execute(
+            "SELECT kind, seq, day, name, codec, raw_size, sha256 FROM entries WHERE disclosure_index = ? ORDER BY kind, seq",
+            (int(disclosure_index),),
+        ).fetchall()
+        return [dict(zip(("kind", "seq", "day", "name", "codec", "raw_size", "sha256"), r)) for r in rows]
+
+    def _read_entry(self, day: str, codec: str, offset: int | None, length: int | None, sha: str | None) -> bytes | None:
+        if codec == CODEC_BLOB:
+            path = self.blob_store.blob_path(sha)
+            return path.read_bytes() if path.exists() else None
+        fd = self._fds.get(day)
+        if fd is None:
+            fd = self._fds[day] = os.open(self.pack_path(day), os.O_RDONLY)
+        return decompress(codec, os.pread(fd, length, offset))
+
+    def read(self, disclosure_index: int, kind: str, seq: int = 0) -> bytes | None:
+        """Tek kaydı paketi açmadan okur (yoksa None)."""
+        row = self.conn.execute(
+            "SELECT day, codec, offset, length, sha256 FROM entries WHERE disclosure_index = ? AND kind = ? AND seq = ?",
+            (int(disclosure_index), kind, int(seq)),
+        ).fetchone()
+        return self._read_entry(*row) if row else None
+
+    def read_json(self, disclosure_index: int, kind: str = "gemini", seq: int = 0) -> dict | None:
+        data = self.read(disclosure_index, kind, seq)
+        return json.loads(data) if data is not None else None
+
+    def iter_kind(self, kind: str, day: str | None = None):
+        """(disclosureIndex, bayt) akışı; gün sırasıyla, paket içi offset sırasıyla (sıralı okuma)."""
+        sql = "SELECT disclosure_index, day, codec, offset, length, sha256 FROM entries WHERE kind = ?"
+        params: tuple = (kind,)
+        if day:
+            sql += " AND day = ?"
+            params += (day,)
+        for idx, *entry in self.conn.execute(sql + " ORDER BY day, offset", params).fetchall():
+            data = self._read_entry(*entry)
+            if data is not None:
+                yield idx, data
+
+    def stats(self) -> dict:
+        days, records, raw, packed = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(records), 0), COALESCE(SUM(raw_bytes), 0), COALESCE(SUM(packed_bytes), 0) FROM days"
+        ).fetchone()
+        by_codec = dict(self.conn.execute("SELECT codec, COUNT(*) FROM entries GROUP BY codec").fetchall())
+        return {"days": days, "records": records, "raw_bytes": raw, "packed_bytes": packed, "by_codec": by_codec}
+
+    # ---------- yazma ----------
+
+    def append_day(self, day: str, records: list[dict]) -> dict:
+        """
+        records: {disclosure_index, kind, seq, name, data | sha256+raw_size}
+        Önce paket sonuna yazılır ve fsync edilir, sonra indeks tek transaction'da
+        güncellenir; arada kesilirse pakette sahipsiz bayt kalır, veri kaybolmaz.
+        Var olan bir anahtar yeniden yazılırsa indeks yeni kopyayı gösterir (eskisi
+        pakette ölü bayt olarak kalır).
+        """
+        path = self.pack_path(day)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        rows, raw_bytes, packed_bytes = [], 0, 0
+        with open(path, "ab") as f:
+            offset = f.tell()
+            for rec in records:
+                if "data" in rec:
+                    codec, blob = compress(rec["data"])
+                    f.write(blob)
+                    rows.append((rec["disclosure_index"], rec["kind"], rec["seq"], day, rec["name"], codec,
+                                 offset, len(blob), len(rec["data"]), None))
+                    offset += len(blob)
+                    raw_bytes += len(rec["data"])
+                    packed_bytes += len(blob)
+                else:
+                    rows.append((rec["disclosure_index"], rec["kind"], rec["seq"], day, rec["name"], CODEC_BLOB,
+                                 None, None, rec["raw_size"], rec["sha256"]))
+            f.flush()
+            os.fsync(f.fileno())
+
+        with self.conn:
+            replaced = sum(
+                1 for r in rows if self.conn.execute(
+                    "SELECT 1 FROM entries WHERE disclosure_index = ? AND kind = ? AND seq = ?", r[:3]
+                ).fetchone()
+            )
+            self.conn.executemany(
+                """
+                INSERT OR REPLACE INTO entries (disclosure_index, kind, seq, day, name, codec, offset, length, raw_size, sha256)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                rows,
+            )
+            self.conn.execute(
+                """
+                INSERT INTO days (day, records, raw_bytes, packed_bytes, updated_at) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(day) DO UPDATE SET
+                    records = records + excluded.records,
+                    raw_bytes = raw_bytes + excluded.raw_bytes,
+                    packed_bytes = packed_bytes + excluded.packed_bytes,
+                    updated_at = excluded.updated_at
+                """,
+                (day, len(rows) - replaced, raw_bytes, packed_bytes, datetime.now().isoformat(timespec="seconds")),
+            )
+        # Okuyucu açık fd'yi kullanıyorsa yeni eklenenleri de görür (aynı dosya)
+        return {"records": len(rows), "raw_bytes": raw_bytes, "packed_bytes": packed_bytes}
+
+    def rewrite(self, records: list[tuple[int, str, int, bytes]]) -> int:
+        """Arşivdeki kayıtların yeni içeriğini kendi günlerinin paketine ekler: (index, tür, sıra, bayt)"""
+        by_day: dict[str, list[dict]] = {}
+        for idx, kind, seq, data in records:
+            row = self.conn.execute(
+                "SELECT day, name FROM entries WHERE disclosure_index = ? AND kind = ? AND seq = ?",
+                (int(idx), kind, int(seq)),
+            ).fetchone()
+            if row is None:
+                continue
+            by_day.setdefault(row[0], []).append(
+                {"disclosure_index": int(idx), "kind": kind, "seq": int(seq), "name": row[1], "data": data}
+            )
+        for day, day_records in by_day.items():
+            self.append_day(day, day_records)
+        return sum(len(v) for v in by_day.values())
+
+# ==========================
+# OKUYUCU API (analizörler / create_chroma_db)
+# ==========================
+
+_archive: DailyArchive | None = None
+
+def get_archive() -> DailyArchive:
+    global _archive
+    if _archive is None:
+        _archive = DailyArchive(ARCHIVE_DIR)
+    return _archive
+
+GEMINI_NAME_RE = re.compile(r"_(\d+)_gemini\.json$")
+
+def read_path(path) -> bytes | None:
+    """
+    Düz dosya yolu ya da archive:// URI'si. Düz yol artık yoksa ve bir gemini
+    JSON'u ise ({symbol}_{idx}_gemini.json) arşivden okunur.
+    """
+    parsed = parse_uri(path)
+    if parsed is not None:
+        return get_archive().read(*parsed)
+    path = Path(path)
+    if path.exists():
+        return path.read_bytes()
+    m = GEMINI_NAME_RE.search(path.name)
+    if m and (ARCHIVE_DIR / "index.sqlite").exists():
+        return get_archive().read(int(m.group(1)), "gemini")
+    return None
+
+def read_json_path(path) -> dict | None:
+    data = read_path(path)
+    return json.loads(data) if data is not None else None
+
+# ==========================
+# SIKIŞTIRMA İŞİ
+# ==========================
+
+def closed_days(manifest: DisclosureManifest, keep_days: int = KEEP_DAYS, today: date | None = None) -> dict[str, list[int]]:
+    """Arşivlenmemiş, tamamlanmış bildirimleri yayın gününe göre gruplar (açık günler hariç)."""
+    cutoff = (today or date.today()) - timedelta(days=keep_days - 1)
+    by_day: dict[str, list[int]] = {}
+    for idx, publish_date in manifest.unarchived_disclosures(URI_PREFIX):
+        day = publish_day(publish_date)
+        if day is not None and day < cutoff.isoformat():
+            by_day.setdefault(day, []).append(idx)
+    return by_day
+
+def compact_day(archive: DailyArchive, manifest: DisclosureManifest, day: str, indices: list[int],
+                data_dir: Path = DAILY_DATA_DIR, dry_run: bool = False) -> dict:
+    summary = {"day": day, "disclosures": 0, "records": 0, "raw_bytes": 0, "packed_bytes": 0, "files_removed": 0}
+    records, moved = [], []
+
+    for idx in sorted(indices):
+        files = manifest.files_for(idx)
+        if not files:
+            continue
+        if archive.has(idx):
+            # Önceki çalıştırma indeksi yazıp dosyaları silemeden kesilmiş
+            moved.append((idx, files))
+            continue
+        for f in files:
+            path = Path(f["path"])
+            if parse_uri(f["path"]) is not None or not path.exists():
+                continue
+            if f["sha256"] and archive.blob_store.blob_path(f["sha256"]).exists():
+                records.append({"disclosure_index": idx, "kind": f["kind"], "seq": f["seq"], "name": path.name,
+                                "sha256": f["sha256"], "raw_size": f["size"] or 0})
+            else:
+                records.append({"disclosure_index": idx, "kind": f["kind"], "seq": f["seq"], "name": path.name,
+                                "data": path.read_bytes()})
+        moved.append((idx, files))
+
+    summary["disclosures"] = len(moved)
+    if dry_run:
+        summary["records"] = len(records)
+        summary["raw_bytes"] = sum(len(r["data"]) for r in records if "data" in r)
+        return summary
+
+    if records:
+        summary.update(archive.append_day(day, records))
+
+    # İndeks kalıcı: manifest yolları arşive dönsün, gevşek dosyalar silinsin
+    for idx, files in moved:
+        manifest.mark_archived(idx, {(f["kind"], f["seq"]): make_uri(idx, f["kind"], f["seq"]) for f in files})
+        dirs = set()
+        for f in files:
+            if parse_uri(f["path"]) is not None:
+                continue
+            path = Path(f["path"])
+            if path.exists():
+                path.unlink()
+                summary["files_removed"] += 1
+            dirs.add(path.parent)
+        for d in dirs:
+            if d != data_dir / "gemini":
+                try:
+                    d.rmdir()  # Boş bildirim klasörü; içinde başka dosya varsa kalır
+                except OSError:
+                    pass
+    return summary
+
+def compact(manifest: DisclosureManifest, archive: DailyArchive, keep_days: int = KEEP_DAYS,
+            only_day: str | None = None, dry_run: bool = False) -> list[dict]:
+    by_day = closed_days(manifest, keep_days)
+    if only_day:
+        by_day = {only_day: by_day.get(only_day, [])}
+    results = []
+    for day in sorted(by_day):
+        summary = compact_day(archive, manifest, day, by_day[day], dry_run=dry_run)
+        results.append(summary)
+        ratio = summary["raw_bytes"] / summary["packed_bytes"] if summary["packed_bytes"] else 0.0
+        print(f"[ARCHIVE] {day}: {summary['disclosures']} bildirim, {summary['records']} kayıt, "
+              f"{summary['raw_bytes'] / 1024:.1f} KB -> {summary['packed_bytes'] / 1024:.1f} KB ({ratio:.1f}x), "
+              f"{summary['files_removed']} dosya silindi" + (" [dry-run]" if dry_run else ""))
+    return results
+
+# ==========================
+# CLI
+# ==========================
+
+def main():
+    parser = argparse.ArgumentParser(description="KAP günlük arşiv")
+    parser.add_argument("--archive", default=str(ARCHIVE_DIR))
+    parser.add_argument("--manifest", default=str(MANIFEST_FILE))
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_compact = sub.add_parser("compact", help="Kapanmış günleri pakete taşı")
+    p_compact.add_argument("--keep-days", type=int, default=KEEP_DAYS, help="Açık bırakılan son gün sayısı")
+    p_compact.add_argument("--day", help="Sadece bu gün (YYYY-MM-DD)")
+    p_compact.add_argument("--dry-run", action="store_true")
+    sub.add_parser("stats", help="Arşiv özeti")
+    p_cat = sub.add_parser("cat", help="Bir kaydı stdout'a yaz")
+    p_cat.add_argument("disclosure_index", type=int)
+    p_cat.add_argument("kind")
+    p_cat.add_argument("--seq", type=int, default=0)
+    args = parser.parse_args()
+
+    archive = DailyArchive(Path(args.archive))
+    try:
+        if args.command == "compact":
+            manifest = DisclosureManifest(Path(args.manifest))
+            try:
+                if zstandard is None:
+                    print("[WARN] zstandard kurulu değil, zlib kullanılacak (pip install zstandard)")
+                compact(manifest, archive, args.keep_days, args.day, args.dry_run)
+            finally:
+                manifest.close()
+        elif args.command == "cat":
+            data = archive.read(args.disclosure_index, args.kind, args.seq)
+            if data is None:
+                print(f"[WARN] Kayıt yok: {args.disclosure_index} {args.kind} {args.seq}")
+            else:
+                os.write(1, data)
+        if args.command != "cat":
+            print(json.dumps(archive.stats(), ensure_ascii=False, indent=2))
+    finally:
+        archive.close()
+
+if __name__ == "__main__":
+    main()
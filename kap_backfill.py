@@ -0,0 +1,218 @@
+"""
+KAP Geçmiş Veri Doldurma (Backfill)
+===================================
+Bir tarih aralığındaki tüm bildirimleri indirir (embedding/gemini korpusunu
+yeniden kurmak için). Aralık tarih parçalarına (shard) bölünür, parçalar aynı
+indirici üzerinden paralel çalışır; yani host başına istek bütçesi tüm
+parçalar için ortaktır.
+
+- Her parçanın durumu manifest'teki backfill_shards tablosuna yazılır;
+  tamamlanan parçalar sonraki çalıştırmada atlanır.
+- Yarım kalan parça tekrar listelenir ama manifest'te olan bildirimler
+  yeniden indirilmez, yani iş kaldığı yerden devam eder.
+- İlerleme ve kalan süre (ETA) bildirim/saat üzerinden yazdırılır.
+
+Kullanım:
+    python daily_kap_pipeline.py backfill --from 2024-01-01 --to 2024-12-31
+    python kap_backfill.py --from 2024-01-01 --to 2024-12-31 [--shard-days 1] [--parallel 3] [--rate 1.0]
+"""
+
+import argparse
+import asyncio
+import time
+from datetime import date, datetime, timedelta
+
+import daily_kap_pipeline as pipeline
+from kap_downloader import run_worker_pool
+from kap_manifest import STATUS_DONE, STATUS_FAILED, STATUS_PARTIAL, STATUS_RUNNING, now_iso
+
+# ==========================
+# AYARLAR
+# ==========================
+DEFAULT_SHARD_DAYS = 1
+DEFAULT_PARALLEL_SHARDS = 3
+PROGRESS_EVERY = 25  # Kaç bildirimde bir ilerleme satırı yazılsın
+
+# ==========================
+# PARÇALAMA
+# ==========================
+
+def make_shards(from_date: date, to_date: date, shard_days: int = DEFAULT_SHARD_DAYS) -> list[tuple[str, str, str]]:
+    """[from, to] aralığını (shard_id, from, to) parçalarına böler (en yeni parça başta)."""
+    if to_date < from_date:
+        raise ValueError(f"--to ({to_date}) --from'dan ({from_date}) önce olamaz")
+    shards = []
+    start = from_date
+    while start <= to_date:
+        end = min(start + timedelta(days=shard_days - 1), to_date)
+        f, t = start.isoformat(), end.isoformat()
+        shards.append((f"{f}_{t}", f, t))
+        start = end + timedelta(days=1)
+    shards.reverse()
+    return shards
+
+# ==========================
+# İLERLEME / ETA
+# ==========================
+
+class BackfillProgress:
+    """Bildirim/saat hızını ve kalan süreyi hesaplar."""
+
+    def __init__(self, total_shards: int):
+        self.total_shards = total_shards
+        self.finished_shards = 0
+        self.listed_shards = 0
+        self.listed = 0          # Listelenen parçalardaki toplam bildirim
+        self.already_done = 0    # Önceki çalıştırmadan gelenler
+        self.processed = 0       # Bu çalıştırmada işlenenler
+        self.failed = 0
+        self.started = time.monotonic()
+
+    def shard_listed(self, listed: int, already_done: int):
+        self.listed_shards += 1
+        self.listed += listed
+        self.already_done += already_done
+
+    def disclosure_done(self, ok: bool):
+        if ok:
+            self.processed += 1
+        else:
+            self.failed += 1
+        if (self.processed + self.failed) % PROGRESS_EVERY == 0:
+            self.report()
+
+    def shard_finished(self, shard_id: str, status: str):
+        self.finished_shards += 1
+        print(f"[BACKFILL] Parça {shard_id} -> {status}")
+        self.report()
+
+    def estimated_total(self) -> int:
+        """Henüz listelenmemiş parçalar için ortalama parça boyutuyla tahmin."""
+        if not self.listed_shards:
+            return 0
+        per_shard = self.listed / self.listed_shards
+        return int(self.listed + per_shard * (self.total_shards - self.listed_shards))
+
+    def report(self):
+        elapsed = time.monotonic() - self.started
+        per_hour = self.processed / elapsed * 3600 if elapsed > 0 else 0.0
+        remaining = max(0, self.estimated_total() - self.already_done - self.processed - self.failed)
+        eta = f"{remaining / per_hour:.1f} sa" if per_hour > 0 else "?"
+        print(
+            f"[BACKFILL] {self.finished_shards}/{self.total_shards} parça | "
+            f"{self.processed} işlendi, {self.failed} başarısız, {self.already_done} zaten vardı "
+            f"(~{self.estimated_total()} toplam) | {per_hour:.0f} bildirim/saat | ETA {eta}"
+        )
+
+# ==========================
+# ÇALIŞTIRMA
+# ==========================
+
+async def run_shard(downloader, shard: tuple[str, str, str], workers: int, progress: BackfillProgress):
+    shard_id, from_date, to_date = shard
+    manifest = pipeline.get_manifest()
+    manifest.update_shard(shard_id, from_date, to_date, STATUS_RUNNING, started_at=now_iso())
+
+    data = await downloader.post_json(pipeline.BY_CRITERIA_URL, pipeline.build_criteria_payload(from_date, to_date))
+    if data is None:
+        manifest.update_shard(shard_id, from_date, to_date, STATUS_FAILED)
+        progress.shard_finished(shard_id, STATUS_FAILED)
+        return
+
+    disclosures = pipeline.parse_disclosure_items(data)
+    existing = manifest.existing_indices(int(d.get("disclosureIndex", 0)) for d in disclosures)
+    todo = [d for d in disclosures if int(d.get("disclosureIndex", 0)) not in existing]
+    progress.shard_listed(len(disclosures), len(existing))
+    manifest.update_shard(shard_id, from_date, to_date, STATUS_RUNNING, listed=len(disclosures))
+
+    succeeded: set[int] = set()
+
+    async def handle(i: int, disclosure: dict):
+        ok = False
+        try:
+            ok = await pipeline.process_single_disclosure(downloader, disclosure)
+        except Exception as e:
+            print(f"[ERROR] {disclosure.get('symbol', '?')} {disclosure.get('disclosureIndex', '?')} işlenirken hata: {e}")
+        if ok:
+            succeeded.add(int(disclosure["disclosureIndex"]))
+        progress.disclosure_done(ok)
+
+    await run_worker_pool(todo, handle, workers=workers)
+
+    failed = len(todo) - len(succeeded)
+    status = STATUS_DONE if failed == 0 else STATUS_PARTIAL
+    manifest.update_shard(
+        shard_id, from_date, to_date, status,
+        done=len(existing) + len(succeeded), failed=failed, finished_at=now_iso(),
+    )
+    progress.shard_finished(shard_id, status)
+
+async def backfill_async(
+    from_date: date,
+    to_date: date,
+    shard_days: int = DEFAULT_SHARD_DAYS,
+    parallel: int = DEFAULT_PARALLEL_SHARDS,
+    rate: float | None = None,
+    workers: int | None = None,
+) -> BackfillProgress:
+    shards = make_shards(from_date, to_date, shard_days)
+    statuses = pipeline.get_manifest().shard_statuses(s[0] for s in shards)
+    pending = [s for s in shards if statuses.get(s[0]) != STATUS_DONE]
+    print(f"[BACKFILL] {len(shards)} parça, {len(shards) - len(pending)} tanesi zaten tamam, {len(pending)} işlenecek")
+
+    progress = BackfillProgress(len(pending))
+    if not pending:
+        return progress
+
+    workers = workers or max(1, pipeline.DOWNLOAD_WORKERS // max(1, parallel))
+    downloader = pipeline.make_downloader(rate_per_host=rate)
+    shard_sem = asyncio.Semaphore(max(1, parallel))
+
+    async def guarded(shard):
+        async with shard_sem:
+            try:
+                await run_shard(downloader, shard, workers, progress)
+            except Exception as e:
+                print(f"[ERROR] Parça {shard[0]} hata: {e}")
+                pipeline.get_manifest().update_shard(shard[0], shard[1], shard[2], STATUS_FAILED)
+
+    try:
+        await asyncio.gather(*(guarded(s) for s in pending))
+    finally:
+        downloader.close()
+    return progress
+
+def run_backfill(args: argparse.Namespace):
+    from_date = datetime.strptime(args.from_date, "%Y-%m-%d").date()
+    to_date = datetime.strptime(args.to_date, "%Y-%m-%d").date()
+
+    print("=" * 80)
+    print(f"KAP BACKFILL: {from_date} -> {to_date} (parça: {args.shard_days} gün, paralel: {args.parallel})")
+    print("=" * 80)
+
+    progress = asyncio.run(backfill_async(
+        from_date, to_date,
+        shard_days=args.shard_days,
+        parallel=args.parallel,
+        rate=args.rate,
+        workers=args.workers,
+    ))
+    progress.report()
+    pipeline.print_blob_report(pipeline.get_blob_store().daily_report())
+    pipeline.print_policy_report(pipeline.get_policy().stats)
+
+def add_backfill_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--from", dest="from_date", required=True, help="Başlangıç tarihi (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="to_date", required=True, help="Bitiş tarihi (YYYY-MM-DD, dahil)")
+    parser.add_argument("--shard-days", type=int, default=DEFAULT_SHARD_DAYS, help="Parça başına gün sayısı")
+    parser.add_argument("--parallel", type=int, default=DEFAULT_PARALLEL_SHARDS, help="Aynı anda işlenen parça sayısı")
+    parser.add_argument("--rate", type=float, default=None, help="Host başına saniyede istek (tüm parçalar için ortak)")
+    parser.add_argument("--workers", type=int, default=None, help="Parça başına eşzamanlı bildirim")
+
+def main():
+    parser = argparse.ArgumentParser(description="KAP geçmiş bildirim doldurma")
+    add_backfill_arguments(parser)
+    run_backfill(parser.parse_args())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,371 @@
+"""
+KAP İçerik Adresli Dosya Deposu
+===============================
+HTML / form PDF / ek PDF içerikleri sha256 ile adreslenip tek kez saklanır:
+
+    daily_data_kap/blobs/ab/cd/abcd...ef   (sha256, 2 seviye shard)
+
+Bildirim klasörlerindeki dosyalar bu blob'lara hardlink'tir (olmazsa symlink),
+yani aynı ek birden fazla bildirimde geçse de diskte bir kez durur.
+
+- Aynı URL daha önce indirildiyse hiç istek atılmaz (url -> sha indeksi).
+- Aynı URL eşzamanlı istenirse tek indirme yapılır (singleflight); başka bir
+  süreç (kap_workers) aynı URL'i indiriyorsa .part dosyasının kilidi beklenir.
+- Farklı URL'den gelen aynı byte'lar tek blob olarak saklanır.
+
+PDF'ler belleğe alınmadan tmp/*.part dosyasına akıtılır; fsync + rename ile
+blob olur, yani yarım dosya hiçbir zaman bildirim klasöründe görünmez.
+
+Günlük tasarruf raporu / bütünlük kontrolü:
+    python kap_blobstore.py report [--date 2026-01-05]
+    python kap_blobstore.py verify [--remove]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+from datetime import date, datetime
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: süreçler arası .part kilidi yok
+    fcntl = None
+
+# ==========================
+# AYARLAR
+# ==========================
+PROJECT_ROOT = Path(__file__).parent
+BLOB_DIR = PROJECT_ROOT / "daily_data_kap" / "blobs"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    sha256     TEXT PRIMARY KEY,
+    size       INTEGER NOT NULL,
+    refs       INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS urls (
+    url        TEXT PRIMARY KEY,
+    sha256     TEXT NOT NULL,
+    fetched_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS daily_stats (
+    day                  TEXT PRIMARY KEY,
+    downloads            INTEGER NOT NULL DEFAULT 0,
+    downloaded_bytes     INTEGER NOT NULL DEFAULT 0,
+    stored_bytes         INTEGER NOT NULL DEFAULT 0,
+    url_hits             INTEGER NOT NULL DEFAULT 0,
+    content_hits         INTEGER NOT NULL DEFAULT 0,
+    bandwidth_saved      INTEGER NOT NULL DEFAULT 0,
+    disk_saved           INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+STAT_FIELDS = (
+    "downloads", "downloaded_bytes", "stored_bytes",
+    "url_hits", "content_hits", "bandwidth_saved", "disk_saved",
+)
+
+def now_iso() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+def lock_part(part_path: Path):
+    """
+    .part dosyasının süreçler arası kilidi (indirme + put_file boyunca tutulur).
+    Yol URL'e sabit olduğundan aynı eki indiren iki süreç birbirinin dosyasını
+    kesip üstüne yazmasın. Bloklayıcıdır; event loop dışında çağrılmalı.
+    """
+    if fcntl is None:
+        return None
+    part_path.parent.mkdir(parents=True, exist_ok=True)
+    handle = open(part_path.with_name(part_path.name + ".lock"), "a+b")
+    fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+    return handle
+
+def unlock_part(handle):
+    if handle is not None:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+        handle.close()
+
+def fsync_dir(path: Path):
+    """rename'in kalıcı olması için klasörü fsync'ler (Windows'ta desteklenmez, atlanır)."""
+    try:
+        fd = os.open(str(path), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+# ==========================
+# BLOB STORE
+# ==========================
+
+class BlobStore:
+    """sha256 adresli blob deposu. Pipeline event loop'u içinden kullanılır."""
+
+    def __init__(self, root: Path = BLOB_DIR):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.root / "index.sqlite"), timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._inflight: dict[str, asyncio.Future] = {}
+
+    def close(self):
+        self.conn.close()
+
+    def blob_path(self, sha: str) -> Path:
+        return self.root / sha[:2] / sha[2:4] / sha
+
+    # ---------- istatistik ----------
+
+    def _bump(self, **deltas):
+        day = date.today().isoformat()
+        cols = ", ".join(f"{k} = {k} + ?" for k in deltas)
+        with self.conn:
+            self.conn.execute("INSERT OR IGNORE INTO daily_stats (day) VALUES (?)", (day,))
+            self.conn.execute(f"UPDATE daily_stats SET {cols} WHERE day = ?", (*deltas.values(), day))
+
+    def daily_report(self, day: str | None = None) -> dict:
+        day = day or date.today().isoformat()
+        row = self.conn.execute(
+            f"SELECT {', '.join(STAT_FIELDS)} FROM daily_stats WHERE day = ?", (day,)
+        ).fetchone()
+        report = {"day": day, **dict(zip(STAT_FIELDS, row or (0,) * len(STAT_FIELDS)))}
+        total_blobs, total_bytes = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs"
+        ).fetchone()
+        report["total_blobs"] = total_blobs
+        report["total_blob_bytes"] = total_bytes
+        return report
+
+    # ---------- okuma ----------
+
+    def lookup_url(self, url: str) -> tuple[str, int] | None:
+        """URL daha önce indirildiyse (sha, size) döner."""
+        row = self.conn.execute(
+            "SELECT u.sha256, b.size FROM urls u JOIN blobs b ON b.sha256 = u.sha256 WHERE u.url = ?",
+            (url,),
+        ).fetchone()
+        if row is None or not self.blob_path(row[0]).exists():
+            return None
+        return row[0], row[1]
+
+    # ---------- yazma ----------
+
+    def part_path(self, url: str) -> Path:
+        """URL'e sabit .part yolu; kesilen indirme sonraki denemede buradan devam eder."""
+        return self.root / "tmp" / f"{hashlib.sha256(url.encode('utf-8')).hexdigest()[:32]}.part"
+
+    def _register(self, sha: str, size: int, url: str | None, is_new: bool):
+        ts = now_iso()
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO blobs (sha256, size, refs, created_at) VALUES (?, ?, 0, ?)",
+                (sha, size, ts),
+            )
+            if url:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO urls (url, sha256, fetched_at) VALUES (?, ?, ?)",
+                    (url, sha, ts),
+                )
+
+        if is_new:
+            self._bump(downloads=1, downloaded_bytes=size, stored_bytes=size)
+        else:
+            self._bump(downloads=1, downloaded_bytes=size, content_hits=1, disk_saved=size)
+
+    def put_bytes(self, data: bytes, url: str | None = None) -> tuple[str, bool]:
+        """İçeriği depoya yazar. (sha, yeni_mi) döner; aynı içerik varsa tekrar yazılmaz."""
+        sha = hashlib.sha256(data).hexdigest()
+        path = self.blob_path(sha)
+        is_new = not path.exists()
+
+        if is_new:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(f".{sha}.{os.getpid()}.tmp")
+            with open(tmp, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            tmp.replace(path)
+            fsync_dir(path.parent)
+
+        self._register(sha, len(data), url, is_new)
+        return sha, is_new
+
+    def put_file(self, tmp_path: Path, sha: str, size: int, url: str | None = None) -> tuple[str, bool]:
+        """
+        Akışla indirilmiş (fsync'li) dosyayı blob olarak yerine koyar (atomik rename).
+        sha indirme sırasında hesaplanmıştır; aynı içerik zaten varsa geçici dosya silinir.
+        """
+        path = self.blob_path(sha)
+        is_new = not path.exists()
+
+        if is_new:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(tmp_path, path)
+            fsync_dir(path.parent)
+        else:
+            Path(tmp_path).unlink(missing_ok=True)
+
+        self._register(sha, size, url, is_new)
+        return sha, is_new
+
+    def verify(self, remove: bool = False) -> dict:
+        """Blob'ları yeniden hash'ler; bozuk/eksik olanları raporlar (remove=True ise indeksten siler)."""
+        report = {"checked": 0, "missing": [], "corrupt": []}
+        for (sha,) in self.conn.execute("SELECT sha256 FROM blobs").fetchall():
+            path = self.blob_path(sha)
+            report["checked"] += 1
+            if not path.exists():
+                report["missing"].append(sha)
+                continue
+            h = hashlib.sha256()
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    h.update(chunk)
+            if h.hexdigest() != sha:
+                report["corrupt"].append(sha)
+
+        if remove:
+            bad = report["missing"] + report["corrupt"]
+            with self.conn:
+                for sha in bad:
+                    # URL kaydı silinince bir sonraki döngüde yeniden indirilir
+                    self.conn.execute("DELETE FROM urls WHERE sha256 = ?", (sha,))
+                    self.conn.execute("DELETE FROM blobs WHERE sha256 = ?", (sha,))
+            for sha in report["corrupt"]:
+                self.blob_path(sha).unlink(missing_ok=True)
+        return report
+
+    def link(self, sha: str, dest: Path) -> Path:
+        """Bildirim klasörüne blob referansı koyar (hardlink -> symlink -> kopya)."""
+        dest = Path(dest)
+        if dest.exists() or dest.is_symlink():
+            return dest
+        src = self.blob_path(sha)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.link(src, dest)
+        except OSError:
+            try:
+                dest.symlink_to(src.resolve())
+            except OSError:
+                tmp = dest.with_name(f".{dest.name}.{os.getpid()}.tmp")
+                shutil.copyfile(src, tmp)
+                os.replace(tmp, dest)
+        with self.conn:
+            self.conn.execute("UPDATE blobs SET refs = refs + 1 WHERE sha256 = ?", (sha,))
+        return dest
+
+    # ---------- indirme ----------
+
+    async def fetch(self, downloader, url: str, expect_binary: bool = True) -> str | None:
+        """
+        URL'i depoya indirir ve sha döndürür.
+        - Daha önce indirilmiş URL: istek atılmaz
+        - Aynı anda uçuşta olan URL: mevcut indirmenin sonucu beklenir
+        """
+        known = self.lookup_url(url)
+        if known is not None:
+            sha, size = known
+            self._bump(url_hits=1, bandwidth_saved=size, disk_saved=size)
+            return sha
+
+        inflight = self._inflight.get(url)
+        if inflight is not None:
+            sha = await asyncio.shield(inflight)
+            if sha is not None:
+                size = self.blob_path(sha).stat().st_size
+                self._bump(url_hits=1, bandwidth_saved=size, disk_saved=size)
+            return sha
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[url] = future
+        sha = None
+        try:
+            if expect_binary:
+                # PDF'ler belleğe alınmadan .part dosyasına akar, sonra atomik olarak blob olur
+                part = self.part_path(url)
+                lock = await asyncio.to_thread(lock_part, part)
+                try:
+                    # Kilidi beklerken başka süreç indirmeyi bitirmiş olabilir
+                    known = self.lookup_url(url)
+                    if known is not None:
+                        sha, size = known
+                        self._bump(url_hits=1, bandwidth_saved=size, disk_saved=size)
+                        return sha
+                    info = await downloader.fetch_to_file(url, part)
+                    if info is not None:
+                        sha, _ = self.put_file(part, info["sha256"], info["size"], url=url)
+                finally:
+                    unlock_part(lock)
+            else:
+                content = await downloader.fetch(url)
+                if content is not None:
+                    sha, _ = self.put_bytes(content.encode("utf-8"), url=url)
+            return sha
+        finally:
+            # Hata olsa bile bekleyenler None alıp kendi yollarına devam eder
+            future.set_result(sha)
+            self._inflight.pop(url, None)
+
+# ==========================
+# CLI
+# ==========================
+
+def format_bytes(n: int) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(n) < 1024:
+            return f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.1f} TB"
+
+def print_report(report: dict):
+    print(f"[BLOB] {report['day']}: {report['downloads']} indirme ({format_bytes(report['downloaded_bytes'])}), "
+          f"yeni veri {format_bytes(report['stored_bytes'])}")
+    print(f"[BLOB] URL tekrarı: {report['url_hits']} -> bant genişliği tasarrufu {format_bytes(report['bandwidth_saved'])}")
+    print(f"[BLOB] İçerik tekrarı: {report['content_hits']} -> toplam disk tasarrufu {format_bytes(report['disk_saved'])}")
+
+def main():
+    parser = argparse.ArgumentParser(description="KAP blob deposu")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_report = sub.add_parser("report", help="Günlük disk/bant genişliği tasarruf raporu")
+    p_report.add_argument("--date", help="YYYY-MM-DD (varsayılan: bugün)")
+    p_report.add_argument("--root", default=str(BLOB_DIR))
+    p_report.add_argument("--json", action="store_true")
+    p_verify = sub.add_parser("verify", help="Blob'ları sha256 ile yeniden doğrula")
+    p_verify.add_argument("--root", default=str(BLOB_DIR))
+    p_verify.add_argument("--remove", action="store_true", help="Bozuk/eksik blob'ları indeksten sil (yeniden indirilsin)")
+    args = parser.parse_args()
+
+    store = BlobStore(Path(args.root))
+    try:
+        if args.command == "verify":
+            result = store.verify(remove=args.remove)
+            print(f"[VERIFY] {result['checked']} blob kontrol edildi, "
+                  f"{len(result['missing'])} eksik, {len(result['corrupt'])} bozuk")
+            for sha in result["missing"] + result["corrupt"]:
+                print(f"  - {sha}")
+            return
+        report = store.daily_report(args.date)
+        if args.json:
+            print(json.dumps(report, ensure_ascii=False, indent=2))
+        else:
+            print_report(report)
+    finally:
+        store.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""
+KAP Bildirim Sınıflandırma
+==========================
+Üst seviye sınıf: FR (finansal rapor), DKB (devre kesici / volatilite) veya ODA.
+
+İki yol aynı kuralları uygular:
+- classify_disclosure(row): tek satır (referans kurallar)
+- classify_batch(rows): tüm liste tek seferde. Satırların kod ve metin alanları
+  ayraçla tek bir dizgeye eklenir, tüm ipuçları tek bir çok kalıplı otomatla
+  (pyahocorasick varsa Aho-Corasick, yoksa önceden derlenmiş tek regex) bir
+  geçişte taranır. PATTERN_DKB yalnızca çapası geçen satırlarda çalıştırılır.
+
+İki yolun korpus üzerinde aynı sonucu verdiği bench_classify.py ile doğrulanır.
+"""
+
+import math
+import re
+from bisect import bisect_right
+from itertools import accumulate
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+# ==========================
+# KURALLAR
+# ==========================
+
+# FR için metadata kod ipuçları
+FR_CODE_HINTS = ["FR", "MALI_TABLO", "MALİ_TABLO", "OZKAYNAK_DEGISIM", "ÖZKAYNAK_DEĞİŞİM", "NAKIT_AKIS", "NAKİT_AKIŞ"]
+FR_TEXT_HINTS = ["finansal rapor", "mali tablo", "mali rapor", "faaliyet raporu", "finansal tablo"]
+
+# DKB için kod ipuçları ve regex
+DKB_CODE_HINTS = ["VBTS", "DEVRE KESICI", "DEVRE KESİCİ", "VOLATILITE", "VOLATİLİTE"]
+PATTERN_DKB = re.compile(
+    r"(?i)(devre\s*kesici|volatilite\s*bazl[ıi]|işlem\s*sırası.*durdurul|VBTS)",
+    re.UNICODE,
+)
+# PATTERN_DKB'nin her alternatifinde geçmesi zorunlu, küçük harf metinde birebir
+# aranabilecek parçalar. i/ı/s/k içermezler: (?i) bu harflerde Türkçe/Unicode
+# eşdeğerlerini de eşler, çapa o durumda gerçek eşleşmeyi kaçırabilirdi.
+DKB_TEXT_ANCHORS = ["devre", "volat", "durdurul", "vbt"]
+
+def safe_lower(val: object) -> str:
+    """None/NaN güvenli lower."""
+    if val is None or (isinstance(val, float) and math.isnan(val)):
+        return ""
+    return str(val).lower()
+
+def code_field(row: dict) -> str:
+    disc_class = str(row.get("disclosureClass", "")).upper()
+    rule_type = str(row.get("ruleType", "")).upper()
+    return f"{disc_class} {rule_type}"
+
+def text_field(row: dict) -> str:
+    return safe_lower(row.get("subject", "")) + " " + safe_lower(row.get("summary", ""))
+
+# ==========================
+# TEK SATIR (REFERANS)
+# ==========================
+
+def is_fr(row: dict) -> bool:
+    """FR tespiti"""
+    combined_codes = code_field(row)
+
+    # 1) Kod ipuçları
+    for hint in FR_CODE_HINTS:
+        if hint in combined_codes:
+            return True
+
+    # 2) subject / summary üzerinden text ipuçları
+    text = text_field(row)
+    for hint in FR_TEXT_HINTS:
+        if hint in text:
+            return True
+
+    return False
+
+def is_dkb(row: dict) -> bool:
+    """DKB tespiti"""
+    combined_codes = code_field(row)
+
+    # Kod ipuçları
+    for hint in DKB_CODE_HINTS:
+        if hint in combined_codes:
+            return True
+
+    # subject / summary regex
+    if PATTERN_DKB.search(text_field(row)):
+        return True
+
+    return False
+
+def classify_disclosure(row: dict) -> str:
+    """Üst seviye sınıf: FR, DKB, veya ODA"""
+    if is_fr(row):
+        return "FR"
+    if is_dkb(row):
+        return "DKB"
+    return "ODA"
+
+# ==========================
+# ÇOK KALIPLI OTOMAT
+# ==========================
+
+class KeywordAutomaton:
+    """
+    Anahtar kelime -> bayrak. matches() metindeki eşleşmeleri (başlangıç, bayrak)
+    olarak verir; bir anahtarın bayrağı, içinde geçen diğer anahtarlarınkini de
+    kapsar, yani çakışan eşleşmelerde bayrak kaybolmaz.
+    """
+
+    def __init__(self, keywords: dict[str, int]):
+        # İçinde geçen anahtarların bayrakları dışarıdakine katlanır
+        self.flags = {
+            keyword: self._fold(keyword, keywords)
+            for keyword in keywords
+        }
+        if ahocorasick is not None:
+            self._automaton = ahocorasick.Automaton()
+            for keyword, flag in self.flags.items():
+                self._automaton.add_word(keyword, (len(keyword), flag))
+            self._automaton.make_automaton()
+            return
+        self._automaton = None
+        # Yedek: tek derlenmiş regex (en uzun anahtar önce). Kısmi çakışan iki
+        # anahtar farklı bayrak taşıyorsa her konumda lookahead ile taranır.
+        alternatives = "|".join(re.escape(k) for k in sorted(self.flags, key=len, reverse=True))
+        if self._needs_overlap(self.flags):
+            alternatives = f"(?=({alternatives}))"
+        self._pattern = re.compile(alternatives)
+
+    @staticmethod
+    def _fold(keyword: str, keywords: dict[str, int]) -> int:
+        flag = 0
+        for other, other_flag in keywords.items():
+            if other in keyword:
+                flag |= other_flag
+        return flag
+
+    @staticmethod
+    def _needs_overlap(flags: dict[str, int]) -> bool:
+        for a, flag_a in flags.items():
+            for b, flag_b in flags.items():
+                if flag_b & ~flag_a and any(a.endswith(b[:n]) for n in range(1, min(len(a), len(b)))):
+                    return True
+        return False
+
+    def matches(self, text: str):
+        if self._automaton is not None:
+            for end, (length, flag) in self._automaton.iter(text):
+                yield end - length + 1, flag
+        else:
+            flags = self.flags
+            for m in self._pattern.finditer(text):
+                yield m.start(), flags[m.group(m.lastindex or 0)]
+
+FR_CODE, DKB_CODE, FR_TEXT, DKB_TEXT = 1, 2, 4, 8
+CODE_FLAGS = FR_CODE | DKB_CODE
+TEXT_FLAGS = FR_TEXT | DKB_TEXT
+SEPARATOR = "\x00"  # Hiçbir ipucunda yok: eşleşme iki alan arasında taşamaz
+
+def _build_automaton() -> KeywordAutomaton:
+    keywords: dict[str, int] = {}
+    for hints, flag in (
+        (FR_CODE_HINTS, FR_CODE), (DKB_CODE_HINTS, DKB_CODE),
+        (FR_TEXT_HINTS, FR_TEXT), (DKB_TEXT_ANCHORS, DKB_TEXT),
+    ):
+        for hint in hints:
+            keywords[hint] = keywords.get(hint, 0) | flag
+    return KeywordAutomaton(keywords)
+
+AUTOMATON = _build_automaton()
+
+# ==========================
+# TOPLU SINIFLANDIRMA
+# ==========================
+
+def _plain(val: object) -> str:
+    if val is None or (isinstance(val, float) and math.isnan(val)):
+        return ""
+    return str(val)
+
+def _convert_column(values: list[str], convert) -> tuple[str, list[str]]:
+    """
+    Sütunu ayraçla birleştirip upper/lower'ı tek çağrıda uygular. İki işlem de
+    ayraçtan öteye bağlam taşımaz (final sigma kuralı dahil); "İ" gibi uzayan
+    harfler olsa da ayraçtan bölmek alanları doğru verir.
+    (birleşik dizge, alanlar) döndürür.
+    """
+    joined = SEPARATOR.join(values)
+    if joined.count(SEPARATOR) != len(values) - 1:  # Alanlardan biri ayracı içeriyor
+        values = [convert(v) for v in values]
+        return SEPARATOR.join(values), values
+    joined = convert(joined)
+    return joined, joined.split(SEPARATOR)
+
+def classify_batch(rows: list[dict]) -> list[str]:
+    """classify_disclosure ile aynı sonuç; kod ve metin sütunları birer taramada."""
+    if not rows:
+        return []
+    codes = _convert_column([f"{r.get('disclosureClass', '')} {r.get('ruleType', '')}" for r in rows], str.upper)
+    joined_texts, texts = _convert_column(
+        [_plain(r.get("subject", "")) + " " + _plain(r.get("summary", "")) for r in rows], str.lower
+    )
+
+    flags = [0] * len(rows)
+    for (joined, column), mask in ((codes, CODE_FLAGS), ((joined_texts, texts), TEXT_FLAGS)):
+        starts = list(accumulate((len(v) + 1 for v in column[:-1]), initial=0))
+        # Kod ipuçları yalnızca kod sütununda, metin ipuçları yalnızca metinde sayılır
+        for pos, flag in AUTOMATON.matches(joined):
+            if flag & mask:
+                flags[bisect_right(starts, pos) - 1] |= flag & mask
+
+    classes = []
+    for flag, text in zip(flags, texts):
+        if flag & (FR_CODE | FR_TEXT):
+            classes.append("FR")
+        elif flag & DKB_CODE or (flag & DKB_TEXT and PATTERN_DKB.search(text)):
+            classes.append("DKB")
+        else:
+            classes.append("ODA")
+    return classes
@@ -0,0 +1,544 @@
+"""
+KAP Asenkron İndirme Motoru
+===========================
+daily_kap_pipeline için eşzamanlı indirici:
+1. Sınırlı sayıda worker (asyncio) ile bildirimleri paralel işler
+2. Her host için token-bucket hız sınırlayıcı uygular
+3. 403/429 geldiğinde tüm host bucket'ını cooldown'a sokar ve session'ı yeniler
+   (budget=SharedBudget verilirse bucket, cooldown ve session yenileme sinyali
+   aynı dosyayı kullanan tüm süreçler arasında ortaktır; bkz. kap_workers)
+4. Büyük dosyaları belleğe almadan .part dosyasına akıtır, kesilirse Range ile devam eder
+
+Bloklayan requests çağrıları eşzamanlılık kadar thread'i olan ayrı bir
+havuzda çalışır (midas.py'deki asyncio.to_thread yaklaşımıyla aynı fikir;
+varsayılan havuz CPU sayısıyla sınırlı olduğu için kendi havuzumuzu açıyoruz).
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# ==========================
+# AYARLAR
+# ==========================
+DEFAULT_CONCURRENCY = 8        # Aynı anda uçuşta olabilecek en fazla istek
+DEFAULT_RATE_PER_HOST = 1.0    # Host başına saniyede istek (ortalama)
+DEFAULT_BURST = 3              # Bucket kapasitesi (anlık patlama)
+COOLDOWN_SECONDS = 60          # 403/429 sonrası host bazlı bekleme
+RETRY_SLEEP_SECONDS = 5        # Diğer hatalarda tekrar öncesi bekleme
+REQUEST_TIMEOUT = 60
+STREAM_CHUNK_SIZE = 64 * 1024  # Akışlı indirmede parça boyutu
+
+CONTENT_RANGE_RE = re.compile(r"bytes (\d+)-(\d+)/(\d+|\*)")
+
+# ==========================
+# HOST BAZLI TOKEN BUCKET
+# ==========================
+
+class HostBucket:
+    """Tek bir host için token-bucket + ortak cooldown durumu."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self.cooldown_until = 0.0
+        self.generation = 0  # Her cooldown'da artar -> session yenileme sinyali
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        elapsed = now - self.updated_at
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated_at = now
+
+    async def acquire(self):
+        """Bir token alana kadar bekler; cooldown süresince kimse geçemez."""
+        while True:
+            async with self._lock:
+                now = time.monotonic()
+                if now < self.cooldown_until:
+                    wait = self.cooldown_until - now
+                else:
+                    self._refill(now)
+                    if self.tokens >= 1.0:
+                        self.tokens -= 1.0
+                        return
+                    wait = (1.0 - self.tokens) / self.rate
+            await asyncio.sleep(wait)
+
+    def trigger_cooldown(self, seconds: float) -> bool:
+        """
+        Host'u cooldown'a sokar. Zaten cooldown'daysa süreyi uzatmaz;
+        aynı dalgadaki diğer 403/429'lar tek bir cooldown olarak sayılır.
+        True dönerse yeni bir cooldown başlatılmıştır.
+        """
+        now = time.monotonic()
+        if now < self.cooldown_until:
+            return False
+        self.cooldown_until = now + seconds
+        self.tokens = 0.0
+        self.updated_at = self.cooldown_until
+        self.generation += 1
+        return True
+
+# ==========================
+# SÜREÇLER ARASI ORTAK BÜTÇE
+# ==========================
+
+BUDGET_SCHEMA = """
+CREATE TABLE IF NOT EXISTS host_budget (
+    host           TEXT PRIMARY KEY,
+    tokens         REAL NOT NULL,
+    updated_at     REAL NOT NULL,
+    cooldown_until REAL NOT NULL DEFAULT 0,
+    cooldown_seconds REAL NOT NULL DEFAULT 0,
+    generation     INTEGER NOT NULL DEFAULT 0,
+    granted        INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+class SharedBudget:
+    """
+    HostBucket durumunun SQLite'ta tutulan hali. Aynı dosyayı açan tüm süreçler
+    host başına tek bir token bucket'ı paylaşır (zaman: time.time()).
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Sorgular thread havuzundan gelir; bağlantıyı kilitle paylaşıyoruz
+        self.conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(BUDGET_SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self):
+        self.conn.close()
+
+    def bucket(self, host: str, rate: float, burst: int) -> "SharedHostBucket":
+        return SharedHostBucket(self, host, rate, burst)
+
+    def _row(self, host: str, capacity: int, now: float) -> tuple[float, float, float, float, int]:
+        row = self.conn.execute(
+            "SELECT tokens, updated_at, cooldown_until, cooldown_seconds, generation FROM host_budget WHERE host = ?",
+            (host,),
+        ).fetchone()
+        if row is None:
+            row = (float(capacity), now, 0.0, 0.0, 0)
+            self.conn.execute(
+                "INSERT INTO host_budget (host, tokens, updated_at) VALUES (?, ?, ?)", (host, row[0], now)
+            )
+        return row
+
+    def take(self, host: str, rate: float, capacity: int) -> tuple[float, int]:
+        """Token alınabildiyse (0, generation), yoksa (beklenecek saniye, generation)."""
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                tokens, updated_at, cooldown_until, cooldown_seconds, generation = self._row(host, capacity, now)
+                # Duvar saati (NTP) geri atlarsa cooldown en fazla kendi süresi kadar,
+                # dolum damgası en fazla şimdiye kadar sürer; ileri atlarsa dolum en
+                # fazla bir bucket kadardır. Böylece saat adımı ne patlama ne kilit yaratır.
+                cooldown_until = min(cooldown_until, now + cooldown_seconds)
+                updated_at = min(updated_at, max(now, cooldown_until))
+                if now < cooldown_until:
+                    wait = cooldown_until - now
+                else:
+                    elapsed = min(max(0.0, now - updated_at), capacity / rate)
+                    tokens = min(capacity, tokens + elapsed * rate)
+                    wait = 0.0 if tokens >= 1.0 else (1.0 - tokens) / rate
+                    if not wait:
+                        tokens -= 1.0
+                    updated_at = now
+                self.conn.execute(
+                    """
+                    UPDATE host_budget SET tokens = ?, updated_at = ?, cooldown_until = ?,
+                                           granted = granted + ?
+                    WHERE host = ?
+                    """,
+                    (tokens, updated_at, cooldown_until, 0 if wait else 1, host),
+                )
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+        return wait, generation
+
+    def cooldown(self, host: str, capacity: int, seconds: float) -> bool:
+        """HostBucket.trigger_cooldown'ın ortak hali: aynı dalgadaki 403/429'lar tek cooldown sayılır."""
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                _, _, cooldown_until, cooldown_seconds, _ = self._row(host, capacity, now)
+                started = now >= min(cooldown_until, now + cooldown_seconds)
+                if started:
+                    self.conn.execute(
+                        """
+                        UPDATE host_budget SET cooldown_until = ?, cooldown_seconds = ?, tokens = 0,
+                                               updated_at = ?, generation = generation + 1
+                        WHERE host = ?
+                        """,
+                        (now + seconds, seconds, now + seconds, host),
+                    )
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+        return started
+
+    def stats(self) -> dict:
+        now = time.time()
+        return {
+            host: {"granted": granted, "cooldowns": generation, "cooling_down": cooldown_until > now}
+            for host, granted, generation, cooldown_until in self.conn.execute(
+                "SELECT host, granted, generation, cooldown_until FROM host_budget"
+            ).fetchall()
+        }
+
+class SharedHostBucket:
+    """HostBucket ile aynı arayüz; durum SharedBudget'ta."""
+
+    def __init__(self, budget: SharedBudget, host: str, rate: float, burst: int):
+        self.budget = budget
+        self.host = host
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.generation = 0  # Başka bir süreç cooldown başlatınca da artar -> session yenilenir
+
+    async def acquire(self):
+        while True:
+            wait, self.generation = await asyncio.to_thread(self.budget.take, self.host, self.rate, self.capacity)
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    def trigger_cooldown(self, seconds: float) -> bool:
+        started = self.budget.cooldown(self.host, self.capacity, seconds)
+        if started:
+            self.generation += 1
+        return started
+
+# ==========================
+# AKIŞLI / DEVAM EDEBİLEN İNDİRME
+# ==========================
+
+class IncompleteDownload(Exception):
+    """Gövde Content-Length'ten kısa kaldı; .part dosyası devam için saklanır."""
+
+    def __init__(self, message: str, received: int = 0):
+        super().__init__(message)
+        self.received = received
+
+def _meta_path(part_path: Path) -> Path:
+    return part_path.with_name(part_path.name + ".json")
+
+def _discard_part(part_path: Path):
+    for p in (part_path, _meta_path(part_path)):
+        try:
+            p.unlink()
+        except FileNotFoundError:
+            pass
+
+def _hash_existing(path: Path, h) -> int:
+    size = 0
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+            size += len(chunk)
+    return size
+
+def stream_to_file(session: requests.Session, url: str, part_path: Path) -> tuple[int, dict | None]:
+    """
+    Bloklayan akışlı GET. (status, info) döndürür; info yalnızca tam ve doğrulanmış
+    indirmede dolu olur. Doğrulama: Content-Length / Content-Range toplamı ile yazılan
+    byte sayısı eşleşmeli; sha256 yazarken hesaplanır (blob adresi olarak kullanılır).
+    """
+    part_path.parent.mkdir(parents=True, exist_ok=True)
+    meta_path = _meta_path(part_path)
+
+    offset = part_path.stat().st_size if part_path.exists() else 0
+    meta = {}
+    if offset:
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        except Exception:
+            meta = {}
+        if not meta.get("total"):
+            # Toplam boyutu bilinmeyen yarım dosyaya güvenmiyoruz
+            _discard_part(part_path)
+            offset, meta = 0, {}
+
+    headers = {}
+    if offset:
+        headers["Range"] = f"bytes={offset}-"
+        validator = meta.get("etag") or meta.get("last_modified")
+        if validator:
+            headers["If-Range"] = validator
+
+    with session.get(url, headers=headers, stream=True, timeout=REQUEST_TIMEOUT) as resp:
+        status = resp.status_code
+
+        if status == 416:
+            # Sunucu aralığı kabul etmedi (dosya değişmiş olabilir): baştan başla
+            _discard_part(part_path)
+            raise IncompleteDownload("416 Range Not Satisfiable, .part silindi")
+
+        if status == 206:
+            m = CONTENT_RANGE_RE.match(resp.headers.get("Content-Range", ""))
+            if not m or int(m.group(1)) != offset or (m.group(3) != "*" and int(m.group(3)) != meta["total"]):
+                _discard_part(part_path)
+                raise IncompleteDownload("Content-Range uyuşmuyor, .part silindi")
+            expected_total = meta["total"]
+        elif status == 200:
+            # Range desteklenmiyor ya da kaynak değişti (If-Range): baştan yaz
+            offset = 0
+            length = resp.headers.get("Content-Length")
+            expected_total = int(length) if length and length.isdigit() else None
+        else:
+            return status, None
+
+        if status == 200:
+            meta = {
+                "url": url,
+                "etag": resp.headers.get("ETag"),
+                "last_modified": resp.headers.get("Last-Modified"),
+                "total": expected_total,
+            }
+            meta_path.write_text(json.dumps(meta), encoding="utf-8")
+
+        h = hashlib.sha256()
+        if offset:
+            _hash_existing(part_path, h)
+
+        received = 0
+        with open(part_path, "ab" if offset else "wb") as f:
+            try:
+                for chunk in resp.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                    if chunk:
+                        f.write(chunk)
+                        h.update(chunk)
+                        received += len(chunk)
+            except requests.RequestException as e:
+                f.flush()
+                os.fsync(f.fileno())
+                raise IncompleteDownload(f"bağlantı koptu ({offset + received} byte): {e}", received)
+            f.flush()
+            os.fsync(f.fileno())
+
+    size = offset + received
+    if expected_total is not None and size != expected_total:
+        raise IncompleteDownload(f"{size}/{expected_total} byte alındı", received)
+
+    try:
+        meta_path.unlink()
+    except FileNotFoundError:
+        pass
+    return 200, {"sha256": h.hexdigest(), "size": size, "received": received, "resumed_from": offset}
+
+# ==========================
+# İNDİRİCİ
+# ==========================
+
+class AsyncKapDownloader:
+    """
+    robust_get'in asenkron karşılığı.
+
+    session_factory: host başına requests.Session üretir
+    (varsayılan olarak pipeline'daki create_browser_session verilir).
+    """
+
+    def __init__(
+        self,
+        session_factory,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        rate_per_host: float = DEFAULT_RATE_PER_HOST,
+        burst: int = DEFAULT_BURST,
+        cooldown_seconds: float = COOLDOWN_SECONDS,
+        max_retries: int = 3,
+        budget: SharedBudget | None = None,
+    ):
+        self.session_factory = session_factory
+        self.budget = budget
+        self.concurrency = concurrency
+        self.rate_per_host = rate_per_host
+        self.burst = burst
+        self.cooldown_seconds = cooldown_seconds
+        self.max_retries = max_retries
+
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="kap-dl")
+        self._buckets: dict[str, HostBucket] = {}
+        self._sessions: dict[str, tuple[int, requests.Session]] = {}
+
+        self.stats = {"requests": 0, "ok": 0, "failed": 0, "cooldowns": 0, "bytes": 0, "resumed": 0}
+
+    def _bucket(self, host: str) -> HostBucket | SharedHostBucket:
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            if self.budget is not None:
+                bucket = self.budget.bucket(host, self.rate_per_host, self.burst)
+            else:
+                bucket = HostBucket(self.rate_per_host, self.burst)
+            self._buckets[host] = bucket
+        return bucket
+
+    def _session(self, host: str, generation: int) -> requests.Session:
+        """Cooldown sonrası (generation değişince) host session'ını yeniler."""
+        current = self._sessions.get(host)
+        if current is None or current[0] != generation:
+            if current is not None:
+                current[1].close()
+            session = self.session_factory()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            current = (generation, session)
+            self._sessions[host] = current
+        return current[1]
+
+    async def _request(self, url: str, do_request):
+        """
+        Ortak tekrar döngüsü: rate limit, cooldown, session yenileme.
+        do_request(session) thread havuzunda çalışır ve (status, sonuç, byte) döndürür.
+        """
+        host = urlparse(url).netloc
+        bucket = self._bucket(host)
+
+        for attempt in range(1, self.max_retries + 1):
+            await bucket.acquire()
+            try:
+                async with self._semaphore:
+                    session = self._session(host, bucket.generation)
+                    self.stats["requests"] += 1
+                    loop = asyncio.get_running_loop()
+                    status, result, nbytes = await loop.run_in_executor(
+                        self._executor, lambda: do_request(session)
+                    )
+
+                if status == 200:
+                    self.stats["ok"] += 1
+                    self.stats["bytes"] += nbytes
+                    return result
+
+                if status in (403, 429):
+                    if bucket.trigger_cooldown(self.cooldown_seconds):
+                        self.stats["cooldowns"] += 1
+                        print(f"[WARN] {status} geldi ({url}), {host} için cooldown {self.cooldown_seconds:.0f}s + session yenile (attempt {attempt})")
+                    continue
+
+                print(f"[WARN] {url} -> status {status} (attempt {attempt})")
+                await asyncio.sleep(RETRY_SLEEP_SECONDS)
+
+            except IncompleteDownload as e:
+                # .part dosyası duruyor; bir sonraki deneme Range ile kaldığı yerden devam eder
+                self.stats["bytes"] += e.received
+                print(f"[WARN] Yarım indirme: {url} -> {e} (attempt {attempt})")
+                await asyncio.sleep(RETRY_SLEEP_SECONDS)
+
+            except Exception as e:
+                print(f"[ERROR] GET hata: {url} -> {e} (attempt {attempt})")
+                await asyncio.sleep(RETRY_SLEEP_SECONDS)
+
+        self.stats["failed"] += 1
+        print(f"[FAIL] {url} -> max retry aşıldı.")
+        return None
+
+    async def fetch(self, url: str, expect_binary: bool = False):
+        """429/403 durumunda host'u bekletip tekrar deneyen asenkron GET (gövde bellekte)."""
+        def do_request(session):
+            resp = session.get(url, timeout=REQUEST_TIMEOUT)
+            if resp.status_code != 200:
+                return resp.status_code, None, 0
+            return 200, (resp.content if expect_binary else resp.text), len(resp.content)
+
+        return await self._request(url, do_request)
+
+    async def head_size(self, url: str) -> int | None:
+        """HEAD ile Content-Length; bilinmiyorsa ya da HEAD desteklenmiyorsa None."""
+        def do_request(session):
+            resp = session.head(url, timeout=REQUEST_TIMEOUT, allow_redirects=True)
+            if resp.status_code in (403, 429):
+                return resp.status_code, None, 0
+            length = resp.headers.get("Content-Length", "")
+            # Diğer hatalarda tekrar denemeye gerek yok: boyut bilinmiyor sayılır
+            return 200, int(length) if resp.status_code == 200 and length.isdigit() else None, 0
+
+        return await self._request(url, do_request)
+
+    async def post_json(self, url: str, payload: dict):
+        """JSON POST (ör. byCriteria); aynı host bütçesini ve cooldown'ı paylaşır."""
+        def do_request(session):
+            resp = session.post(url, data=json.dumps(payload), timeout=REQUEST_TIMEOUT)
+            if resp.status_code != 200:
+                return resp.status_code, None, 0
+            return 200, resp.json(), len(resp.content)
+
+        return await self._request(url, do_request)
+
+    async def fetch_to_file(self, url: str, part_path: Path) -> dict | None:
+        """
+        Gövdeyi parça parça part_path'e yazar (bellek kullanımı dosya boyutundan bağımsız).
+        Önceki denemeden kalan .part varsa HTTP Range ile devam eder.
+        Başarılıysa {"sha256", "size", "resumed_from"} döner; dosya fsync'lenmiş olur.
+        """
+        def do_request(session):
+            status, info = stream_to_file(session, url, Path(part_path))
+            if info is None:
+                return status, None, 0
+            if info["resumed_from"]:
+                self.stats["resumed"] += 1
+            return status, info, info["received"]
+
+        return await self._request(url, do_request)
+
+    def close(self):
+        for _, session in self._sessions.values():
+            session.close()
+        self._sessions.clear()
+        self._executor.shutdown(wait=False)
+
+# ==========================
+# WORKER HAVUZU
+# ==========================
+
+async def run_worker_pool(items: list, handler, workers: int = DEFAULT_CONCURRENCY):
+    """
+    items içindeki her eleman için `await handler(i, item)` çalıştırır.
+    Aynı anda en fazla `workers` eleman işlenir; bir elemandaki hata
+    diğerlerini durdurmaz.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    for i, item in enumerate(items, 1):
+        queue.put_nowait((i, item))
+
+    async def worker():
+        while True:
+            try:
+                i, item = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                await handler(i, item)
+            except Exception as e:
+                print(f"[ERROR] Worker hata ({i}): {e}")
+            finally:
+                queue.task_done()
+
+    tasks = [asyncio.create_task(worker()) for _ in range(max(1, min(workers, len(items))))]
+    await asyncio.gather(*tasks)
@@ -0,0 +1,201 @@
+"""
+KAP Bildirim HTML Ayrıştırıcı
+=============================
+Bildirim HTML'i tek sefer okunur ve tek sefer parse edilir; sembol, ek listesi,
+temiz metin ve tablo blokları aynı ağaçtan çıkarılır.
+
+lxml varsa onu kullanır (C parser), yoksa BeautifulSoup(html.parser)'a düşer.
+
+Dönen yapı:
+    {
+        "symbol": "AEFES" | None,
+        "attachments": [{"url": ..., "label": ...}, ...],
+        "text": "temiz metin",
+        "tables": [[["hücre", ...], ...], ...],   # tablo -> satır -> hücre
+    }
+
+Metin çıkarma kuralları değiştiğinde EXTRACTOR_VERSION artırılır; gemini
+JSON'larındaki "extraction" damgası eskiyenleri kap_reextract yeniden üretir.
+"""
+
+from pathlib import Path
+
+try:
+    import lxml.html
+    HAS_LXML = True
+except ImportError:
+    from bs4 import BeautifulSoup
+    HAS_LXML = False
+
+KAP_BASE_URL = "https://www.kap.org.tr"
+# lxml ve bs4 yolları birebir aynı metni üretmeyebilir: parser da sürümün parçası
+EXTRACTOR_VERSION = "kaphtml-1/" + ("lxml" if HAS_LXML else "bs4")
+ATTACHMENT_PREFIX = "/tr/api/file/download/"
+SYMBOL_LABELS = ("şirket kodu", "hisse kodu", "stock code")
+NEXT_LABEL_XPATH = (
+    "(descendant::*[self::span or self::div or self::td]"
+    " | following::*[self::span or self::div or self::td])[1]"
+)
+
+# ==========================
+# ORTAK YARDIMCILAR
+# ==========================
+
+def clean_text(text: str) -> str:
+    """Fazla boşlukları temizler (eski extract_text_from_html ile aynı kural)."""
+    lines = (line.strip() for line in text.splitlines())
+    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+    return " ".join(chunk for chunk in chunks if chunk)
+
+def looks_like_symbol(value: str) -> bool:
+    return 3 <= len(value) <= 6 and value.isupper()
+
+def symbol_from_title(title_text: str) -> str | None:
+    """Başlıkta genellikle "SYMBOL - ..." formatı var"""
+    if " - " in title_text:
+        potential = title_text.split(" - ")[0].strip()
+        if looks_like_symbol(potential):
+            return potential
+    return None
+
+def empty_result() -> dict:
+    return {"symbol": None, "attachments": [], "text": "", "tables": []}
+
+# ==========================
+# LXML
+# ==========================
+
+def _parse_lxml(html_text: str, base_url: str) -> dict:
+    doc = lxml.html.document_fromstring(html_text)
+    result = empty_result()
+
+    # 1) Sembol: meta -> title -> "Şirket Kodu" etiketi
+    for meta in doc.iter("meta"):
+        if meta.get("name") == "stockCode" or meta.get("property") == "stockCode":
+            value = (meta.get("content") or "").strip()
+            if value:
+                result["symbol"] = value
+                break
+
+    if result["symbol"] is None:
+        title = doc.find(".//title")
+        if title is not None:
+            result["symbol"] = symbol_from_title(title.text_content().strip())
+
+    # 2) Ekler + 3) tablolar + etiket bazlı sembol tek gezintide
+    label_elems = []
+    for el in doc.iter("a", "table", "span", "div", "td", "th"):
+        tag = el.tag
+        if tag == "a":
+            href = el.get("href") or ""
+            # Eski regex yalnızca düz metinli <a> etiketlerini yakalıyordu
+            if href.startswith(ATTACHMENT_PREFIX) and el.text and len(el) == 0:
+                result["attachments"].append({"url": base_url + href, "label": el.text.strip()})
+        elif tag == "table":
+            rows = []
+            for tr in el.iter("tr"):
+                cells = [c.text_content().strip() for c in tr if c.tag in ("td", "th")]
+                if any(cells):
+                    rows.append(cells)
+            if rows:
+                result["tables"].append(rows)
+        elif result["symbol"] is None:
+            label_elems.append(el)
+
+    if result["symbol"] is None:
+        for el in label_elems:
+            text = el.text_content().strip().lower()
+            if any(label in text for label in SYMBOL_LABELS):
+                # bs4 find_next ile aynı: belge sırasında sonraki span/div/td
+                found = el.xpath(NEXT_LABEL_XPATH)
+                nxt = found[0] if found else None
+                if nxt is not None:
+                    value = nxt.text_content().strip()
+                    if looks_like_symbol(value):
+                        result["symbol"] = value
+                        break
+
+    # 4) Metin: script/style hariç
+    for bad in list(doc.iter("script", "style")):
+        bad.drop_tree()
+    result["text"] = clean_text(doc.text_content())
+    return result
+
+# ==========================
+# BEAUTIFULSOUP (yedek)
+# ==========================
+
+def _parse_bs4(html_text: str, base_url: str) -> dict:
+    soup = BeautifulSoup(html_text, "html.parser")
+    result = empty_result()
+
+    for meta in soup.find_all("meta"):
+        if meta.get("name") == "stockCode" or meta.get("property") == "stockCode":
+            value = meta.get("content", "").strip()
+            if value:
+                result["symbol"] = value
+                break
+
+    if result["symbol"] is None:
+        title = soup.find("title")
+        if title:
+            result["symbol"] = symbol_from_title(title.get_text().strip())
+
+    if result["symbol"] is None:
+        for label in soup.find_all(["span", "div", "td", "th"]):
+            text = label.get_text().strip().lower()
+            if any(lbl in text for lbl in SYMBOL_LABELS):
+                nxt = label.find_next(["span", "div", "td"])
+                if nxt:
+                    value = nxt.get_text().strip()
+                    if looks_like_symbol(value):
+                        result["symbol"] = value
+                        break
+
+    for a in soup.find_all("a", href=True):
+        href = a["href"]
+        if href.startswith(ATTACHMENT_PREFIX) and a.string and len(a.contents) == 1:
+            result["attachments"].append({"url": base_url + href, "label": a.string.strip()})
+
+    for table in soup.find_all("table"):
+        rows = []
+        for tr in table.find_all("tr"):
+            cells = [c.get_text().strip() for c in tr.find_all(["td", "th"], recursive=False)]
+            if any(cells):
+                rows.append(cells)
+        if rows:
+            result["tables"].append(rows)
+
+    for bad in soup(["script", "style"]):
+        bad.decompose()
+    result["text"] = clean_text(soup.get_text())
+    return result
+
+# ==========================
+# API
+# ==========================
+
+def parse_disclosure_html(html_text: str, base_url: str = KAP_BASE_URL) -> dict:
+    """HTML metnini tek geçişte ayrıştırır."""
+    if not html_text or not html_text.strip():
+        return empty_result()
+    try:
+        if HAS_LXML:
+            return _parse_lxml(html_text, base_url)
+        return _parse_bs4(html_text, base_url)
+    except Exception as e:
+        print(f"[WARN] HTML ayrıştırma hatası: {e}")
+        return empty_result()
+
+def parse_disclosure_file(html_path: Path, base_url: str = KAP_BASE_URL) -> dict:
+    """HTML dosyasını bir kez okuyup ayrıştırır."""
+    try:
+        html_text = Path(html_path).read_text(encoding="utf-8", errors="ignore")
+    except Exception as e:
+        print(f"[WARN] HTML okunamadı: {html_path} -> {e}")
+        return empty_result()
+    return parse_disclosure_html(html_text, base_url)
+
+def extraction_stamp(html_sha256: str | None) -> dict:
+    """gemini JSON'a yazılan kaynak damgası: hangi çıkarıcı, hangi HTML içeriği."""
+    return {"version": EXTRACTOR_VERSION, "html_sha256": html_sha256}
@@ -0,0 +1,278 @@
+"""
+KAP Canlı Mod
+=============
+Sürekli döngü (main) 5 dakikada bir çalışır; piyasayı etkileyen bir bildirim
+analizörlere dakikalar sonra ulaşabilir. Canlı mod:
+
+- byCriteria'yı BIST seansında 10-20 sn'de bir, seans dışında seyrek yoklar
+- watermark'ın üstündeki bildirimleri beklemeden işlemeye başlar; yoklama
+  indirmeleri beklemez (tek indirici, host bütçesi ortak)
+- gemini JSON'u HTML iner inmez kuyruğa verilir (PDF'ler ayrı havuzda arkadan gelir)
+- yayın -> tespit -> teslim gecikmesini manifest'e yazar, gün bazında
+  yüzdelik (p50/p90/p99) raporlar
+
+Kullanım:
+    python daily_kap_pipeline.py live [--workers 8] [--rate 1.0]
+    python kap_live.py --report 2025-01-15
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, time as dtime
+
+import daily_kap_pipeline as pipeline
+from kap_queue import TOPIC_GEMINI
+
+# ==========================
+# AYARLAR
+# ==========================
+# BIST pay piyasası: açılış seansı 09:40, kapanış seansı 18:10'da biter.
+# Finansal raporlar seans sonrası da yoğun geldiği için akşam aralığı ayrı.
+SESSION_START = dtime(9, 40)
+SESSION_END = dtime(18, 10)
+EXTENDED_START = dtime(8, 0)
+EXTENDED_END = dtime(23, 0)
+
+# Faz başına yoklama aralığı (sn, jitter'lı)
+POLL_INTERVALS = {
+    "session": (10.0, 20.0),
+    "extended": (45.0, 75.0),
+    "off": (240.0, 360.0),
+}
+
+GAP_EVERY_SECONDS = 600        # Boşluk taraması (catch_up_gaps) sıklığı
+REPORT_EVERY_POLLS = 20        # Kaç yoklamada bir günün gecikme özeti yazılsın
+
+# ==========================
+# ZAMANLAMA
+# ==========================
+
+def market_phase(now: datetime) -> str:
+    """session / extended / off (hafta sonu her zaman off; resmi tatiller dikkate alınmaz)."""
+    if now.weekday() >= 5:
+        return "off"
+    t = now.time()
+    if SESSION_START <= t < SESSION_END:
+        return "session"
+    if EXTENDED_START <= t < EXTENDED_END:
+        return "extended"
+    return "off"
+
+def poll_interval(now: datetime) -> tuple[str, float]:
+    phase = market_phase(now)
+    return phase, random.uniform(*POLL_INTERVALS[phase])
+
+# ==========================
+# CANLI İŞLEYİCİ
+# ==========================
+
+class LiveIngestor:
+    """
+    Yoklama ve işleme birbirini beklemez. Watermark yalnızca disclosureIndex
+    sırasıyla bitmiş ön ek üzerinden ilerletilir (advance_watermark), böylece
+    uçuştaki bir bildirim atlanmaz.
+    """
+
+    def __init__(self, downloader, workers: int = pipeline.DOWNLOAD_WORKERS):
+        self.downloader = downloader
+        self.mark = pipeline.load_watermark()
+        self.sem = asyncio.Semaphore(max(1, workers))          # analyzable aşaması (HTML + gemini)
+        self.enrich_sem = asyncio.Semaphore(max(1, workers))   # enriched aşaması (PDF'ler)
+        self.pending: dict[int, dict] = {}        # Listelendi, watermark'a henüz yansımadı
+        self.results: dict[int, bool] = {}        # Bitenlerin sonucu
+        self.detected: dict[int, datetime] = {}   # İlk görüldüğü yoklama
+        self.scheduled: set[int] = set()          # Bu süreçte gerçekten işlenenler (manifest'te olmayanlar)
+        self.tasks: set[asyncio.Task] = set()
+
+    def _is_new(self, item: dict) -> bool:
+        idx = int(item.get("disclosureIndex") or 0)
+        if idx in self.pending:
+            return False
+        last_index = self.mark.get("last_index")
+        return last_index is None or idx > int(last_index) or str(idx) in self.mark.get("failures", {})
+
+    async def poll(self) -> int:
+        """Hedef tarih(ler)i yoklar, yeni bildirimleri işlemeye başlar; yeni bildirim sayısını döndürür."""
+        detected_at = datetime.now()
+        fresh = []
+        for target_date in pipeline.target_dates_for_cycle(self.mark, detected_at):
+            data = await self.downloader.post_json(
+                pipeline.BY_CRITERIA_URL, pipeline.build_criteria_payload(target_date, target_date)
+            )
+            if data is None:
+                print(f"[WARN] {target_date} listesi alınamadı")
+                continue
+            # Sembol çözümü ve sınıflandırma yalnızca yeni kayıtlar için
+            fresh.extend(item for item in data if isinstance(item, dict) and self._is_new(item))
+
+        disclosures = {int(d["disclosureIndex"]): d for d in pipeline.parse_disclosure_items(fresh)}
+        if not disclosures:
+            return 0
+
+        existing = pipeline.get_manifest().existing_indices(disclosures)
+        for idx, disclosure in sorted(disclosures.items()):
+            self.pending[idx] = disclosure
+            self.detected.setdefault(idx, detected_at)
+            if idx in existing:
+                self.results[idx] = True
+                continue
+            self.scheduled.add(idx)
+            task = asyncio.create_task(self._process(idx, disclosure))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+        return len(disclosures) - len(existing)
+
+    async def _process(self, idx: int, disclosure: dict):
+        ok = False
+        try:
+            # PDF'ler ayrı havuzda: büyük bir ek yeni bildirimlerin yayınını bekletmez
+            async with self.sem:
+                state = await pipeline.publish_analyzable(self.downloader, disclosure)
+            if state is None:
+                ok = True
+            else:
+                async with self.enrich_sem:
+                    ok = await pipeline.enrich_disclosure(self.downloader, state)
+        except Exception as e:
+            print(f"[ERROR] {disclosure.get('symbol', '?')} {idx} işlenirken hata: {e}")
+        self.results[idx] = bool(ok)
+
+    def settle(self) -> int:
+        """Sıralı olarak bitmiş bildirimlerle watermark'ı ilerletir, gecikmeleri yazar."""
+        ready = []
+        for idx in sorted(self.pending):
+            if idx not in self.results:
+                break
+            ready.append(idx)
+        if not ready:
+            return 0
+
+        succeeded = {i for i in ready if self.results[i]}
+        self.mark = pipeline.advance_watermark(self.mark, [self.pending[i] for i in ready], succeeded)
+        pipeline.save_watermark(self.mark)
+        self._record_latency([i for i in ready if i in succeeded and i in self.scheduled])
+
+        # Başarısız olanlar bir sonraki yoklamada (watermark üstünde / failures) tekrar listelenir
+        for idx in ready:
+            self.pending.pop(idx, None)
+            self.results.pop(idx, None)
+            self.detected.pop(idx, None)
+            self.scheduled.discard(idx)
+        return len(ready)
+
+    def _record_latency(self, indices: list[int]):
+        if not indices:
+            return
+        # Teslim anı: gemini JSON'un kuyruğa girdiği an (PDF'lerden önce)
+        handoffs = pipeline.get_queue().enqueued_at(TOPIC_GEMINI, indices)
+        rows = []
+        for idx in indices:
+            published = pipeline.parse_publish_date(self.pending[idx].get("publishDate"))
+            handoff = handoffs.get(str(idx))
+            if published is None or handoff is None:
+                continue
+            rows.append((idx, published, self.detected[idx], datetime.fromtimestamp(handoff)))
+        pipeline.get_manifest().record_latency(rows)
+        for idx, published, detected, handoff in rows:
+            print(f"[LIVE] {self.pending[idx].get('symbol')} {idx}: tespit {(detected - published).total_seconds():.0f}s, "
+                  f"teslim {(handoff - published).total_seconds():.0f}s")
+
+    async def drain(self):
+        if self.tasks:
+            await asyncio.gather(*list(self.tasks), return_exceptions=True)
+        self.settle()
+
+# ==========================
+# RAPOR
+# ==========================
+
+def print_latency_report(day: str):
+    report = pipeline.get_manifest().latency_percentiles(day)
+    if not report["count"]:
+        print(f"[LATENCY] {day}: kayıt yok")
+        return
+
+    def fmt(values: dict) -> str:
+        return " ".join(f"{k}={v:.0f}s" for k, v in values.items() if v is not None)
+
+    print(f"[LATENCY] {day}: {report['count']} bildirim | tespit {fmt(report['detect'])} | teslim {fmt(report['handoff'])}")
+
+# ==========================
+# ÇALIŞTIRMA
+# ==========================
+
+async def live_async(workers: int | None = None, rate: float | None = None):
+    downloader = pipeline.make_downloader(rate_per_host=rate)
+    ingestor = LiveIngestor(downloader, workers or pipeline.DOWNLOAD_WORKERS)
+    current_day = datetime.now().date()
+    last_gap_check = time.monotonic()
+    last_phase = None
+    polls = 0
+
+    try:
+        while True:
+            now = datetime.now()
+            phase, interval = poll_interval(now)
+            if phase != last_phase:
+                low, high = POLL_INTERVALS[phase]
+                print(f"\n[LIVE] Faz: {phase} (yoklama {low:.0f}-{high:.0f}s)")
+                last_phase = phase
+
+            try:
+                found = await ingestor.poll()
+                if found:
+                    print(f"\n[{now.strftime('%H:%M:%S')}] [LIVE] {found} yeni bildirim (watermark: {ingestor.mark.get('last_index', '-')})")
+            except Exception as e:
+                print(f"[ERROR] Yoklama hatası: {e}")
+            ingestor.settle()
+            polls += 1
+
+            if now.date() != current_day:
+                print_latency_report(current_day.isoformat())
+                current_day = now.date()
+            elif polls % REPORT_EVERY_POLLS == 0:
+                print_latency_report(current_day.isoformat())
+
+            # Boşluk taraması uçuşta iş yokken, aynı indirici (aynı host bütçesi) ile
+            if not ingestor.tasks and time.monotonic() - last_gap_check > GAP_EVERY_SECONDS:
+                last_gap_check = time.monotonic()
+                try:
+                    await pipeline.catch_up_gaps(downloader=downloader)
+                except Exception as e:
+                    print(f"[ERROR] Boşluk taraması hatası: {e}")
+
+            await asyncio.sleep(interval)
+    finally:
+        await ingestor.drain()
+        downloader.close()
+
+def run_live(args: argparse.Namespace):
+    print("=" * 80)
+    print("KAP CANLI MOD (seans: "
+          f"{SESSION_START.strftime('%H:%M')}-{SESSION_END.strftime('%H:%M')}, "
+          f"{POLL_INTERVALS['session'][0]:.0f}-{POLL_INTERVALS['session'][1]:.0f}s)")
+    print("=" * 80)
+    try:
+        asyncio.run(live_async(workers=args.workers, rate=args.rate))
+    except KeyboardInterrupt:
+        print("\n[INFO] Canlı mod durduruldu")
+    print_latency_report(datetime.now().date().isoformat())
+
+def add_live_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--workers", type=int, default=None, help="Aynı anda işlenen bildirim")
+    parser.add_argument("--rate", type=float, default=None, help="Host başına saniyede istek")
+
+def main():
+    parser = argparse.ArgumentParser(description="KAP canlı mod")
+    add_live_arguments(parser)
+    parser.add_argument("--report", metavar="YYYY-MM-DD", help="Sadece o günün gecikme yüzdeliklerini yazdır")
+    args = parser.parse_args()
+    if args.report:
+        print_latency_report(args.report)
+    else:
+        run_live(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,509 @@
+"""
+KAP Bildirim Manifest'i
+=======================
+daily_data_kap altında indirilmiş bildirimlerin kalıcı indeksi (SQLite, WAL).
+Her döngüde klasör ağacını taramak yerine dedup kontrolü indeksli sorgu olur.
+
+Tablolar:
+- disclosures: disclosureIndex, sembol, sınıf, yollar, genel durum
+- files:       bildirime ait her dosya (html/form_pdf/attachment/detail/gemini) + boyut + sha256
+- stages:      aşama bazlı durum (html, form_pdf, attachments, gemini ...)
+- backfill_shards: geçmiş doldurma (kap_backfill) tarih parçalarının checkpoint'i
+- gap_checks:  disclosureIndexList ile sorgulanıp bizim üye tipimize ait çıkmayan index'ler
+- ingest_latency: canlı modda (kap_live) yayın -> tespit -> analizöre teslim süreleri
+
+Kullanım (mevcut ağacı bir kerelik içe aktarma):
+    python kap_manifest.py rebuild [--no-hash]
+    python kap_manifest.py stats
+"""
+
+import argparse
+import hashlib
+import json
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+
+# ==========================
+# AYARLAR
+# ==========================
+PROJECT_ROOT = Path(__file__).parent
+DAILY_DATA_DIR = PROJECT_ROOT / "daily_data_kap"
+MANIFEST_FILE = DAILY_DATA_DIR / "manifest.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS disclosures (
+    disclosure_index INTEGER PRIMARY KEY,
+    symbol           TEXT,
+    top_level_class  TEXT,
+    disclosure_class TEXT,
+    publish_date     TEXT,
+    subject          TEXT,
+    detail_path      TEXT,
+    gemini_path      TEXT,
+    status           TEXT NOT NULL,
+    created_at       TEXT NOT NULL,
+    updated_at       TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_disclosures_symbol ON disclosures(symbol);
+CREATE INDEX IF NOT EXISTS idx_disclosures_status ON disclosures(status);
+
+CREATE TABLE IF NOT EXISTS files (
+    disclosure_index INTEGER NOT NULL,
+    kind             TEXT NOT NULL,
+    seq              INTEGER NOT NULL DEFAULT 0,
+    path             TEXT NOT NULL,
+    url              TEXT,
+    size             INTEGER,
+    sha256           TEXT,
+    PRIMARY KEY (disclosure_index, kind, seq)
+);
+CREATE INDEX IF NOT EXISTS idx_files_sha256 ON files(sha256);
+
+CREATE TABLE IF NOT EXISTS backfill_shards (
+    shard_id    TEXT PRIMARY KEY,
+    from_date   TEXT NOT NULL,
+    to_date     TEXT NOT NULL,
+    status      TEXT NOT NULL,
+    listed      INTEGER,
+    done        INTEGER,
+    failed      INTEGER,
+    started_at  TEXT,
+    finished_at TEXT,
+    updated_at  TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS gap_checks (
+    disclosure_index INTEGER PRIMARY KEY,
+    checked_at       TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS ingest_latency (
+    disclosure_index INTEGER PRIMARY KEY,
+    publish_day      TEXT NOT NULL,
+    published_at     TEXT NOT NULL,
+    detected_at      TEXT NOT NULL,
+    handoff_at       TEXT NOT NULL,
+    detect_seconds   REAL NOT NULL,
+    handoff_seconds  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_latency_day ON ingest_latency(publish_day);
+
+CREATE TABLE IF NOT EXISTS stages (
+    disclosure_index INTEGER NOT NULL,
+    stage            TEXT NOT NULL,
+    status           TEXT NOT NULL,
+    error            TEXT,
+    updated_at       TEXT NOT NULL,
+    PRIMARY KEY (disclosure_index, stage)
+);
+"""
+
+STATUS_DONE = "done"
+STATUS_PARTIAL = "partial"
+STATUS_FAILED = "failed"
+STATUS_RUNNING = "running"
+
+# ==========================
+# YARDIMCILAR
+# ==========================
+
+def now_iso() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+def sha256_file(path: Path, chunk_size: int = 1024 * 1024) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def file_record(kind: str, path, url: str | None = None, seq: int = 0, with_hash: bool = True) -> dict | None:
+    """Diskteki bir dosya için files tablosu satırı üretir; dosya yoksa None."""
+    if path is None:
+        return None
+    path = Path(path)
+    if not path.exists():
+        return None
+    return {
+        "kind": kind,
+        "seq": seq,
+        "path": str(path),
+        "url": url,
+        "size": path.stat().st_size,
+        "sha256": sha256_file(path) if with_hash else None,
+    }
+
+def percentile(sorted_values: list[float], p: float) -> float | None:
+    """Nearest-rank yüzdelik (sorted_values sıralı olmalı)."""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * p // 100))  # ceil
+    return sorted_values[int(rank) - 1]
+
+# ==========================
+# MANIFEST
+# ==========================
+
+class DisclosureManifest:
+    """Bildirim manifest'i. Tek bir thread'den (pipeline event loop'u) kullanılmalı."""
+
+    def __init__(self, path: Path = MANIFEST_FILE):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path), timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    # ---------- okuma ----------
+
+    def has(self, disclosure_index: int) -> bool:
+        """Bildirim tamamen işlenmiş mi?"""
+        row = self.conn.execute(
+            "SELECT 1 FROM disclosures WHERE disclosure_index = ? AND status = ?",
+            (int(disclosure_index), STATUS_DONE),
+        ).fetchone()
+        return row is not None
+
+    def existing_indices(self, indices) -> set[int]:
+        """Verilen index'lerden manifest'te 'done' olanları döndürür (toplu sorgu)."""
+        indices = [int(i) for i in indices]
+        found: set[int] = set()
+        for start in range(0, len(indices), 500):
+            chunk = indices[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.conn.execute(
+                f"SELECT disclosure_index FROM disclosures WHERE status = ? AND disclosure_index IN ({placeholders})",
+                (STATUS_DONE, *chunk),
+            ).fetchall()
+            found.update(r[0] for r in rows)
+        return found
+
+    def files_for(self, disclosure_index: int) -> list[dict]:
+        rows = self.conn.execute(
+            "SELECT kind, seq, path, url, size, sha256 FROM files WHERE disclosure_index = ? ORDER BY kind, seq",
+            (int(disclosure_index),),
+        ).fetchall()
+        return [dict(zip(("kind", "seq", "path", "url", "size", "sha256"), r)) for r in rows]
+
+    def unarchived_disclosures(self, uri_prefix: str) -> list[tuple[int, str]]:
+        """Dosyalarından en az biri hâlâ düz yolda duran tamamlanmış bildirimler: (index, publish_date)"""
+        return self.conn.execute(
+            """
+            SELECT d.disclosure_index, d.publish_date FROM disclosures d
+            WHERE d.status = ? AND EXISTS (
+                SELECT 1 FROM files f WHERE f.disclosure_index = d.disclosure_index AND f.path NOT LIKE ? || '%'
+            )
+            """,
+            (STATUS_DONE, uri_prefix),
+        ).fetchall()
+
+    def gemini_sources(self) -> list[tuple[int, str, str | None, str]]:
+        """HTML'i saklanan tamamlanmış bildirimler: (index, html yolu, html sha256, gemini yolu)"""
+        return self.conn.execute(
+            """
+            SELECT g.disclosure_index, h.path, h.sha256, g.path
+            FROM files g
+            JOIN files h ON h.disclosure_index = g.disclosure_index AND h.kind = 'html' AND h.seq = 0
+            JOIN disclosures d ON d.disclosure_index = g.disclosure_index
+            WHERE g.kind = 'gemini' AND g.seq = 0 AND d.status = ?
+            ORDER BY g.disclosure_index
+            """,
+            (STATUS_DONE,),
+        ).fetchall()
+
+    def average_size(self, kind: str) -> int:
+        """Bir dosya türünün ortalama boyutu (politika tasarruf tahmini için)."""
+        (avg,) = self.conn.execute("SELECT AVG(size) FROM files WHERE kind = ?", (kind,)).fetchone()
+        return int(avg or 0)
+
+    def stats(self) -> dict:
+        by_status = dict(self.conn.execute(
+            "SELECT status, COUNT(*) FROM disclosures GROUP BY status"
+        ).fetchall())
+        files, size = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM files").fetchone()
+        shards = dict(self.conn.execute(
+            "SELECT status, COUNT(*) FROM backfill_shards GROUP BY status"
+        ).fetchall())
+        return {"disclosures": by_status, "files": files, "bytes": size, "backfill_shards": shards}
+
+    def latency_percentiles(self, day: str, percentiles=(50, 90, 99)) -> dict:
+        """Bir yayın gününün tespit ve teslim gecikmesi yüzdelikleri (saniye)."""
+        rows = self.conn.execute(
+            "SELECT detect_seconds, handoff_seconds FROM ingest_latency WHERE publish_day = ?", (day,)
+        ).fetchall()
+        result = {"day": day, "count": len(rows)}
+        for col, name in ((0, "detect"), (1, "handoff")):
+            values = sorted(r[col] for r in rows)
+            result[name] = {f"p{p}": percentile(values, p) for p in percentiles}
+            result[name]["max"] = values[-1] if values else None
+        return result
+
+    def missing_indices(self, lookback: int) -> list[int]:
+        """
+        Gözlenen disclosureIndex dizisindeki boşluklar (en yeni başta).
+        Pencere: en büyük index'ten geriye `lookback` kadar, ama ilk gözlenen index'ten
+        önceye gidilmez. Daha önce sorgulanıp boş dönen index'ler (gap_checks) sayılmaz.
+        """
+        (top,) = self.conn.execute("SELECT MAX(disclosure_index) FROM disclosures").fetchone()
+        if top is None:
+            return []
+        low = top - lookback
+        known = {
+            r[0] for r in self.conn.execute(
+                """
+                SELECT disclosure_index FROM disclosures WHERE disclosure_index >= ? AND status = ?
+                UNION
+                SELECT disclosure_index FROM gap_checks WHERE disclosure_index >= ?
+                """,
+                (low, STATUS_DONE, low),
+            )
+        }
+        observed = self.conn.execute(
+            "SELECT MIN(disclosure_index) FROM disclosures WHERE disclosure_index >= ?", (low,)
+        ).fetchone()[0]
+        return [i for i in range(top, observed - 1, -1) if i not in known]
+
+    def mark_gaps_checked(self, indices):
+        ts = now_iso()
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO gap_checks (disclosure_index, checked_at) VALUES (?, ?)",
+                [(int(i), ts) for i in indices],
+            )
+
+    def shard_statuses(self, shard_ids) -> dict[str, str]:
+        """Backfill parçalarının son durumu: {shard_id: status}"""
+        shard_ids = list(shard_ids)
+        statuses: dict[str, str] = {}
+        for start in range(0, len(shard_ids), 500):
+            chunk = shard_ids[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.conn.execute(
+                f"SELECT shard_id, status FROM backfill_shards WHERE shard_id IN ({placeholders})",
+                chunk,
+            ).fetchall()
+            statuses.update(rows)
+        return statuses
+
+    # ---------- yazma ----------
+
+    def record_disclosure(
+        self,
+        disclosure: dict,
+        files: list[dict],
+        stages: dict[str, tuple[str, str | None]],
+        status: str = STATUS_DONE,
+        detail_path=None,
+        gemini_path=None,
+    ):
+        """
+        Bir bildirimi tek transaction içinde yazar (disclosures + files + stages).
+        stages: {"html": ("done", None), "form_pdf": ("failed", "hata")}
+        """
+        idx = int(disclosure["disclosureIndex"])
+        ts = now_iso()
+        with self.conn:
+            self.conn.execute(
+                """
+                INSERT INTO disclosures (disclosure_index, symbol, top_level_class, disclosure_class,
+                                         publish_date, subject, detail_path, gemini_path, status,
+                                         created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(disclosure_index) DO UPDATE SET
+                    symbol = excluded.symbol,
+                    top_level_class = excluded.top_level_class,
+                    disclosure_class = excluded.disclosure_class,
+                    publish_date = excluded.publish_date,
+                    subject = excluded.subject,
+                    detail_path = excluded.detail_path,
+                    gemini_path = excluded.gemini_path,
+                    status = excluded.status,
+                    updated_at = excluded.updated_at
+                """,
+                (
+                    idx,
+                    disclosure.get("symbol"),
+                    disclosure.get("top_level_class"),
+                    disclosure.get("disclosureClass"),
+                    disclosure.get("publishDate"),
+                    disclosure.get("subject"),
+                    str(detail_path) if detail_path else None,
+                    str(gemini_path) if gemini_path else None,
+                    status,
+                    ts,
+                    ts,
+                ),
+            )
+            self.conn.execute("DELETE FROM files WHERE disclosure_index = ?", (idx,))
+            self.conn.executemany(
+                "INSERT INTO files (disclosure_index, kind, seq, path, url, size, sha256) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (idx, f["kind"], f.get("seq", 0), f["path"], f.get("url"), f.get("size"), f.get("sha256"))
+                    for f in files if f
+                ],
+            )
+            self.conn.executemany(
+                """
+                INSERT INTO stages (disclosure_index, stage, status, error, updated_at) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(disclosure_index, stage) DO UPDATE SET
+                    status = excluded.status, error = excluded.error, updated_at = excluded.updated_at
+                """,
+                [(idx, stage, st, err, ts) for stage, (st, err) in stages.items()],
+            )
+
+    def mark_archived(self, disclosure_index: int, uris: dict[tuple[str, int], str]):
+        """Arşive taşınan dosyaların yollarını arşiv URI'leriyle değiştirir: {(kind, seq): uri}"""
+        idx = int(disclosure_index)
+        with self.conn:
+            self.conn.executemany(
+                "UPDATE files SET path = ? WHERE disclosure_index = ? AND kind = ? AND seq = ?",
+                [(uri, idx, kind, seq) for (kind, seq), uri in uris.items()],
+            )
+            for column, kind in (("detail_path", "detail"), ("gemini_path", "gemini")):
+                if (kind, 0) in uris:
+                    self.conn.execute(
+                        f"UPDATE disclosures SET {column} = ?, updated_at = ? WHERE disclosure_index = ?",
+                        (uris[(kind, 0)], now_iso(), idx),
+                    )
+
+    def record_latency(self, rows: list[tuple[int, datetime, datetime, datetime]]):
+        """(disclosure_index, yayın, tespit, teslim) satırları; ilk kayıt kalır."""
+        with self.conn:
+            self.conn.executemany(
+                """
+                INSERT OR IGNORE INTO ingest_latency (disclosure_index, publish_day, published_at, detected_at,
+                                                      handoff_at, detect_seconds, handoff_seconds)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                [
+                    (
+                        int(idx), published.date().isoformat(),
+                        published.isoformat(timespec="seconds"),
+                        detected.isoformat(timespec="seconds"),
+                        handoff.isoformat(timespec="seconds"),
+                        (detected - published).total_seconds(),
+                        (handoff - published).total_seconds(),
+                    )
+                    for idx, published, detected, handoff in rows
+                ],
+            )
+
+    def update_shard(self, shard_id: str, from_date: str, to_date: str, status: str, **fields):
+        """Backfill parçası checkpoint'i (listed/done/failed/started_at/finished_at)."""
+        allowed = ("listed", "done", "failed", "started_at", "finished_at")
+        fields = {k: v for k, v in fields.items() if k in allowed}
+        ts = now_iso()
+        with self.conn:
+            self.conn.execute(
+                """
+                INSERT INTO backfill_shards (shard_id, from_date, to_date, status, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(shard_id) DO UPDATE SET status = excluded.status, updated_at = excluded.updated_at
+                """,
+                (shard_id, from_date, to_date, status, ts),
+            )
+            if fields:
+                cols = ", ".join(f"{k} = ?" for k in fields)
+                self.conn.execute(
+                    f"UPDATE backfill_shards SET {cols} WHERE shard_id = ?",
+                    (*fields.values(), shard_id),
+                )
+
+# ==========================
+# REBUILD (mevcut ağacı içe aktar)
+# ==========================
+
+def rebuild_from_tree(manifest: DisclosureManifest, data_dir: Path = DAILY_DATA_DIR, with_hash: bool = True) -> int:
+    """
+    daily_data_kap/{symbol}/{disclosureIndex}/{idx}_detail.json dosyalarını tarayıp
+    manifest'e yazar. Bir kerelik geçiş içindir; normal döngüde kullanılmaz.
+    """
+    count = 0
+    if not data_dir.exists():
+        return count
+
+    gemini_dir = data_dir / "gemini"
+
+    for symbol_dir in data_dir.iterdir():
+        if not symbol_dir.is_dir() or symbol_dir.name in ("gemini", "blobs"):
+            continue
+
+        for disclosure_dir in symbol_dir.iterdir():
+            if not disclosure_dir.is_dir():
+                continue
+            try:
+                idx = int(disclosure_dir.name)
+            except ValueError:
+                continue
+
+            json_path = disclosure_dir / f"{idx}_detail.json"
+            if not json_path.exists():
+                continue
+
+            try:
+                detail = json.loads(json_path.read_text(encoding="utf-8"))
+            except Exception as e:
+                print(f"[WARN] {json_path} okunamadı: {e}")
+                continue
+
+            detail.setdefault("disclosureIndex", idx)
+            detail.setdefault("symbol", symbol_dir.name)
+
+            gemini_path = gemini_dir / f"{detail['symbol']}_{idx}_gemini.json"
+            files = [
+                file_record("detail", json_path, with_hash=with_hash),
+                file_record("html", detail.get("html_path"), url=detail.get("url"), with_hash=with_hash),
+                file_record("form_pdf", detail.get("form_pdf_path"), with_hash=with_hash),
+                file_record("gemini", gemini_path, with_hash=with_hash),
+            ]
+            for seq, att in enumerate(detail.get("attachments") or [], start=1):
+                files.append(file_record("attachment", att.get("local_path"), url=att.get("url"), seq=seq, with_hash=with_hash))
+
+            stages = {
+                "html": ("done" if detail.get("html_path") else "failed", None),
+                "form_pdf": ("done" if detail.get("form_pdf_path") else "failed", None),
+                "attachments": ("done", None),
+                "gemini": ("done" if gemini_path.exists() else "failed", None),
+            }
+            manifest.record_disclosure(
+                detail, files, stages,
+                status=STATUS_DONE,
+                detail_path=json_path,
+                gemini_path=gemini_path if gemini_path.exists() else None,
+            )
+            count += 1
+            if count % 500 == 0:
+                print(f"[PROGRESS] {count} bildirim içe aktarıldı...")
+
+    return count
+
+def main():
+    parser = argparse.ArgumentParser(description="KAP bildirim manifest'i")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_rebuild = sub.add_parser("rebuild", help="daily_data_kap ağacını tarayıp manifest'e aktar")
+    p_rebuild.add_argument("--data-dir", default=str(DAILY_DATA_DIR))
+    p_rebuild.add_argument("--manifest", default=str(MANIFEST_FILE))
+    p_rebuild.add_argument("--no-hash", action="store_true", help="sha256 hesaplamayı atla (daha hızlı)")
+
+    p_stats = sub.add_parser("stats", help="Manifest özetini yazdır")
+    p_stats.add_argument("--manifest", default=str(MANIFEST_FILE))
+
+    args = parser.parse_args()
+    manifest = DisclosureManifest(Path(args.manifest))
+    try:
+        if args.command == "rebuild":
+            print(f"[INFO] {args.data_dir} taranıyor -> {args.manifest}")
+            count = rebuild_from_tree(manifest, Path(args.data_dir), with_hash=not args.no_hash)
+            print(f"[OK] {count} bildirim manifest'e aktarıldı")
+        print(json.dumps(manifest.stats(), ensure_ascii=False, indent=2))
+    finally:
+        manifest.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+"""
+KAP PDF Metin Çıkarma
+=====================
+Form PDF'i ve ekler (_form.pdf, _ekN.pdf) metne çevrilir; FR ayrıntıları çoğu
+zaman sadece eklerde olduğu için LLM'e HTML metni yetmez.
+
+- Çıkarma CPU sayısı kadar süreçli bir havuzda (ProcessPoolExecutor) çalışır
+- Metin içerik hash'i (sha256) + sayfa bazında SQLite'ta önbelleklenir;
+  aynı PDF (tekrar çalıştırma, başka bildirimde aynı ek) yeniden çıkarılmaz
+- Belge başına sayfa ve süre bütçesi: 400 sayfalık faaliyet raporu havuzu
+  tıkamaz, kesilen belge sonraki çalıştırmada önbellekten devam eder
+- Her PDF'in yanına kompakt metin dosyası yazılır (123_ek1.pdf -> 123_ek1.txt),
+  gemini JSON bu dosyalara "pdf_texts" ile referans verir
+
+pypdf yoksa aşama atlanır (uyarı basılır).
+
+Kullanım:
+    python kap_pdftext.py extract daily_data_kap/AEFES/123/123_form.pdf [...]
+    python kap_pdftext.py stats
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import re
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+try:
+    from pypdf import PdfReader
+except ImportError:
+    PdfReader = None
+
+from kap_manifest import sha256_file
+
+# ==========================
+# AYARLAR
+# ==========================
+PROJECT_ROOT = Path(__file__).parent
+CACHE_FILE = PROJECT_ROOT / "daily_data_kap" / "pdftext_cache.sqlite"
+
+EXTRACTOR_VERSION = "pypdf-1"   # Çıkarma mantığı değişirse artırılır (önbellek ayrışır)
+MAX_PAGES = 60                  # Belge başına sayfa bütçesi
+MAX_SECONDS = 20.0              # Belge başına süre bütçesi (sayfa aralarında kontrol edilir)
+PAGE_SEPARATOR = "\f"           # Sidecar'da sayfa ayırıcı (pdftotext ile aynı)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    sha256      TEXT NOT NULL,
+    version     TEXT NOT NULL,
+    pages_total INTEGER NOT NULL,
+    error       TEXT,
+    updated_at  TEXT NOT NULL,
+    PRIMARY KEY (sha256, version)
+);
+
+CREATE TABLE IF NOT EXISTS pages (
+    sha256  TEXT NOT NULL,
+    version TEXT NOT NULL,
+    page    INTEGER NOT NULL,
+    text    TEXT NOT NULL,
+    PRIMARY KEY (sha256, version, page)
+);
+"""
+
+# ==========================
+# YARDIMCILAR
+# ==========================
+
+def compact_text(text: str) -> str:
+    """Satır içi boşlukları tekle, boş satırları at (tablo satırları ayrı kalsın)."""
+    lines = (re.sub(r"[ \t\u00a0]+", " ", line).strip() for line in text.splitlines())
+    return "\n".join(line for line in lines if line)
+
+def sidecar_path(pdf_path: Path) -> Path:
+    return Path(pdf_path).with_suffix(".txt")
+
+def extract_pages(path: str, pages: list[int], max_seconds: float) -> tuple[int, dict[int, str], str | None]:
+    """
+    Havuz süreçlerinde çalışır. İstenen sayfaları çıkarır; süre bütçesi dolunca durur.
+    (toplam sayfa, {sayfa: metin}, kesilme/hata nedeni) döndürür.
+    """
+    started = time.monotonic()
+    try:
+        reader = PdfReader(path)
+        if reader.is_encrypted:
+            reader.decrypt("")  # KAP PDF'leri çoğunlukla boş parolayla şifreli
+        total = len(reader.pages)
+    except Exception as e:
+        return 0, {}, f"error: {e}"
+
+    texts: dict[int, str] = {}
+    for page in pages:
+        if page >= total:
+            break
+        if time.monotonic() - started > max_seconds:
+            return total, texts, "time"
+        try:
+            texts[page] = compact_text(reader.pages[page].extract_text() or "")
+        except Exception:
+            texts[page] = ""  # Bozuk sayfa: boş geç, belgenin kalanı çıkarılsın
+    return total, texts, None
+
+# ==========================
+# ÖNBELLEK
+# ==========================
+
+class PageCache:
+    """(sha256, sürüm, sayfa) -> metin. Tek thread'den (event loop) kullanılır."""
+
+    def __init__(self, path: Path = CACHE_FILE):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path), timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def document(self, sha: str, version: str = EXTRACTOR_VERSION) -> tuple[int, str | None] | None:
+        return self.conn.execute(
+            "SELECT pages_total, error FROM documents WHERE sha256 = ? AND version = ?", (sha, version)
+        ).fetchone()
+
+    def pages(self, sha: str, version: str = EXTRACTOR_VERSION) -> dict[int, str]:
+        return dict(self.conn.execute(
+            "SELECT page, text FROM pages WHERE sha256 = ? AND version = ?", (sha, version)
+        ).fetchall())
+
+    def store(self, sha: str, pages_total: int, texts: dict[int, str], error: str | None = None,
+              version: str = EXTRACTOR_VERSION):
+        ts = datetime.now().isoformat(timespec="seconds")
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO documents (sha256, version, pages_total, error, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (sha, version, pages_total, error, ts),
+            )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO pages (sha256, version, page, text) VALUES (?, ?, ?, ?)",
+                [(sha, version, page, text) for page, text in texts.items()],
+            )
+
+    def stats(self) -> dict:
+        docs, errors = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(error IS NOT NULL), 0) FROM documents"
+        ).fetchone()
+        pages, chars = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(text)), 0) FROM pages").fetchone()
+        return {"documents": docs, "errors": errors, "pages": pages, "chars": chars}
+
+# ==========================
+# ÇIKARICI
+# ==========================
+
+class PdfTextExtractor:
+    def __init__(
+        self,
+        cache_file: Path = CACHE_FILE,
+        workers: int | None = None,
+        max_pages: int = MAX_PAGES,
+        max_seconds: float = MAX_SECONDS,
+    ):
+        self.cache = PageCache(cache_file)
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pages = max_pages
+        self.max_seconds = max_seconds
+        self._pool: ProcessPoolExecutor | None = None
+        self._inflight: dict[str, asyncio.Future] = {}
+        self.stats = {"documents": 0, "cache_hits": 0, "pages_extracted": 0, "truncated": 0, "errors": 0}
+
+    @property
+    def available(self) -> bool:
+        return PdfReader is not None
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: pipeline süreci indirici thread'leri çalışırken fork edilmesin
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+        self.cache.close()
+
+    async def extract(self, pdf_path, sha: str | None = None) -> dict | None:
+        """
+        PDF'in metnini (önbellek + havuz) çıkarıp sidecar'a yazar; gemini JSON'a
+        konacak özet kaydı döndürür. pypdf yoksa ya da dosya yoksa None.
+        """
+        pdf_path = Path(pdf_path)
+        if not self.available or not pdf_path.exists():
+            return None
+
+        loop = asyncio.get_running_loop()
+        sha = sha or await loop.run_in_executor(None, sha256_file, pdf_path)
+        self.stats["documents"] += 1
+
+        total, texts, reason = await self._pages_for(sha, pdf_path)
+
+        used = sorted(p for p in texts if p < min(total, self.max_pages))
+        if reason is None and total > self.max_pages:
+            reason = "pages"
+        if reason and reason.startswith("error"):
+            self.stats["errors"] += 1
+            print(f"[WARN] PDF metni çıkarılamadı: {pdf_path.name} ({reason})")
+        elif reason:
+            self.stats["truncated"] += 1
+
+        text = PAGE_SEPARATOR.join(texts[p] for p in used)
+        out_path = sidecar_path(pdf_path)
+        tmp_path = out_path.with_suffix(".txt.tmp")
+        tmp_path.write_text(text, encoding="utf-8")
+        tmp_path.replace(out_path)
+
+        return {
+            "path": str(out_path),
+            "sha256": sha,
+            "pages": len(used),
+            "pages_total": total,
+            "truncated": reason,
+            "chars": len(text),
+            "version": EXTRACTOR_VERSION,
+        }
+
+    async def _pages_for(self, sha: str, pdf_path: Path) -> tuple[int, dict[int, str], str | None]:
+        """Aynı içerik (aynı ek farklı bildirimlerde) aynı anda istenirse tek çıkarma yapılır."""
+        task = self._inflight.get(sha)
+        if task is None:
+            task = asyncio.ensure_future(self._load_pages(sha, pdf_path))
+            self._inflight[sha] = task
+            task.add_done_callback(lambda _: self._inflight.pop(sha, None))
+        return await task
+
+    async def _load_pages(self, sha: str, pdf_path: Path) -> tuple[int, dict[int, str], str | None]:
+        doc = self.cache.document(sha)
+        texts = self.cache.pages(sha)
+        if doc and doc[1]:
+            # Bozuk/okunamayan PDF: aynı sürümle tekrar denenmez
+            self.stats["cache_hits"] += 1
+            return doc[0], texts, doc[1]
+
+        limit = min(doc[0], self.max_pages) if doc else self.max_pages
+        missing = [p for p in range(limit) if p not in texts]
+        if doc is not None and not missing:
+            self.stats["cache_hits"] += 1
+            return doc[0], texts, None
+
+        # Süre bütçesiyle kesilmiş belge kaldığı sayfadan devam eder
+        total, new, reason = await asyncio.get_running_loop().run_in_executor(
+            self.pool, extract_pages, str(pdf_path), missing, self.max_seconds
+        )
+        error = reason if reason and reason.startswith("error") else None
+        self.cache.store(sha, total, new, error=error)
+        texts.update(new)
+        self.stats["pages_extracted"] += len(new)
+        return total, texts, reason
+
+def print_report(stats: dict):
+    print(f"[PDFTEXT] {stats['documents']} belge ({stats['cache_hits']} önbellekten), "
+          f"{stats['pages_extracted']} sayfa çıkarıldı, {stats['truncated']} bütçe ile kesildi, {stats['errors']} hata")
+
+# ==========================
+# CLI
+# ==========================
+
+async def extract_files(extractor: PdfTextExtractor, paths: list[Path]) -> list[dict | None]:
+    return await asyncio.gather(*(extractor.extract(p) for p in paths))
+
+def main():
+    parser = argparse.ArgumentParser(description="KAP PDF metin çıkarma")
+    parser.add_argument("--cache", default=str(CACHE_FILE))
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_extract = sub.add_parser("extract", help="PDF'leri metne çevir, sidecar yaz")
+    p_extract.add_argument("paths", nargs="+")
+    p_extract.add_argument("--max-pages", type=int, default=MAX_PAGES)
+    p_extract.add_argument("--max-seconds", type=float, default=MAX_SECONDS)
+    sub.add_parser("stats", help="Önbellek özeti")
+    args = parser.parse_args()
+
+    if args.command == "stats":
+        cache = PageCache(Path(args.cache))
+        print(json.dumps(cache.stats(), ensure_ascii=False, indent=2))
+        cache.close()
+        return
+
+    extractor = PdfTextExtractor(Path(args.cache), max_pages=args.max_pages, max_seconds=args.max_seconds)
+    if not extractor.available:
+        print("[ERROR] pypdf kurulu değil: pip install pypdf")
+        return
+    try:
+        started = time.monotonic()
+        results = asyncio.run(extract_files(extractor, [Path(p) for p in args.paths]))
+        for path, result in zip(args.paths, results):
+            if result is None:
+                print(f"[WARN] {path}: atlandı")
+                continue
+            print(f"[OK] {path} -> {result['path']} ({result['pages']}/{result['pages_total']} sayfa, "
+                  f"{result['chars']} karakter{', kesildi: ' + result['truncated'] if result['truncated'] else ''})")
+        print_report(extractor.stats)
+        print(f"[INFO] {time.monotonic() - started:.1f}s")
+    finally:
+        extractor.close()
+
+if __name__ == "__main__":
+    main()
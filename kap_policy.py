@@ -0,0 +1,148 @@
+"""
+KAP İndirme Politikası
+======================
+Her bildirim için ne kadarının indirileceğine karar verir:
+
+    metadata : hiçbir dosya indirilmez (detail/gemini JSON yalnızca API alanlarından)
+    html     : sadece bildirim HTML'i (metin + ek listesi), form PDF ve ekler yok
+    full     : HTML + form PDF + ekler (ekler max_attachment_mb sınırıyla, HEAD ile kontrol)
+
+Kurallar settings.toml'dan okunur, ilk eşleşen kural kazanır:
+
+    symbols = ["AEFES", "THYAO"]          # izleme listesi
+
+    [download_policy]
+    default = "full"
+    non_watchlist = "html"                # izleme listesi dışındaki semboller (liste boşsa uygulanmaz)
+    max_attachment_mb = 20
+
+    [[download_policy.rules]]
+    name = "devre-kesici"
+    class = "DKB"                         # top_level_class (FR/ODA/DKB), liste de olabilir
+    action = "metadata"
+
+    [[download_policy.rules]]
+    name = "fon-raporlari"
+    subject = "(?i)portföy değer|net aktif değer"   # subject + summary üzerinde regex
+    action = "metadata"
+
+Bölüm yoksa DEFAULT_RULES kullanılır.
+"""
+
+import re
+from pathlib import Path
+
+import toml
+
+# ==========================
+# AYARLAR
+# ==========================
+ACTION_METADATA = "metadata"
+ACTION_HTML = "html"
+ACTION_FULL = "full"
+ACTIONS = (ACTION_METADATA, ACTION_HTML, ACTION_FULL)
+
+DEFAULT_MAX_ATTACHMENT_MB = 20
+
+# Analizörlerin zaten rutin sayıp attığı bildirimler
+DEFAULT_RULES = [
+    {"name": "devre-kesici", "class": "DKB", "action": ACTION_METADATA},
+    {
+        "name": "fon-raporlari",
+        "subject": r"(?i)(portföy\s+değer\s+raporu|net\s+aktif\s+değer|katılma\s+payı?\s+(fiyat|sayı)|fon\s+dağılım)",
+        "action": ACTION_METADATA,
+    },
+]
+
+# ==========================
+# POLİTİKA
+# ==========================
+
+class DownloadPolicy:
+    """settings.toml'daki kurallarla bildirim başına indirme kararı verir."""
+
+    def __init__(self, settings: dict | None = None):
+        settings = settings or {}
+        section = settings.get("download_policy", {})
+
+        self.watchlist = {s.upper() for s in settings.get("symbols", [])}
+        self.default = self._action(section.get("default", ACTION_FULL))
+        self.non_watchlist = self._action(section.get("non_watchlist", ACTION_HTML))
+        self.max_attachment_bytes = int(float(section.get("max_attachment_mb", DEFAULT_MAX_ATTACHMENT_MB)) * 1024 * 1024)
+        self.rules = [self._compile(r) for r in section.get("rules", DEFAULT_RULES)]
+
+        self.stats = {
+            "decisions": {a: 0 for a in ACTIONS},
+            "requests_avoided": 0,
+            "bytes_avoided": 0,
+            "attachments_too_large": 0,
+        }
+
+    @staticmethod
+    def _action(value: str) -> str:
+        if value not in ACTIONS:
+            raise ValueError(f"Geçersiz politika aksiyonu: {value} (geçerli: {', '.join(ACTIONS)})")
+        return value
+
+    def _compile(self, rule: dict) -> dict:
+        classes = rule.get("class")
+        if isinstance(classes, str):
+            classes = [classes]
+        symbols = rule.get("symbols")
+        return {
+            "name": rule.get("name") or rule.get("action"),
+            "classes": {c.upper() for c in classes} if classes else None,
+            "subject": re.compile(rule["subject"]) if rule.get("subject") else None,
+            "symbols": {s.upper() for s in symbols} if symbols else None,
+            "action": self._action(rule["action"]),
+        }
+
+    def decide(self, disclosure: dict) -> tuple[str, str]:
+        """(aksiyon, gerekçe) döndürür; gerekçe manifest'teki stage hatasına yazılır."""
+        cls = str(disclosure.get("top_level_class") or "").upper()
+        symbol = str(disclosure.get("symbol") or "").upper()
+        text = f"{disclosure.get('subject') or ''} {disclosure.get('summary') or ''}"
+
+        action, reason = self.default, "default"
+        for rule in self.rules:
+            if rule["classes"] is not None and cls not in rule["classes"]:
+                continue
+            if rule["symbols"] is not None and symbol not in rule["symbols"]:
+                continue
+            if rule["subject"] is not None and not rule["subject"].search(text):
+                continue
+            action, reason = rule["action"], f"rule:{rule['name']}"
+            break
+        else:
+            if self.watchlist and symbol not in self.watchlist:
+                action, reason = self.non_watchlist, "non_watchlist"
+
+        self.stats["decisions"][action] += 1
+        return action, reason
+
+    # ---------- sayaçlar ----------
+
+    def record_avoided(self, requests: int, bytes_: int = 0):
+        self.stats["requests_avoided"] += requests
+        self.stats["bytes_avoided"] += bytes_
+
+    def attachment_allowed(self, size: int | None) -> bool:
+        """HEAD'den gelen Content-Length sınırı aşıyorsa False (boyut bilinmiyorsa indirilir)."""
+        if size is None or size <= self.max_attachment_bytes:
+            return True
+        self.stats["attachments_too_large"] += 1
+        self.record_avoided(1, size)  # HEAD atıldı ama GET atılmadı
+        return False
+
+def load_policy(settings_file: Path) -> DownloadPolicy:
+    settings = {}
+    if Path(settings_file).exists():
+        with open(settings_file, "r", encoding="utf-8") as f:
+            settings = toml.load(f)
+    return DownloadPolicy(settings)
+
+def print_report(stats: dict):
+    decisions = ", ".join(f"{k}={v}" for k, v in stats["decisions"].items())
+    print(f"[POLICY] Kararlar: {decisions}")
+    print(f"[POLICY] Kaçınılan: {stats['requests_avoided']} istek, ~{stats['bytes_avoided'] / (1024 * 1024):.1f} MB "
+          f"({stats['attachments_too_large']} ek boyut sınırını aştı)")
@@ -0,0 +1,440 @@
+"""
+KAP İş Kuyruğu
+==============
+Pipeline ile analizörler arasında kalıcı kuyruk (SQLite, WAL). Klasörü glob'lamak
+yerine save_gemini_format her yeni bildirimi kuyruğa yazar; her analizör kendi
+tüketici grubuyla yalnızca yeni işleri çeker.
+
+- messages:     topic + key (disclosureIndex) tekil; aynı bildirim iki kez eklenmez
+- groups:       tüketici grubu başına imleç (son dağıtılan mesaj id'si)
+- deliveries:   uçuştaki / tekrar denenecek teslimatlar (ack'lenince silinir)
+- dead_letters: MAX_ATTEMPTS kez başarısız olan mesajlar
+
+Teslimat en az bir kez (at-least-once): ack'lenmeyen mesaj lease süresi dolunca
+tekrar verilir. Tüketiciler aynı mesajı iki kez görürse zararsız olmalı.
+
+Birden fazla worker aynı grubu paylaşıyorsa (kap_workers) claim'e owner verilir:
+worker uçuştaki teslimatlarının lease'ini heartbeat ile uzatır, ack/nack yalnızca
+lease hâlâ kendisindeyse geçer. Çöken worker'ın lease'i dolunca iş başkasına geçer.
+leases tablosu tekil roller (ör. listeyi yoklayan worker) için aynı mekanizmadır.
+
+Kullanım:
+    python kap_queue.py stats
+    python kap_queue.py dead [--group news]
+    python kap_queue.py requeue-dead --group news
+    python kap_queue.py import-dir daily_data_kap/gemini   # mevcut dosyaları bir kez kuyruğa al
+"""
+
+import argparse
+import json
+import sqlite3
+import time
+from datetime import datetime
+from pathlib import Path
+
+# ==========================
+# AYARLAR
+# ==========================
+PROJECT_ROOT = Path(__file__).parent
+QUEUE_FILE = PROJECT_ROOT / "daily_data_kap" / "queue.sqlite"
+
+TOPIC_GEMINI = "gemini"              # Yeni bildirim: analiz edilebilir gemini JSON yazıldı
+TOPIC_ENRICHED = "gemini.enriched"   # Aynı bildirimin form PDF/ekleri indi (isteğe bağlı tüketim)
+TOPIC_DISCLOSURES = "disclosures"    # Listelenmiş, henüz indirilmemiş bildirim (kap_workers)
+DEFAULT_LEASE_SECONDS = 600      # Ack gelmezse mesaj bu süre sonra tekrar verilir
+MAX_ATTEMPTS = 5                 # Bu kadar denemeden sonra dead-letter
+RETRY_BASE_SECONDS = 30          # Tekrar gecikmesi: 30s, 60s, 120s ...
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    topic       TEXT NOT NULL,
+    key         TEXT NOT NULL,
+    payload     TEXT NOT NULL,
+    enqueued_at REAL NOT NULL,
+    UNIQUE (topic, key)
+);
+CREATE INDEX IF NOT EXISTS idx_messages_topic ON messages(topic, id);
+
+CREATE TABLE IF NOT EXISTS groups (
+    name       TEXT PRIMARY KEY,
+    topic      TEXT NOT NULL,
+    cursor     INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS deliveries (
+    group_name  TEXT NOT NULL,
+    message_id  INTEGER NOT NULL,
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    visible_at  REAL NOT NULL,
+    last_error  TEXT,
+    owner       TEXT,
+    PRIMARY KEY (group_name, message_id)
+);
+CREATE INDEX IF NOT EXISTS idx_deliveries_visible ON deliveries(group_name, visible_at);
+
+CREATE TABLE IF NOT EXISTS dead_letters (
+    group_name  TEXT NOT NULL,
+    message_id  INTEGER NOT NULL,
+    attempts    INTEGER NOT NULL,
+    last_error  TEXT,
+    died_at     REAL NOT NULL,
+    PRIMARY KEY (group_name, message_id)
+);
+
+CREATE TABLE IF NOT EXISTS leases (
+    name       TEXT PRIMARY KEY,
+    owner      TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+class RetryableError(Exception):
+    """Geçici hata (ör. LLM API); mesaj ack'lenmez, gecikmeyle tekrar denenir."""
+
+class LeaseLost(Exception):
+    """Teslimatın lease'i başka worker'a geçti; sonuç yazılmadan iş bırakılmalı."""
+
+# ==========================
+# KUYRUK
+# ==========================
+
+class WorkQueue:
+    def __init__(self, path: Path = QUEUE_FILE):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # isolation_level=None: transaction'ları kendimiz yönetiyoruz (BEGIN IMMEDIATE)
+        self.conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        columns = {r[1] for r in self.conn.execute("PRAGMA table_info(deliveries)")}
+        if "owner" not in columns:  # owner'dan önce oluşturulmuş kuyruk dosyası
+            self.conn.execute("ALTER TABLE deliveries ADD COLUMN owner TEXT")
+
+    def close(self):
+        self.conn.close()
+
+    def _tx(self):
+        """Yazma kilidini baştan alan transaction (aynı gruptaki tüketiciler yarışmasın)."""
+        return _ImmediateTransaction(self.conn)
+
+    # ---------- üretici ----------
+
+    def enqueue(self, topic: str, key: str, payload: dict) -> bool:
+        """Mesaj ekler; aynı (topic, key) zaten varsa False."""
+        cur = self.conn.execute(
+            "INSERT OR IGNORE INTO messages (topic, key, payload, enqueued_at) VALUES (?, ?, ?, ?)",
+            (topic, str(key), json.dumps(payload, ensure_ascii=False), time.time()),
+        )
+        return cur.rowcount == 1
+
+    def enqueued_at(self, topic: str, keys) -> dict[str, float]:
+        """Mesajların kuyruğa giriş zamanı (epoch); canlı modda teslim gecikmesi için."""
+        keys = [str(k) for k in keys]
+        found: dict[str, float] = {}
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            found.update(self.conn.execute(
+                f"SELECT key, enqueued_at FROM messages WHERE topic = ? AND key IN ({placeholders})",
+                (topic, *chunk),
+            ).fetchall())
+        return found
+
+    # ---------- tüketici ----------
+
+    def claim(
+        self,
+        group: str,
+        topic: str,
+        limit: int = 10,
+        lease_seconds: float = DEFAULT_LEASE_SECONDS,
+        owner: str | None = None,
+    ) -> list[dict]:
+        """
+        Gruba en fazla `limit` mesaj verir: önce zamanı gelmiş tekrarlar / süresi dolan
+        lease'ler, sonra imlecin ilerisindeki yeni mesajlar. Mesajlar ack/nack'lenmeli.
+        owner verilirse lease o worker'a yazılır (heartbeat ve ack/nack ona göre).
+        """
+        now = time.time()
+        with self._tx():
+            row = self.conn.execute("SELECT cursor FROM groups WHERE name = ?", (group,)).fetchone()
+            if row is None:
+                self.conn.execute(
+                    "INSERT INTO groups (name, topic, cursor, created_at) VALUES (?, ?, 0, ?)",
+                    (group, topic, now),
+                )
+                cursor = 0
+            else:
+                cursor = row[0]
+
+            claimed = self.conn.execute(
+                """
+                SELECT d.message_id, d.attempts FROM deliveries d
+                WHERE d.group_name = ? AND d.visible_at <= ?
+                ORDER BY d.message_id LIMIT ?
+                """,
+                (group, now, limit),
+            ).fetchall()
+
+            fresh = []
+            if len(claimed) < limit:
+                fresh = self.conn.execute(
+                    "SELECT id FROM messages WHERE topic = ? AND id > ? ORDER BY id LIMIT ?",
+                    (topic, cursor, limit - len(claimed)),
+                ).fetchall()
+                if fresh:
+                    self.conn.executemany(
+                        "INSERT INTO deliveries (group_name, message_id, attempts, visible_at) VALUES (?, ?, 0, ?)",
+                        [(group, mid, now) for (mid,) in fresh],
+                    )
+                    self.conn.execute("UPDATE groups SET cursor = ? WHERE name = ?", (fresh[-1][0], group))
+
+            ids = [mid for mid, _ in claimed] + [mid for (mid,) in fresh]
+            if not ids:
+                return []
+            # Deneme sayısı teslimatta artar; tüketici çökse bile sayılır
+            self.conn.executemany(
+                "UPDATE deliveries SET attempts = attempts + 1, visible_at = ?, owner = ? WHERE group_name = ? AND message_id = ?",
+                [(now + lease_seconds, owner, group, mid) for mid in ids],
+            )
+            placeholders = ",".join("?" * len(ids))
+            rows = self.conn.execute(
+                f"""
+                SELECT m.id, m.key, m.payload, m.enqueued_at, d.attempts
+                FROM messages m JOIN deliveries d ON d.message_id = m.id AND d.group_name = ?
+                WHERE m.id IN ({placeholders}) ORDER BY m.id
+                """,
+                (group, *ids),
+            ).fetchall()
+
+        return [
+            {"id": mid, "key": key, "payload": json.loads(payload), "enqueued_at": enq, "attempts": attempts}
+            for mid, key, payload, enq, attempts in rows
+        ]
+
+    def ack(self, group: str, message_id: int, owner: str | None = None) -> bool:
+        """Teslimatı kapatır. owner verilirse lease başka worker'a geçmişse hiçbir şey yapmaz (False)."""
+        sql = "DELETE FROM deliveries WHERE group_name = ? AND message_id = ?"
+        params: tuple = (group, message_id)
+        if owner is not None:
+            sql += " AND owner = ?"
+            params += (owner,)
+        return self.conn.execute(sql, params).rowcount == 1
+
+    def heartbeat(self, group: str, owner: str, message_ids, lease_seconds: float = DEFAULT_LEASE_SECONDS) -> list[int]:
+        """
+        owner'ın uçuştaki teslimatlarının lease'ini uzatır. Artık owner'da olmayan
+        (süresi dolup başka worker'a verilmiş) mesaj id'lerini döndürür.
+        """
+        ids = [int(i) for i in message_ids]
+        if not ids:
+            return []
+        with self._tx():
+            self.conn.executemany(
+                "UPDATE deliveries SET visible_at = ? WHERE group_name = ? AND message_id = ? AND owner = ?",
+                [(time.time() + lease_seconds, group, mid, owner) for mid in ids],
+            )
+            placeholders = ",".join("?" * len(ids))
+            held = {
+                r[0] for r in self.conn.execute(
+                    f"SELECT message_id FROM deliveries WHERE group_name = ? AND owner = ? AND message_id IN ({placeholders})",
+                    (group, owner, *ids),
+                )
+            }
+        return [i for i in ids if i not in held]
+
+    def nack(
+        self,
+        group: str,
+        message_id: int,
+        error: str = "",
+        max_attempts: int = MAX_ATTEMPTS,
+        owner: str | None = None,
+    ) -> bool:
+        """
+        Başarısız teslimat. Deneme hakkı kaldıysa üstel gecikmeyle tekrar sıraya girer,
+        yoksa dead_letters'a taşınır. Dead-letter olduysa True döner.
+        """
+        now = time.time()
+        with self._tx():
+            row = self.conn.execute(
+                "SELECT attempts, owner FROM deliveries WHERE group_name = ? AND message_id = ?",
+                (group, message_id),
+            ).fetchone()
+            if row is None or (owner is not None and row[1] != owner):
+                return False
+            attempts = row[0]
+            if attempts >= max_attempts:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO dead_letters (group_name, message_id, attempts, last_error, died_at) VALUES (?, ?, ?, ?, ?)",
+                    (group, message_id, attempts, error[:1000], now),
+                )
+                self.conn.execute(
+                    "DELETE FROM deliveries WHERE group_name = ? AND message_id = ?", (group, message_id)
+                )
+                return True
+            self.conn.execute(
+                "UPDATE deliveries SET visible_at = ?, last_error = ? WHERE group_name = ? AND message_id = ?",
+                (now + RETRY_BASE_SECONDS * 2 ** (attempts - 1), error[:1000], group, message_id),
+            )
+            return False
+
+    def requeue_dead(self, group: str) -> int:
+        """Dead-letter mesajlarını sıfır denemeyle tekrar sıraya koyar."""
+        now = time.time()
+        with self._tx():
+            rows = self.conn.execute(
+                "SELECT message_id FROM dead_letters WHERE group_name = ?", (group,)
+            ).fetchall()
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO deliveries (group_name, message_id, attempts, visible_at) VALUES (?, ?, 0, ?)",
+                [(group, mid, now) for (mid,) in rows],
+            )
+            self.conn.execute("DELETE FROM dead_letters WHERE group_name = ?", (group,))
+        return len(rows)
+
+    # ---------- tekil roller ----------
+
+    def acquire_lease(self, name: str, owner: str, seconds: float) -> bool:
+        """Rol boşsa, süresi dolmuşsa ya da zaten owner'daysa alır/uzatır."""
+        now = time.time()
+        with self._tx():
+            row = self.conn.execute("SELECT owner, expires_at FROM leases WHERE name = ?", (name,)).fetchone()
+            if row is not None and row[0] != owner and row[1] > now:
+                return False
+            self.conn.execute(
+                "INSERT OR REPLACE INTO leases (name, owner, expires_at) VALUES (?, ?, ?)",
+                (name, owner, now + seconds),
+            )
+            return True
+
+    def release_lease(self, name: str, owner: str):
+        self.conn.execute("DELETE FROM leases WHERE name = ? AND owner = ?", (name, owner))
+
+    # ---------- metrikler ----------
+
+    def stats(self) -> dict:
+        """Grup başına derinlik (bekleyen iş) ve en eski bekleyen işin yaşı (saniye)."""
+        now = time.time()
+        result = {"messages": self.conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0], "groups": {}}
+        for name, topic, cursor in self.conn.execute("SELECT name, topic, cursor FROM groups").fetchall():
+            backlog, oldest_new = self.conn.execute(
+                "SELECT COUNT(*), MIN(enqueued_at) FROM messages WHERE topic = ? AND id > ?", (topic, cursor)
+            ).fetchone()
+            # inflight: lease'i süren teslimat; retrying: nack'lenmiş, lease'i dolmuş ya da requeue edilmiş
+            inflight, retrying, oldest_delivery = self.conn.execute(
+                """
+                SELECT SUM(d.last_error IS NULL AND d.visible_at > ?),
+                       SUM(NOT (d.last_error IS NULL AND d.visible_at > ?)),
+                       MIN(m.enqueued_at)
+                FROM deliveries d JOIN messages m ON m.id = d.message_id WHERE d.group_name = ?
+                """,
+                (now, now, name),
+            ).fetchone()
+            dead = self.conn.execute(
+                "SELECT COUNT(*) FROM dead_letters WHERE group_name = ?", (name,)
+            ).fetchone()[0]
+            pending = [t for t in (oldest_new, oldest_delivery) if t is not None]
+            oldest = min(pending) if pending else None
+            result["groups"][name] = {
+                "topic": topic,
+                "depth": backlog + (inflight or 0) + (retrying or 0),
+                "new": backlog,
+                "inflight": inflight or 0,
+                "retrying": retrying or 0,
+                "dead": dead,
+                "oldest_age_seconds": round(now - oldest, 1) if oldest else 0.0,
+            }
+            owners = dict(self.conn.execute(
+                """
+                SELECT owner, COUNT(*) FROM deliveries
+                WHERE group_name = ? AND owner IS NOT NULL AND last_error IS NULL AND visible_at > ?
+                GROUP BY owner
+                """,
+                (name, now),
+            ).fetchall())
+            if owners:
+                result["groups"][name]["owners"] = owners
+        result["leases"] = {
+            name: {"owner": owner, "expires_in": round(expires - now, 1)}
+            for name, owner, expires in self.conn.execute("SELECT name, owner, expires_at FROM leases").fetchall()
+            if expires > now
+        }
+        return result
+
+    def dead_letters(self, group: str | None = None) -> list[dict]:
+        sql = """
+            SELECT d.group_name, d.message_id, m.key, d.attempts, d.last_error, d.died_at
+            FROM dead_letters d JOIN messages m ON m.id = d.message_id
+        """
+        params = ()
+        if group:
+            sql += " WHERE d.group_name = ?"
+            params = (group,)
+        return [
+            {
+                "group": g, "message_id": mid, "key": key, "attempts": attempts, "error": err,
+                "died_at": datetime.fromtimestamp(died).isoformat(timespec="seconds"),
+            }
+            for g, mid, key, attempts, err, died in self.conn.execute(sql + " ORDER BY d.died_at", params)
+        ]
+
+class _ImmediateTransaction:
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+def enqueue_directory(queue: WorkQueue, directory: Path) -> int:
+    """Kuyruk öncesi yazılmış *_gemini.json dosyalarını (eskiden yeniye) kuyruğa ekler."""
+    added = 0
+    for path in sorted(Path(directory).glob("*_gemini.json"), key=lambda p: p.stat().st_mtime):
+        # {symbol}_{disclosureIndex}_gemini.json
+        symbol, _, index = path.name[: -len("_gemini.json")].rpartition("_")
+        payload = {"path": str(path), "disclosureIndex": int(index) if index.isdigit() else index, "symbol": symbol}
+        added += queue.enqueue(TOPIC_GEMINI, index, payload)
+    return added
+
+# ==========================
+# CLI
+# ==========================
+
+def main():
+    parser = argparse.ArgumentParser(description="KAP iş kuyruğu")
+    parser.add_argument("--queue", default=str(QUEUE_FILE))
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="Grup başına derinlik ve yaş")
+    p_dead = sub.add_parser("dead", help="Dead-letter mesajlarını listele")
+    p_dead.add_argument("--group")
+    p_requeue = sub.add_parser("requeue-dead", help="Dead-letter mesajlarını tekrar sıraya koy")
+    p_requeue.add_argument("--group", required=True)
+    p_import = sub.add_parser("import-dir", help="Mevcut gemini JSON'larını kuyruğa ekle")
+    p_import.add_argument("directory")
+    args = parser.parse_args()
+
+    queue = WorkQueue(Path(args.queue))
+    try:
+        if args.command == "stats":
+            print(json.dumps(queue.stats(), ensure_ascii=False, indent=2))
+        elif args.command == "dead":
+            for row in queue.dead_letters(args.group):
+                print(f"[DEAD] {row['group']} #{row['message_id']} key={row['key']} "
+                      f"deneme={row['attempts']} {row['died_at']} -> {row['error']}")
+        elif args.command == "requeue-dead":
+            print(f"[OK] {queue.requeue_dead(args.group)} mesaj tekrar sıraya kondu")
+        elif args.command == "import-dir":
+            print(f"[OK] {enqueue_directory(queue, Path(args.directory))} dosya kuyruğa eklendi")
+    finally:
+        queue.close()
+
+if __name__ == "__main__":
+    main()
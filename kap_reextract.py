@@ -0,0 +1,179 @@
+"""
+KAP Toplu Metin Yeniden Çıkarma
+===============================
+Metin çıkarma (kap_html) iyileştiğinde gemini JSON'larını yeniden indirmeden,
+saklanan HTML'den yeniden üretir.
+
+- Kaynak listesi manifest'ten gelir (HTML + gemini yolu, HTML sha256); düz
+  dosyalar da arşiv (archive://) kayıtları da okunur
+- Yalnızca "extraction" damgası eskiyenler yazılır: çıkarıcı sürümü
+  (kap_html.EXTRACTOR_VERSION) ya da HTML içeriği (sha256) değişmişse
+- Ayrıştırma tüm çekirdeklerde (process havuzu); her gemini JSON tmp + replace
+  ile atomik yazılır, arşivdekiler günün paketine eklenir
+- Diğer alanlar (stage, pdf_texts, ...) korunur; analizörlere yeniden yayınlanmaz
+
+Kullanım:
+    python daily_kap_pipeline.py reextract [--workers 8] [--force] [--limit 1000] [--dry-run]
+    python kap_reextract.py [--workers 8] [--force]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+
+import kap_archive
+from kap_archive import get_archive, parse_uri, read_path
+from kap_html import EXTRACTOR_VERSION, KAP_BASE_URL, extraction_stamp, parse_disclosure_html
+from kap_manifest import MANIFEST_FILE, DisclosureManifest
+
+# ==========================
+# AYARLAR
+# ==========================
+CHUNK_SIZE = 32             # Worker'a tek seferde giden bildirim sayısı
+ARCHIVE_FLUSH_EVERY = 500   # Arşivdeki kayıtların kaç tanede bir pakete yazılacağı
+PROGRESS_EVERY = 1000
+
+STATUS_FRESH = "fresh"          # Damga güncel, dokunulmadı
+STATUS_UPDATED = "updated"      # Metin değişti, yeniden yazıldı
+STATUS_RESTAMPED = "restamped"  # Metin aynı çıktı, sadece damga yazıldı
+STATUS_MISSING = "missing"      # HTML ya da gemini JSON bulunamadı
+STATUS_ERROR = "error"
+
+# ==========================
+# WORKER (ayrı process)
+# ==========================
+
+def _init_worker(archive_dir: str):
+    # spawn ile açılan process modülü baştan yükler; arşiv kökü ana süreçle aynı olmalı
+    kap_archive.ARCHIVE_DIR = Path(archive_dir)
+
+def write_json_atomic(path: Path, text: str):
+    tmp_path = path.with_suffix(".json.tmp")
+    tmp_path.write_text(text, encoding="utf-8")
+    tmp_path.replace(path)
+
+def reextract_one(task: tuple) -> tuple[int, str, bytes | str | None]:
+    """
+    (index, html yolu, html sha256, gemini yolu, force, dry_run) -> (index, durum, ek)
+    Arşivdeki gemini kaydı için ek = yeni bayt (ana süreç pakete yazar), hata için mesaj.
+    """
+    idx, html_path, html_sha, gemini_path, force, dry_run = task
+    try:
+        raw = read_path(gemini_path)
+        html = read_path(html_path)
+        if raw is None or html is None:
+            return idx, STATUS_MISSING, None
+        record = json.loads(raw)
+        stamp = extraction_stamp(html_sha or hashlib.sha256(html).hexdigest())
+        if not force and record.get("extraction") == stamp:
+            return idx, STATUS_FRESH, None
+
+        text = parse_disclosure_html(html.decode("utf-8", errors="ignore"), KAP_BASE_URL)["text"]
+        status = STATUS_UPDATED if text != record.get("fullText") else STATUS_RESTAMPED
+        if dry_run:
+            return idx, status, None
+        record["fullText"] = text
+        record["extraction"] = stamp
+        data = json.dumps(record, ensure_ascii=False, indent=2)
+        if parse_uri(gemini_path) is not None:
+            return idx, status, data.encode("utf-8")
+        write_json_atomic(Path(gemini_path), data)
+        return idx, status, None
+    except Exception as e:
+        return idx, STATUS_ERROR, str(e)
+
+# ==========================
+# ÇALIŞTIRMA
+# ==========================
+
+def reextract(
+    manifest: DisclosureManifest,
+    workers: int | None = None,
+    force: bool = False,
+    limit: int | None = None,
+    dry_run: bool = False,
+) -> dict:
+    sources = manifest.gemini_sources()
+    if limit:
+        sources = sources[:limit]
+    workers = workers or os.cpu_count() or 1
+    counts = dict.fromkeys((STATUS_FRESH, STATUS_UPDATED, STATUS_RESTAMPED, STATUS_MISSING, STATUS_ERROR), 0)
+    archived: list[tuple[int, str, int, bytes]] = []
+    uri_of = {idx: gemini_path for idx, _, _, gemini_path in sources}
+    print(f"[REEXTRACT] {len(sources)} bildirim, {workers} process, çıkarıcı {EXTRACTOR_VERSION}"
+          + (" (force)" if force else "") + (" [dry-run]" if dry_run else ""))
+
+    def flush_archived():
+        if archived:
+            get_archive().rewrite(archived)
+            archived.clear()
+
+    started = time.monotonic()
+    tasks = ((idx, html, sha, gemini, force, dry_run) for idx, html, sha, gemini in sources)
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(str(kap_archive.ARCHIVE_DIR),),
+    ) as pool:
+        for done, (idx, status, extra) in enumerate(pool.map(reextract_one, tasks, chunksize=CHUNK_SIZE), start=1):
+            counts[status] += 1
+            if status == STATUS_ERROR:
+                print(f"[WARN] {idx} yeniden çıkarılamadı: {extra}")
+            elif extra is not None:
+                _, kind, seq = parse_uri(uri_of[idx])
+                archived.append((idx, kind, seq, extra))
+                if len(archived) >= ARCHIVE_FLUSH_EVERY:
+                    flush_archived()
+            if done % PROGRESS_EVERY == 0:
+                elapsed = time.monotonic() - started
+                print(f"[REEXTRACT] {done}/{len(sources)} | {done / elapsed:.0f} doc/s | "
+                      f"{counts[STATUS_UPDATED] + counts[STATUS_RESTAMPED]} yazıldı")
+    flush_archived()
+
+    elapsed = time.monotonic() - started
+    rewritten = 0 if dry_run else counts[STATUS_UPDATED] + counts[STATUS_RESTAMPED]
+    report = {
+        **counts,
+        "total": len(sources),
+        "seconds": round(elapsed, 2),
+        "docs_per_second": round(len(sources) / elapsed, 1) if elapsed > 0 else 0.0,
+        "rewritten_per_second": round(rewritten / elapsed, 1) if elapsed > 0 else 0.0,
+    }
+    print_report(report)
+    return report
+
+def print_report(report: dict):
+    print(
+        f"[REEXTRACT] {report['total']} bildirim {report['seconds']}s | {report['docs_per_second']} doc/s "
+        f"({report['rewritten_per_second']} yazılan/s) | güncel {report[STATUS_FRESH]}, "
+        f"metin değişti {report[STATUS_UPDATED]}, damga {report[STATUS_RESTAMPED]}, "
+        f"eksik {report[STATUS_MISSING]}, hata {report[STATUS_ERROR]}"
+    )
+
+def run_reextract(args: argparse.Namespace):
+    manifest = DisclosureManifest(Path(args.manifest))
+    try:
+        reextract(manifest, workers=args.workers, force=args.force, limit=args.limit, dry_run=args.dry_run)
+    finally:
+        manifest.close()
+
+def add_reextract_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--manifest", default=str(MANIFEST_FILE))
+    parser.add_argument("--workers", type=int, default=None, help="Process sayısı (varsayılan: tüm çekirdekler)")
+    parser.add_argument("--force", action="store_true", help="Damga güncel olsa da yeniden çıkar")
+    parser.add_argument("--limit", type=int, default=None, help="En fazla bu kadar bildirim (deneme için)")
+    parser.add_argument("--dry-run", action="store_true", help="Yazmadan, kaçının değişeceğini say")
+
+def main():
+    parser = argparse.ArgumentParser(description="Gemini JSON'larını saklanan HTML'den yeniden üret")
+    add_reextract_arguments(parser)
+    run_reextract(parser.parse_args())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+KAP Sembol Çözücü
+=================
+byCriteria kayıtlarının sembolünü indirme başlamadan, bellekteki indekslerden bulur:
+
+- kap_symbols_oids_mapping.json  -> {"companies": {"AEFES": {"oid": "..."}}}
+- Mongo tickers koleksiyonu      -> {symbol, company_name, mkk_member_oid}  (fetch_symbols.py)
+
+Sıra: stockCodes/relatedStocks -> mkkMemberOid -> şirket unvanı -> basicInfo/memberCode.
+"ALBRK, ALK" gibi bileşik kodlarda ilk kod esas alınır.
+İndeksler REFRESH_SECONDS'ta bir yeniden yüklenir.
+"""
+
+import json
+import os
+import re
+import time
+from pathlib import Path
+
+try:
+    from pymongo import MongoClient
+except ImportError:
+    MongoClient = None
+
+# ==========================
+# AYARLAR
+# ==========================
+PROJECT_ROOT = Path(__file__).parent
+MAPPING_FILE = PROJECT_ROOT / "kap_symbols_oids_mapping.json"
+MONGO_DB = "kap_news"
+TICKERS_COLLECTION = "tickers"
+REFRESH_SECONDS = 6 * 3600
+
+OID_FIELDS = ("mkkMemberOid", "memberOid", "companyOid")
+TITLE_FIELDS = ("kapTitle", "kapMemberTitle", "companyTitle", "memberTitle")
+
+# ==========================
+# YARDIMCILAR
+# ==========================
+
+def split_codes(value) -> list[str]:
+    """"ALBRK, ALK" / ["ALBRK", "ALK"] -> ["ALBRK", "ALK"]"""
+    if isinstance(value, list):
+        parts = [p for v in value for p in split_codes(v)]
+    elif isinstance(value, str):
+        parts = [p.strip().upper() for p in value.split(",")]
+    else:
+        return []
+    return [p for p in parts if p]
+
+def normalize_title(title: str) -> str:
+    """Unvanı karşılaştırma anahtarına çevirir (Türkçe büyük/küçük harf, noktalama yok)."""
+    if not title:
+        return ""
+    title = title.replace("İ", "i").replace("I", "ı").lower()
+    return re.sub(r"[^0-9a-zçğıöşü]", "", title)
+
+def load_mapping_file(path: Path = MAPPING_FILE) -> list[dict]:
+    if not path.exists():
+        return []
+    try:
+        companies = json.loads(path.read_text(encoding="utf-8")).get("companies", {})
+    except Exception as e:
+        print(f"[WARN] {path.name} okunamadı: {e}")
+        return []
+    return [
+        {"symbol": symbol, "oid": (info or {}).get("oid"), "title": (info or {}).get("title") or (info or {}).get("name")}
+        for symbol, info in companies.items()
+    ]
+
+def load_mongo_tickers() -> list[dict]:
+    """Mongo tickers koleksiyonu; pymongo/bağlantı yoksa boş liste."""
+    if MongoClient is None:
+        return []
+    try:
+        client = MongoClient(os.environ.get("MONGO_URI", "mongodb://localhost:27017"), serverSelectionTimeoutMS=3000)
+        docs = client[MONGO_DB][TICKERS_COLLECTION].find(
+            {}, {"_id": 0, "symbol": 1, "company_name": 1, "mkk_member_oid": 1}
+        )
+        rows = [
+            {"symbol": d.get("symbol"), "oid": d.get("mkk_member_oid"), "title": d.get("company_name")}
+            for d in docs
+        ]
+        client.close()
+        return rows
+    except Exception as e:
+        print(f"[WARN] Mongo tickers okunamadı: {e}")
+        return []
+
+# ==========================
+# ÇÖZÜCÜ
+# ==========================
+
+class SymbolResolver:
+    def __init__(self, mapping_file: Path = MAPPING_FILE, use_mongo: bool = True, refresh_seconds: float = REFRESH_SECONDS):
+        self.mapping_file = Path(mapping_file)
+        self.use_mongo = use_mongo
+        self.refresh_seconds = refresh_seconds
+        self.by_oid: dict[str, str] = {}
+        self.by_title: dict[str, str] = {}
+        self.loaded_at = 0.0
+        self.stats = {"code": 0, "oid": 0, "title": 0, "fallback": 0, "unknown": 0}
+
+    def refresh(self):
+        rows = load_mapping_file(self.mapping_file)
+        if self.use_mongo:
+            # Mongo daha güncel: aynı anahtarda mapping dosyasını ezer
+            rows += load_mongo_tickers()
+
+        by_oid, by_title = {}, {}
+        for row in rows:
+            codes = split_codes(row.get("symbol"))
+            if not codes:
+                continue
+            if row.get("oid"):
+                by_oid[str(row["oid"])] = codes[0]
+            key = normalize_title(row.get("title") or "")
+            if key:
+                by_title[key] = codes[0]
+
+        self.by_oid, self.by_title = by_oid, by_title
+        self.loaded_at = time.monotonic()
+        print(f"[INFO] Sembol çözücü yüklendi: {len(by_oid)} OID, {len(by_title)} unvan")
+
+    def maybe_refresh(self):
+        if not self.loaded_at or time.monotonic() - self.loaded_at > self.refresh_seconds:
+            self.refresh()
+
+    def resolve(self, item: dict) -> str | None:
+        """byCriteria kaydından sembol; bulunamazsa None."""
+        self.maybe_refresh()
+
+        for field in ("stockCodes", "relatedStocks"):
+            codes = split_codes(item.get(field))
+            if codes:
+                self.stats["code"] += 1
+                return codes[0]
+
+        for field in OID_FIELDS:
+            oid = item.get(field)
+            if oid and str(oid) in self.by_oid:
+                self.stats["oid"] += 1
+                return self.by_oid[str(oid)]
+
+        for field in TITLE_FIELDS:
+            key = normalize_title(item.get(field) or "")
+            if key and key in self.by_title:
+                self.stats["title"] += 1
+                return self.by_title[key]
+
+        basic = item.get("basicInfo")
+        codes = split_codes(basic.get("stockCode")) if isinstance(basic, dict) else []
+        if not codes:
+            codes = split_codes(item.get("memberCode"))
+        if codes:
+            self.stats["fallback"] += 1
+            return codes[0]
+
+        self.stats["unknown"] += 1
+        return None
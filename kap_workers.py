@@ -0,0 +1,289 @@
+"""
+KAP Çoklu Worker
+================
+Tek süreçli döngü (main / live) yerine aynı veri klasörünü paylaşan N süreç:
+
+- Listeleme tekil bir roldür: "lister" lease'ini tutan worker byCriteria'yı
+  yoklar, manifest'te olmayan bildirimleri TOPIC_DISCLOSURES'a yazar (key =
+  disclosureIndex, aynı bildirim ikinci kez eklenmez) ve watermark'ı ilerletir.
+  Lease'i tutan çökerse süre dolunca başka bir worker rolü devralır.
+- Her worker kuyruktan boş slotu kadar bildirimi kendi adına (owner) claim eder,
+  uçuştakilerin lease'ini heartbeat ile uzatır; ack/nack yalnızca lease hâlâ
+  kendisindeyse geçer. Çöken worker'ın işleri lease dolunca diğerlerine geçer.
+- Gemini JSON, manifest ve kuyruk yazılmadan hemen önce lease heartbeat ile
+  uzatılıp sahiplik kontrol edilir; lease başka worker'a geçtiyse iş sonucu
+  yazılmadan bırakılır (LeaseLost). ack da owner kontrollüdür.
+- kap.org.tr'ye giden istekler tüm süreçlerde tek bir host bütçesinden düşer
+  (kap_downloader.SharedBudget, daily_data_kap/budget.sqlite); 403/429 cooldown'ı
+  ve session yenileme de ortaktır.
+
+TEK MAKİNE SINIRI: kuyruk, lease'ler ve host bütçesi SQLite'ta (WAL) durur.
+WAL ağ dosya sistemlerinde (NFS/SMB) güvenli değildir; worker'lar aynı makinede
+aynı daily_data_kap klasörünü paylaşan süreçler olmalıdır. Birden fazla makine
+için bu üç tablonun paylaşılan bir veritabanına taşınması gerekir.
+
+Kullanım:
+    python daily_kap_pipeline.py worker [--slots 8] [--rate 1.0]   # her süreçte
+    python kap_workers.py --stats
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import time
+from datetime import datetime
+
+import daily_kap_pipeline as pipeline
+from kap_downloader import SharedBudget
+from kap_live import poll_interval
+from kap_queue import TOPIC_DISCLOSURES, LeaseLost
+
+# ==========================
+# AYARLAR
+# ==========================
+GROUP = "pipeline"              # Bildirim kuyruğunu tüketen grup
+LISTER_LEASE = "lister"         # Listeleme rolünün lease adı
+LISTER_LEASE_SECONDS = 120      # Yoklamalar arası en uzun aralıktan kısa olmamalı
+DISCLOSURE_LEASE_SECONDS = 180  # Heartbeat gelmezse iş bu süre sonra başka worker'a geçer
+HEARTBEAT_SECONDS = 30
+CLAIM_INTERVAL = 2.0            # Kuyruk boşken claim aralığı
+STATS_EVERY_SECONDS = 300
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+# ==========================
+# WORKER
+# ==========================
+
+class ClusterWorker:
+    """Bir süreç: kuyruktan iş alır, gerekirse listeleme rolünü üstlenir."""
+
+    def __init__(
+        self,
+        downloader,
+        worker_id: str | None = None,
+        slots: int = pipeline.DOWNLOAD_WORKERS,
+        lease_seconds: float = DISCLOSURE_LEASE_SECONDS,
+        list_disclosures: bool = True,
+    ):
+        self.downloader = downloader
+        self.worker_id = worker_id or default_worker_id()
+        self.slots = max(1, slots)
+        self.lease_seconds = lease_seconds
+        self.list_disclosures = list_disclosures
+        self.queue = pipeline.get_queue()
+        self.inflight: dict[int, asyncio.Task] = {}   # message_id -> görev
+        self.lost: set[int] = set()                   # Lease'i başka worker'a geçmiş mesajlar
+        self.is_lister = False
+        self.next_poll = 0.0
+        self.stats = {"listed": 0, "processed": 0, "skipped": 0, "failed": 0, "lost": 0}
+
+    # ---------- listeleme ----------
+
+    async def poll(self) -> int:
+        """Lister ise hedef tarih(ler)i yoklar, yeni bildirimleri kuyruğa ekler."""
+        is_lister = self.queue.acquire_lease(LISTER_LEASE, self.worker_id, LISTER_LEASE_SECONDS)
+        if is_lister != self.is_lister:
+            print(f"[WORKER] {self.worker_id} listeleme rolünü {'aldı' if is_lister else 'bıraktı'}")
+            self.is_lister = is_lister
+        if not is_lister or time.monotonic() < self.next_poll:
+            return 0
+        phase, interval = poll_interval(datetime.now())
+        self.next_poll = time.monotonic() + min(interval, LISTER_LEASE_SECONDS / 2)
+
+        mark = pipeline.load_watermark()
+        last_index = mark.get("last_index")
+        listed: list[dict] = []
+        for target_date in pipeline.target_dates_for_cycle(mark):
+            data = await self.downloader.post_json(
+                pipeline.BY_CRITERIA_URL, pipeline.build_criteria_payload(target_date, target_date)
+            )
+            if data is None:
+                print(f"[WARN] {target_date} listesi alınamadı")
+                return 0  # Watermark bu yoklamada ilerlemesin
+            listed.extend(
+                item for item in data
+                if isinstance(item, dict)
+                and (last_index is None or int(item.get("disclosureIndex") or 0) > int(last_index))
+            )
+
+        disclosures = {int(d["disclosureIndex"]): d for d in pipeline.parse_disclosure_items(listed)}
+        if not disclosures:
+            return 0
+        existing = pipeline.get_manifest().existing_indices(disclosures)
+        added = 0
+        for idx, disclosure in sorted(disclosures.items()):
+            if idx not in existing and self.queue.enqueue(TOPIC_DISCLOSURES, str(idx), disclosure):
+                added += 1
+
+        # Kuyruğa giren iş kaybolmaz (tekrar / dead-letter); watermark hepsini geçebilir
+        mark = pipeline.advance_watermark(mark, list(disclosures.values()), set(disclosures))
+        pipeline.save_watermark(mark)
+        self.stats["listed"] += added
+        if added:
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] [WORKER] {added} bildirim kuyruğa eklendi "
+                  f"(faz: {phase}, watermark: {mark.get('last_index')})")
+        return added
+
+    # ---------- işleme ----------
+
+    def claim(self) -> int:
+        free = self.slots - len(self.inflight)
+        if free <= 0:
+            return 0
+        messages = self.queue.claim(GROUP, TOPIC_DISCLOSURES, limit=free,
+                                    lease_seconds=self.lease_seconds, owner=self.worker_id)
+        for message in messages:
+            task = asyncio.create_task(self._process(message))
+            self.inflight[message["id"]] = task
+        return len(messages)
+
+    def _still_owner(self, mid: int) -> bool:
+        """Sonuç yazılmadan önce: lease'i uzatır, hâlâ bu worker'da mı bakar."""
+        if mid in self.lost:
+            return False
+        if self.queue.heartbeat(GROUP, self.worker_id, [mid], self.lease_seconds):
+            self.lost.add(mid)
+            return False
+        return True
+
+    async def _process(self, message: dict):
+        mid = message["id"]
+        disclosure = message["payload"]
+        idx = int(disclosure["disclosureIndex"])
+        try:
+            if pipeline.get_manifest().has(idx):
+                self.stats["skipped"] += 1
+                ok = True
+            else:
+                ok = await pipeline.process_single_disclosure(
+                    self.downloader, disclosure, guard=lambda: self._still_owner(mid)
+                )
+            if not ok:
+                self.queue.nack(GROUP, mid, "işlenemedi", owner=self.worker_id)
+                self.stats["failed"] += 1
+            elif self.queue.ack(GROUP, mid, owner=self.worker_id):
+                self.stats["processed"] += 1
+            else:
+                raise LeaseLost(f"{idx} ack'lenemedi")
+        except LeaseLost as e:
+            # İş başka worker'da; yazılmış bir şey varsa manifest/kuyruk anahtarı aynı olduğundan tekrarlanmaz
+            print(f"[WARN] {disclosure.get('symbol', '?')} {idx} bırakıldı: {e}")
+            self.stats["lost"] += 1
+        except Exception as e:
+            print(f"[ERROR] {disclosure.get('symbol', '?')} {idx} işlenirken hata: {e}")
+            self.queue.nack(GROUP, mid, str(e), owner=self.worker_id)
+            self.stats["failed"] += 1
+        finally:
+            self.inflight.pop(mid, None)
+            self.lost.discard(mid)
+
+    async def heartbeat(self):
+        while True:
+            await asyncio.sleep(HEARTBEAT_SECONDS)
+            try:
+                lost = self.queue.heartbeat(GROUP, self.worker_id, list(self.inflight), self.lease_seconds)
+            except Exception as e:
+                print(f"[WARN] Heartbeat yazılamadı: {e}")
+                continue
+            for mid in lost:
+                if mid not in self.lost:
+                    # Süreç uzun süre durmuş (ör. GC, uyku); iş başka worker'da, sonucu ack'lenmeyecek
+                    print(f"[WARN] Mesaj {mid} lease'i kaybedildi, başka bir worker işliyor")
+                    self.lost.add(mid)
+
+    def print_stats(self):
+        print(f"[WORKER] {self.worker_id}: {self.stats} | uçuşta {len(self.inflight)}"
+              + (" | lister" if self.is_lister else ""))
+
+    async def run(self, idle_exit: float | None = None):
+        """idle_exit verilirse kuyruk o kadar saniye boş kalınca döner (deneme / toplu iş için)."""
+        heartbeat = asyncio.create_task(self.heartbeat())
+        last_stats = idle_since = time.monotonic()
+        try:
+            while True:
+                if self.list_disclosures:
+                    try:
+                        await self.poll()
+                    except Exception as e:
+                        print(f"[ERROR] Yoklama hatası: {e}")
+                claimed = self.claim()
+                now = time.monotonic()
+                if claimed or self.inflight:
+                    idle_since = now
+                elif idle_exit is not None and now - idle_since > idle_exit:
+                    break
+                if now - last_stats > STATS_EVERY_SECONDS:
+                    self.print_stats()
+                    last_stats = now
+                if not claimed:
+                    await asyncio.sleep(CLAIM_INTERVAL)
+        finally:
+            if self.inflight:
+                await asyncio.gather(*self.inflight.values(), return_exceptions=True)
+            heartbeat.cancel()
+            if self.is_lister:
+                self.queue.release_lease(LISTER_LEASE, self.worker_id)
+            self.print_stats()
+
+# ==========================
+# ÇALIŞTIRMA
+# ==========================
+
+async def worker_async(args: argparse.Namespace):
+    budget = SharedBudget(pipeline.BUDGET_FILE)
+    downloader = pipeline.make_downloader(rate_per_host=args.rate, budget=budget)
+    worker = ClusterWorker(
+        downloader,
+        worker_id=args.worker_id,
+        slots=args.slots or pipeline.DOWNLOAD_WORKERS,
+        lease_seconds=args.lease,
+        list_disclosures=not args.no_list,
+    )
+    print(f"[WORKER] {worker.worker_id} başladı ({worker.slots} slot, lease {worker.lease_seconds:.0f}s)")
+    try:
+        await worker.run(idle_exit=args.idle_exit)
+    finally:
+        downloader.close()
+        budget.close()
+
+def print_cluster_stats():
+    stats = pipeline.get_queue().stats()
+    print(f"[WORKER] Kuyruk ({GROUP}): {stats['groups'].get(GROUP, {})}")
+    print(f"[WORKER] Lease'ler: {stats['leases']}")
+    if pipeline.BUDGET_FILE.exists():
+        budget = SharedBudget(pipeline.BUDGET_FILE)
+        try:
+            print(f"[WORKER] Host bütçesi: {budget.stats()}")
+        finally:
+            budget.close()
+
+def run_worker(args: argparse.Namespace):
+    if args.stats:
+        print_cluster_stats()
+        return
+    try:
+        asyncio.run(worker_async(args))
+    except KeyboardInterrupt:
+        print("\n[INFO] Worker durduruldu")
+
+def add_worker_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--slots", type=int, default=None, help="Aynı anda işlenen bildirim")
+    parser.add_argument("--rate", type=float, default=None, help="Host başına saniyede istek (tüm worker'lar toplamı)")
+    parser.add_argument("--lease", type=float, default=DISCLOSURE_LEASE_SECONDS, help="Bildirim lease süresi (sn)")
+    parser.add_argument("--worker-id", default=None, help="Varsayılan: hostname:pid")
+    parser.add_argument("--no-list", action="store_true", help="Listeleme rolüne aday olma, sadece işle")
+    parser.add_argument("--idle-exit", type=float, default=None, help="Kuyruk bu kadar sn boş kalınca çık")
+    parser.add_argument("--stats", action="store_true", help="Kuyruk, lease ve bütçe durumunu yazdır")
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="KAP çoklu worker (tek makine: worker'lar aynı yerel daily_data_kap klasörünü paylaşır)"
+    )
+    add_worker_arguments(parser)
+    run_worker(parser.parse_args())
+
+if __name__ == "__main__":
+    main()
@@ -4,7 +4,6 @@
 
 import os
 import json
-import glob
 import time
 from datetime import datetime
 import re
@@ -18,6 +17,8 @@ from google.generativeai import types
 
 # Hafıza modülleri
 from chroma_kap_memory import load_embedder, KapMemory, handle_new_kap, store_kap
+from kap_archive import read_json_path
+from kap_queue import TOPIC_GEMINI, RetryableError, WorkQueue
 
 load_dotenv()
 
@@ -46,6 +47,11 @@ MEMORY_TOPK = 4
 SLEEP_NO_NEW = 10
 SLEEP_BETWEEN_FILES = 2
 
+# İş kuyruğu (kap_queue): pipeline her yeni gemini JSON'u buraya yazar
+QUEUE_GROUP = "news"
+QUEUE_BATCH = 10
+QUEUE_LEASE_SECONDS = 1800  # Ack gelmezse batch bu süre sonra tekrar verilir
+
 # Write / filter
 MIN_NEWS_SCORE = 0.25
 
@@ -328,8 +334,8 @@ def setup_gemini():
 
 def safe_read_json(path: str):
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
+        # Düz dosya yoksa (gün kapanıp arşive taşınmışsa) paketlenmiş kayıttan okunur
+        return read_json_path(path)
     except Exception:
         return None
 
@@ -589,7 +595,7 @@ def process_one_file(client, file_path: str, embedder=None, memory=None):
         )
     except Exception as e:
         print(f"[ERROR] Gemini API Error: {e}")
-        return None
+        raise RetryableError(str(e))  # kuyruk gecikmeyle tekrar dener
 
     if not resp.text:
         return None
@@ -663,26 +669,39 @@ def main():
 
     print(f"[INFO] Loaded {len(processed)} processed files.")
 
+    queue = WorkQueue()
+
     while True:
         try:
-            search_pattern = os.path.join(DATA_DIR, "*_gemini.json")
-            files = glob.glob(search_pattern)
-            new_files = [f for f in files if f not in processed]
+            messages = queue.claim(QUEUE_GROUP, TOPIC_GEMINI, limit=QUEUE_BATCH, lease_seconds=QUEUE_LEASE_SECONDS)
 
-            if not new_files:
+            if not messages:
                 time.sleep(SLEEP_NO_NEW)
                 continue
 
-            print(f"\n[{datetime.now().strftime('%H:%M:%S')}] {len(new_files)} yeni analiz dosyası bulundu.")
+            print(f"\n[{datetime.now().strftime('%H:%M:%S')}] {len(messages)} yeni analiz dosyası alındı.")
+
+            for i, msg in enumerate(messages, 1):
+                # Tracker eski glob yolunu tutuyor (DATA_DIR/<dosya>), aynı anahtarı kullan
+                fp = os.path.join(DATA_DIR, os.path.basename(msg["payload"]["path"]))
+                if fp in processed:
+                    queue.ack(QUEUE_GROUP, msg["id"])
+                    continue
 
-            for i, fp in enumerate(new_files, 1):
-                print(f"Processing [{i}/{len(new_files)}]: {os.path.basename(fp)}")
+                print(f"Processing [{i}/{len(messages)}]: {os.path.basename(fp)}")
 
-                item = process_one_file(client, fp, embedder=embedder, memory=memory)
+                try:
+                    item = process_one_file(client, fp, embedder=embedder, memory=memory)
+                except RetryableError as e:
+                    dead = queue.nack(QUEUE_GROUP, msg["id"], str(e))
+                    print(f"[WARN] {os.path.basename(fp)} tekrar denenecek" + (" (dead-letter)" if dead else ""))
+                    time.sleep(SLEEP_BETWEEN_FILES)
+                    continue
 
                 # Her halükarda processed listesine ekle ki tekrar okumasın
                 processed.add(fp)
                 save_processed_set(processed)
+                queue.ack(QUEUE_GROUP, msg["id"])
 
                 if item:
                     # Publisher guess = dosyadan çıkan SYMBOL (şu an symbol çıkardığın şey)